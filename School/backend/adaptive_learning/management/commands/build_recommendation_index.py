@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from adaptive_learning.similarity_index import (
+    SimilarityIndex, RECOMMENDATION_INDEX_K, RECOMMENDATION_INDEX_PATH
+)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed student similarity index used for recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--k',
+            type=int,
+            default=RECOMMENDATION_INDEX_K,
+            help='Number of nearest neighbours to keep per student',
+        )
+        parser.add_argument(
+            '--path',
+            default=RECOMMENDATION_INDEX_PATH,
+            help='Where to write the index',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Building recommendation index...')
+        start_time = time.time()
+
+        index = SimilarityIndex.build(k=options['k'])
+        index.save(options['path'])
+
+        stats = index.stats()
+        shards = ', '.join(f'{style}: {count}' for style, count in stats['shards'].items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {stats['profiles']} profiles ({shards}) in "
+                f"{time.time() - start_time:.1f}s -> {options['path']}"
+            )
+        )
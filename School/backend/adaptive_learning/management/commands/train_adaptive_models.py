@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from adaptive_learning.ml_models import train_models, save_models, ADAPTIVE_MODEL_DIR
+
+
+class Command(BaseCommand):
+    help = 'Train and publish the adaptive learning mastery, difficulty and learning-pattern models'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model-dir',
+            default=ADAPTIVE_MODEL_DIR,
+            help='Directory holding versioned model bundles',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Training adaptive learning models...')
+        try:
+            bundle = train_models()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        path = save_models(bundle, options['model_dir'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Published version {bundle['version']} trained on {bundle['training_rows']} rows "
+                f"in {bundle['training_seconds']}s -> {path}"
+            )
+        )
@@ -0,0 +1,189 @@
+"""
+Offline-trained models for the adaptive learning engine.
+
+Models are fitted on every student's performance history by
+``manage.py train_adaptive_models``, saved as versioned joblib bundles, and
+loaded once per process. Requests only call ``predict``; when no bundle has
+been trained yet the engine falls back to its rule-based adjustments.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+import joblib
+import numpy as np
+import sklearn
+from django.conf import settings
+from django.utils import timezone
+from sklearn.cluster import KMeans
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from .models import PerformanceMetrics
+
+logger = logging.getLogger(__name__)
+
+ADAPTIVE_MODEL_DIR = getattr(settings, 'ADAPTIVE_MODEL_DIR', 'adaptive_models')
+ADAPTIVE_MODEL_KEEP = getattr(settings, 'ADAPTIVE_MODEL_KEEP', 5)
+# How often a process checks whether a newer bundle was published
+ADAPTIVE_MODEL_RELOAD_INTERVAL = getattr(settings, 'ADAPTIVE_MODEL_RELOAD_INTERVAL', 60)
+ADAPTIVE_TRAINING_MAX_ROWS = getattr(settings, 'ADAPTIVE_TRAINING_MAX_ROWS', 200000)
+MIN_TRAINING_ROWS = 10
+
+LATEST_POINTER = 'latest.json'
+
+
+def _accuracy(correct_answers, total_questions):
+    return correct_answers / total_questions if total_questions else 0.0
+
+
+def mastery_features(metric, days_since_practice=0):
+    """accuracy, average time, difficulty, days since practice"""
+    return [
+        _accuracy(metric.correct_answers, metric.total_questions),
+        metric.average_time,
+        metric.difficulty_level,
+        days_since_practice,
+    ]
+
+
+def difficulty_features(metric, profile):
+    """accuracy, average time, mastery, number of strengths/weaknesses, learning pace"""
+    return [
+        _accuracy(metric.correct_answers, metric.total_questions),
+        metric.average_time,
+        metric.mastery_level,
+        len(profile.strengths),
+        len(profile.weaknesses),
+        profile.learning_pace,
+    ]
+
+
+def pattern_features(metric):
+    """accuracy, average time, mastery, difficulty"""
+    return [
+        _accuracy(metric.correct_answers, metric.total_questions),
+        metric.average_time,
+        metric.mastery_level,
+        metric.difficulty_level,
+    ]
+
+
+def _training_rows():
+    """Most recent performance rows joined with their owner's profile"""
+    return PerformanceMetrics.objects.filter(total_questions__gt=0).order_by('-last_practiced').values_list(
+        'correct_answers', 'total_questions', 'average_time', 'difficulty_level', 'mastery_level',
+        'last_practiced', 'user__learning_profile__strengths', 'user__learning_profile__weaknesses',
+        'user__learning_profile__learning_pace'
+    )[:ADAPTIVE_TRAINING_MAX_ROWS]
+
+
+def train_models():
+    """Fit the mastery, difficulty and learning-pattern models on all students"""
+    start_time = time.time()
+    now = timezone.now()
+
+    mastery_X, mastery_y, difficulty_X, difficulty_y, pattern_X = [], [], [], [], []
+    for (correct, total, avg_time, difficulty, mastery, last_practiced,
+         strengths, weaknesses, pace) in _training_rows().iterator(chunk_size=5000):
+        accuracy = _accuracy(correct, total)
+        days = (now - last_practiced).days if last_practiced else 0
+        mastery_X.append([accuracy, avg_time, difficulty, days])
+        mastery_y.append(mastery)
+        difficulty_X.append([
+            accuracy, avg_time, mastery, len(strengths or []), len(weaknesses or []),
+            pace if pace is not None else 1.0
+        ])
+        difficulty_y.append(difficulty)
+        pattern_X.append([accuracy, avg_time, mastery, difficulty])
+
+    if len(mastery_X) < MIN_TRAINING_ROWS:
+        raise ValueError(f"Need at least {MIN_TRAINING_ROWS} performance rows to train, found {len(mastery_X)}")
+
+    mastery_model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10, n_jobs=-1)
+    mastery_model.fit(np.array(mastery_X), np.array(mastery_y))
+
+    difficulty_model = make_pipeline(
+        StandardScaler(),
+        RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=-1)
+    )
+    difficulty_model.fit(np.array(difficulty_X), np.array(difficulty_y))
+
+    pattern_model = KMeans(n_clusters=3, random_state=42, n_init=10)
+    pattern_model.fit(np.array(pattern_X))
+
+    # Prediction happens one row at a time in requests; extra threads only add overhead
+    mastery_model.set_params(n_jobs=1)
+    difficulty_model.set_params(randomforestregressor__n_jobs=1)
+
+    return {
+        'version': now.strftime('%Y%m%d%H%M%S'),
+        'trained_at': now.isoformat(),
+        'training_rows': len(mastery_X),
+        'training_seconds': round(time.time() - start_time, 1),
+        'sklearn_version': sklearn.__version__,
+        'mastery': mastery_model,
+        'difficulty': difficulty_model,
+        'patterns': pattern_model,
+    }
+
+
+def save_models(bundle, model_dir=ADAPTIVE_MODEL_DIR):
+    """Write a bundle as a new version, publish it as latest, and prune old versions"""
+    os.makedirs(model_dir, exist_ok=True)
+    filename = f"adaptive-{bundle['version']}.joblib"
+    tmp_path = os.path.join(model_dir, f'.{filename}.tmp')
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, os.path.join(model_dir, filename))
+
+    pointer = {key: value for key, value in bundle.items() if not hasattr(value, 'predict')}
+    pointer['file'] = filename
+    tmp_pointer = os.path.join(model_dir, f'.{LATEST_POINTER}.tmp')
+    with open(tmp_pointer, 'w') as f:
+        json.dump(pointer, f, indent=2)
+    os.replace(tmp_pointer, os.path.join(model_dir, LATEST_POINTER))
+
+    versions = sorted(name for name in os.listdir(model_dir) if name.startswith('adaptive-') and name.endswith('.joblib'))
+    for stale in versions[:-ADAPTIVE_MODEL_KEEP]:
+        os.remove(os.path.join(model_dir, stale))
+    return os.path.join(model_dir, filename)
+
+
+class ModelStore:
+    """Per-process holder of the latest published bundle"""
+
+    def __init__(self, model_dir=ADAPTIVE_MODEL_DIR):
+        self.model_dir = model_dir
+        self.bundle = None
+        self.version = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def get(self):
+        """Return the current bundle (or None), reloading only when a new version is published"""
+        if time.time() - self.checked_at < ADAPTIVE_MODEL_RELOAD_INTERVAL:
+            return self.bundle
+
+        with self.lock:
+            if time.time() - self.checked_at < ADAPTIVE_MODEL_RELOAD_INTERVAL:
+                return self.bundle
+            self.checked_at = time.time()
+            try:
+                with open(os.path.join(self.model_dir, LATEST_POINTER)) as f:
+                    pointer = json.load(f)
+                if pointer['version'] != self.version:
+                    self.bundle = joblib.load(os.path.join(self.model_dir, pointer['file']))
+                    self.version = pointer['version']
+                    logger.info(f"Loaded adaptive learning models version {self.version}")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error(f"Failed to load adaptive learning models: {e}")
+            return self.bundle
+
+
+model_store = ModelStore()
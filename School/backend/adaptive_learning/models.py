@@ -57,6 +57,11 @@ class PerformanceMetrics(models.Model):
 
     def update_performance(self, correct, time_taken):
         """Update performance metrics after a question"""
+        self.apply_answer(correct, time_taken)
+        self.save()
+
+    def apply_answer(self, correct, time_taken):
+        """Apply one answer to the counters, timing and mastery without saving"""
         self.total_questions += 1
         if correct:
             self.correct_answers += 1
@@ -72,8 +77,6 @@ class PerformanceMetrics(models.Model):
         elif recent_accuracy < 0.6:
             self.mastery_level = max(0.0, self.mastery_level - 0.05)
 
-        self.save()
-
 class AdaptivePath(models.Model):
     """Personalized learning path for each student"""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='adaptive_path')
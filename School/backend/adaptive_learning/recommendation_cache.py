@@ -0,0 +1,50 @@
+"""
+Per-user cache of recommendation results.
+
+Results are stored in the Django cache under a per-user version number.
+Saving a student's PerformanceMetrics or LearningProfile bumps the version
+(see signals.py), which orphans every cached result for that student at once.
+RECOMMENDATION_CACHE_TTL is the staleness budget for changes that send no
+signal, such as other students' progress or queryset.update() calls.
+"""
+
+import json
+import time
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+RECOMMENDATION_CACHE_TTL = getattr(settings, 'RECOMMENDATION_CACHE_TTL', 900)
+
+
+def _version_key(user_id):
+    return f"recommendations_version_{user_id}"
+
+
+def _user_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = time.time_ns()
+        cache.add(_version_key(user_id), version, timeout=None)
+        version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def cached_recommendations(user_id, kind, params, compute, cacheable=bool):
+    """Return the cached ``kind`` result for a user, computing and storing it on a miss"""
+    params_key = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    cache_key = f"recommendations_{user_id}_{_user_version(user_id)}_{kind}_{params_key}"
+    cached_result = cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
+
+    result = compute()
+    if cacheable(result):
+        cache.set(cache_key, result, timeout=RECOMMENDATION_CACHE_TTL)
+    return result
+
+
+def invalidate_recommendations(user_id):
+    """Drop every cached recommendation for a user"""
+    cache.set(_version_key(user_id), time.time_ns(), timeout=None)
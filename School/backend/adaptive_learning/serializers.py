@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import LearningProfile, PerformanceMetrics, AdaptivePath, StudySession, LearningGoal
 
@@ -31,6 +32,25 @@ class PerformanceMetricsSerializer(serializers.ModelSerializer):
         return obj.accuracy_rate
 
 
+class AnswerSerializer(serializers.Serializer):
+    """One answered question."""
+    subject = serializers.CharField(max_length=100)
+    topic = serializers.CharField(max_length=200)
+    correct = serializers.BooleanField(default=False)
+    time_taken = serializers.FloatField(default=0, min_value=0)
+
+
+class BulkAnswerSerializer(serializers.Serializer):
+    """A batch of answers, e.g. a whole quiz, applied in order."""
+    answers = AnswerSerializer(many=True, allow_empty=False)
+
+    def validate_answers(self, value):
+        max_answers = getattr(settings, 'ADAPTIVE_MAX_BULK_ANSWERS', 500)
+        if len(value) > max_answers:
+            raise serializers.ValidationError(f"At most {max_answers} answers can be submitted at once.")
+        return value
+
+
 class AdaptivePathSerializer(serializers.ModelSerializer):
     """Serializer for adaptive learning paths"""
     class Meta:
@@ -1,12 +1,15 @@
 import numpy as np
+from collections import defaultdict
 from datetime import datetime, timedelta
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Avg, Count, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 from .models import LearningProfile, PerformanceMetrics, AdaptivePath, StudySession, LearningGoal
+from .ml_models import model_store, mastery_features, difficulty_features, pattern_features
+from .recommendation_cache import invalidate_recommendations
 import logging
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
 from sklearn.metrics.pairwise import cosine_similarity
 import pandas as pd
 
@@ -18,10 +21,8 @@ class AdaptiveLearningEngine:
 
     def __init__(self, user):
         self.user = user
-        self.profile = self._get_or_create_profile()
-        self.path = self._get_or_create_path()
         
-        # ML models
+        # ML models (fitted offline and shared by every engine in the process)
         self.performance_predictor = None
         self.difficulty_adjuster = None
         self.topic_recommender = None
@@ -30,29 +31,35 @@ class AdaptiveLearningEngine:
         # Initialize ML models
         self._initialize_ml_models()
 
+    @classmethod
+    def for_request(cls, request):
+        """Engine for the requesting user, built once per request and reused by later calls"""
+        engine = getattr(request, '_adaptive_learning_engine', None)
+        if engine is None or engine.user.pk != request.user.pk:
+            engine = cls(request.user)
+            request._adaptive_learning_engine = engine
+        return engine
+
+    @cached_property
+    def profile(self):
+        """Learning profile, loaded on first use"""
+        return self._get_or_create_profile()
+
+    @cached_property
+    def path(self):
+        """Adaptive path, loaded on first use"""
+        return self._get_or_create_path()
+
     def _initialize_ml_models(self):
-        """Initialize machine learning models"""
-        try:
-            # Performance prediction model
-            self.performance_predictor = RandomForestRegressor(
-                n_estimators=100,
-                random_state=42,
-                max_depth=10
-            )
-            
-            # Difficulty adjustment model
-            self.difficulty_adjuster = RandomForestRegressor(
-                n_estimators=50,
-                random_state=42
-            )
-            
-            # Topic recommender (using collaborative filtering approach)
-            self.topic_recommender = None  # Will be trained on demand
-            
-            logger.info("ML models initialized successfully")
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize ML models: {e}")
+        """Attach the offline-trained models shared by every engine in this process"""
+        bundle = model_store.get()
+        if bundle is None:
+            # Not trained yet (see train_adaptive_models); rule-based adjustments are used
+            return
+
+        self.performance_predictor = bundle['mastery']
+        self.difficulty_adjuster = bundle['difficulty']
+        self.learning_style_classifier = bundle['patterns']
 
     def _get_or_create_profile(self):
         """Get or create learning profile for user"""
@@ -73,46 +80,92 @@ class AdaptiveLearningEngine:
         )
         return path
 
-class AdaptiveLearningEngine:
-    """Core adaptive learning engine that personalizes learning paths with ML algorithms"""
-
-    def __init__(self, user):
-        self.user = user
-        self.profile = self._get_or_create_profile()
-        self.path = self._get_or_create_path()
-        
-        # ML models
-        self.performance_predictor = None
-        self.difficulty_adjuster = None
-        self.topic_recommender = None
-        self.learning_style_classifier = None
-        
-        # Initialize ML models
-        self._initialize_ml_models()
-
-    def _initialize_ml_models(self):
-        """Initialize machine learning models"""
+    def analyze_performance(self, subject, topic, correct, time_taken):
+        """Rule-based performance analysis after answering a question"""
         try:
-            # Performance prediction model
-            self.performance_predictor = RandomForestRegressor(
-                n_estimators=100,
-                random_state=42,
-                max_depth=10
-            )
-            
-            # Difficulty adjustment model
-            self.difficulty_adjuster = RandomForestRegressor(
-                n_estimators=50,
-                random_state=42
+            metric, created = PerformanceMetrics.objects.get_or_create(
+                user=self.user,
+                subject=subject,
+                topic=topic
             )
-            
-            # Topic recommender (using collaborative filtering approach)
-            self.topic_recommender = None  # Will be trained on demand
-            
-            logger.info("ML models initialized successfully")
-            
+
+            # Update accuracy, timing and mastery
+            metric.update_performance(correct, time_taken)
+
+            # Adjust difficulty based on performance
+            self._adjust_difficulty(metric)
+
+            # Update learning profile
+            self._update_learning_profile(metric)
+
+            return metric
+
         except Exception as e:
-            logger.error(f"Failed to initialize ML models: {e}")
+            logger.error(f"Error analyzing performance: {e}")
+            return None
+
+    def analyze_performance_batch(self, answers):
+        """Apply a list of answers (e.g. a whole quiz) and write them in one transaction
+
+        Answers are replayed in order against in-memory metrics, so the result
+        matches calling analyze_performance once per answer, but the writes are
+        one bulk_create, one bulk_update and one profile save.
+        """
+        subjects = {answer['subject'] for answer in answers}
+        pairs = {(answer['subject'], answer['topic']) for answer in answers}
+
+        with transaction.atomic():
+            existing = set(PerformanceMetrics.objects.filter(
+                user=self.user, subject__in=subjects
+            ).values_list('subject', 'topic'))
+            # Rows for new topics first, so concurrent batches cannot both insert them
+            PerformanceMetrics.objects.bulk_create(
+                [PerformanceMetrics(user=self.user, subject=subject, topic=topic) for subject, topic in pairs],
+                ignore_conflicts=True
+            )
+            # Every topic of the touched subjects feeds the per-subject profile aggregates.
+            # A row created above only joins them at its first answer, as get_or_create would.
+            subject_metrics = defaultdict(list)
+            metrics = {}
+            new_pairs = pairs - existing
+            for metric in PerformanceMetrics.objects.select_for_update().filter(
+                user=self.user, subject__in=subjects
+            ):
+                if (metric.subject, metric.topic) not in new_pairs:
+                    subject_metrics[metric.subject].append(metric)
+                metrics[(metric.subject, metric.topic)] = metric
+
+            for answer in answers:
+                pair = (answer['subject'], answer['topic'])
+                metric = metrics[pair]
+                if pair in new_pairs:
+                    new_pairs.discard(pair)
+                    subject_metrics[metric.subject].append(metric)
+                metric.apply_answer(answer['correct'], answer['time_taken'])
+                self._apply_difficulty(metric)
+
+                rows = subject_metrics[metric.subject]
+                total_questions = sum(row.total_questions for row in rows)
+                self._apply_subject_performance(
+                    metric.subject,
+                    sum(row.correct_answers for row in rows) / total_questions if total_questions else None,
+                    sum(row.average_time for row in rows) / len(rows)
+                )
+
+            # bulk_update skips auto_now
+            now = timezone.now()
+            touched = [metrics[pair] for pair in pairs]
+            for metric in touched:
+                metric.last_practiced = now
+            PerformanceMetrics.objects.bulk_update(touched, [
+                'total_questions', 'correct_answers', 'average_time',
+                'difficulty_level', 'mastery_level', 'last_practiced'
+            ])
+            self.profile.save()
+
+        # bulk_update sends no post_save, so the recommendation signals never fire
+        invalidate_recommendations(self.user.id)
+        return touched
 
     def analyze_performance_advanced(self, subject, topic, correct, time_taken, question_difficulty=1.0):
         """Advanced performance analysis using ML algorithms"""
@@ -164,106 +217,33 @@ class AdaptiveLearningEngine:
         metric.save()
 
     def _calculate_mastery_level_ml(self, metric):
-        """Calculate mastery level using machine learning approach"""
+        """Calculate mastery level using the offline-trained mastery model"""
+        accuracy = metric.correct_answers / metric.total_questions
         try:
-            # Get historical performance data
-            historical_data = PerformanceMetrics.objects.filter(
-                user=self.user,
-                subject=metric.subject
-            ).order_by('-last_practiced')[:20]  # Last 20 sessions
-            
-            if len(historical_data) < 5:
-                # Not enough data, use simple calculation
-                accuracy = metric.correct_answers / metric.total_questions
-                metric.mastery_level = min(1.0, accuracy * 1.2)
-                return
-            
-            # Prepare features for ML prediction
-            features = []
-            for data in historical_data:
-                features.append([
-                    data.correct_answers / data.total_questions,  # accuracy
-                    data.average_time,
-                    data.difficulty_level,
-                    (datetime.now().date() - data.last_practiced.date()).days  # days since practice
-                ])
-            
-            X = np.array(features)
-            y = np.array([data.mastery_level for data in historical_data])
-            
-            # Train model if we have enough data
-            if len(X) >= 10:
-                self.performance_predictor.fit(X, y)
-                
-                # Predict current mastery
-                current_features = np.array([[
-                    metric.correct_answers / metric.total_questions,
-                    metric.average_time,
-                    metric.difficulty_level,
-                    0  # current session
-                ]])
-                
-                predicted_mastery = self.performance_predictor.predict(current_features)[0]
-                metric.mastery_level = max(0.0, min(1.0, predicted_mastery))
-            else:
-                # Fallback to simple calculation
-                accuracy = metric.correct_answers / metric.total_questions
+            if self.performance_predictor is None:
+                # No trained model yet, use simple calculation
                 metric.mastery_level = min(1.0, accuracy * 1.1)
+                return
+
+            # Predict current mastery (practiced just now)
+            current_features = np.array([mastery_features(metric, days_since_practice=0)])
+            predicted_mastery = self.performance_predictor.predict(current_features)[0]
+            metric.mastery_level = max(0.0, min(1.0, predicted_mastery))
                 
         except Exception as e:
             logger.error(f"ML mastery calculation failed: {e}")
             # Fallback
-            accuracy = metric.correct_answers / metric.total_questions
             metric.mastery_level = min(1.0, accuracy)
 
     def _ml_difficulty_adjustment(self, metric):
-        """Adjust difficulty using ML prediction"""
+        """Adjust difficulty using the offline-trained difficulty model"""
         try:
-            # Get recent performance history
-            recent_performance = PerformanceMetrics.objects.filter(
-                user=self.user
-            ).order_by('-last_practiced')[:10]
-            
-            if len(recent_performance) < 5:
+            if self.difficulty_adjuster is None:
                 return self._adjust_difficulty(metric)  # Fallback to rule-based
             
-            # Prepare training data
-            X = []
-            y = []
-            
-            for perf in recent_performance:
-                features = [
-                    perf.correct_answers / perf.total_questions,  # accuracy
-                    perf.average_time,
-                    perf.mastery_level,
-                    len(self.profile.strengths),  # Number of strengths
-                    len(self.profile.weaknesses),  # Number of weaknesses
-                    self.profile.learning_pace
-                ]
-                X.append(features)
-                y.append(perf.difficulty_level)
-            
-            # Train difficulty adjuster
-            X = np.array(X)
-            y = np.array(y)
-            
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X)
-            
-            self.difficulty_adjuster.fit(X_scaled, y)
-            
-            # Predict optimal difficulty
-            current_features = np.array([[
-                metric.correct_answers / metric.total_questions,
-                metric.average_time,
-                metric.mastery_level,
-                len(self.profile.strengths),
-                len(self.profile.weaknesses),
-                self.profile.learning_pace
-            ]])
-            
-            current_features_scaled = scaler.transform(current_features)
-            predicted_difficulty = self.difficulty_adjuster.predict(current_features_scaled)[0]
+            # Predict optimal difficulty (the pipeline scales features itself)
+            current_features = np.array([difficulty_features(metric, self.profile)])
+            predicted_difficulty = self.difficulty_adjuster.predict(current_features)[0]
             
             # Smooth the adjustment
             current_difficulty = metric.difficulty_level
@@ -278,46 +258,17 @@ class AdaptiveLearningEngine:
             self._adjust_difficulty(metric)  # Fallback
 
     def _update_learning_profile_clustered(self, metric):
-        """Update learning profile using clustering analysis"""
+        """Update learning profile from the learning-pattern cluster this performance falls in"""
         try:
-            # Get all performance data for clustering
-            all_performance = PerformanceMetrics.objects.filter(user=self.user)
-            
-            if len(all_performance) < 10:
+            if self.learning_style_classifier is None:
                 return self._update_learning_profile(metric)  # Fallback
             
-            # Prepare data for clustering
-            performance_data = []
-            for perf in all_performance:
-                performance_data.append([
-                    perf.correct_answers / perf.total_questions,  # accuracy
-                    perf.average_time,
-                    perf.mastery_level,
-                    perf.difficulty_level
-                ])
-            
-            X = np.array(performance_data)
-            
-            # Perform clustering to identify learning patterns
-            n_clusters = min(3, len(X))  # Maximum 3 clusters
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-            clusters = kmeans.fit_predict(X)
-            
-            # Analyze clusters to identify patterns
-            cluster_centers = kmeans.cluster_centers_
-            
             # Find which cluster this performance belongs to
-            current_performance = np.array([[
-                metric.correct_answers / metric.total_questions,
-                metric.average_time,
-                metric.mastery_level,
-                metric.difficulty_level
-            ]])
-            
-            current_cluster = kmeans.predict(current_performance)[0]
+            current_performance = np.array([pattern_features(metric)])
+            current_cluster = self.learning_style_classifier.predict(current_performance)[0]
             
             # Update profile based on cluster analysis
-            cluster_profile = cluster_centers[current_cluster]
+            cluster_profile = self.learning_style_classifier.cluster_centers_[current_cluster]
             
             # Adjust learning pace based on cluster
             if cluster_profile[1] < 45:  # Fast completion times
@@ -339,45 +290,13 @@ class AdaptiveLearningEngine:
             logger.error(f"Clustering analysis failed: {e}")
             self._update_learning_profile(metric)  # Fallback
 
-            # Adjust difficulty based on performance
-            self._adjust_difficulty(metric)
-
-            # Update learning profile
-            self._update_learning_profile(metric)
-
-            return metric
-
-        except Exception as e:
-            logger.error(f"Error analyzing performance: {e}")
-            return None
-
-    def analyze_performance_advanced(self, subject, topic, correct, time_taken, question_difficulty=1.0):
-        """Advanced performance analysis using ML algorithms"""
-        try:
-            metric, created = PerformanceMetrics.objects.get_or_create(
-                user=self.user,
-                subject=subject,
-                topic=topic,
-                defaults={'difficulty_level': question_difficulty}
-            )
-
-            # Update performance with advanced metrics
-            self._update_performance_with_ml(metric, correct, time_taken, question_difficulty)
-
-            # Adjust difficulty using ML prediction
-            self._ml_difficulty_adjustment(metric)
-
-            # Update learning profile with clustering analysis
-            self._update_learning_profile_clustered(metric)
-
-            return metric
-
-        except Exception as e:
-            logger.error(f"Error in advanced performance analysis: {e}")
-            return None
-
     def _adjust_difficulty(self, metric):
         """Adjust difficulty level based on performance"""
+        self._apply_difficulty(metric)
+        metric.save()
+
+    def _apply_difficulty(self, metric):
+        """Move the metric's difficulty level toward the student's performance without saving"""
         accuracy = metric.accuracy_rate
         avg_time = metric.average_time
 
@@ -390,8 +309,6 @@ class AdaptiveLearningEngine:
         elif accuracy < 0.7:  # Needs improvement
             metric.difficulty_level = max(0.1, metric.difficulty_level - 0.1)
 
-        metric.save()
-
     def _update_learning_profile(self, metric):
         """Update learning profile based on performance patterns"""
         # Analyze strengths and weaknesses
@@ -403,21 +320,26 @@ class AdaptiveLearningEngine:
             avg_time=Avg('average_time')
         )
 
-        if subject_performance['avg_accuracy'] and subject_performance['avg_accuracy'] > 0.8:
-            if metric.subject not in self.profile.strengths:
-                self.profile.strengths.append(metric.subject)
-        elif subject_performance['avg_accuracy'] and subject_performance['avg_accuracy'] < 0.6:
-            if metric.subject not in self.profile.weaknesses:
-                self.profile.weaknesses.append(metric.subject)
+        self._apply_subject_performance(
+            metric.subject, subject_performance['avg_accuracy'], subject_performance['avg_time']
+        )
+        self.profile.save()
+
+    def _apply_subject_performance(self, subject, avg_accuracy, avg_time):
+        """Update strengths, weaknesses and pace from a subject's aggregates without saving"""
+        if avg_accuracy and avg_accuracy > 0.8:
+            if subject not in self.profile.strengths:
+                self.profile.strengths.append(subject)
+        elif avg_accuracy and avg_accuracy < 0.6:
+            if subject not in self.profile.weaknesses:
+                self.profile.weaknesses.append(subject)
 
         # Adjust learning pace based on performance
-        if subject_performance['avg_time'] and subject_performance['avg_time'] < 45:
+        if avg_time and avg_time < 45:
             self.profile.learning_pace = min(2.0, self.profile.learning_pace + 0.1)
-        elif subject_performance['avg_time'] and subject_performance['avg_time'] > 90:
+        elif avg_time and avg_time > 90:
             self.profile.learning_pace = max(0.5, self.profile.learning_pace - 0.1)
 
-        self.profile.save()
-
     def get_next_recommendation(self):
         """Get the next recommended topic for the student"""
         try:
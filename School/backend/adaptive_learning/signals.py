@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import LearningProfile, AdaptivePath
+from .models import LearningProfile, AdaptivePath, PerformanceMetrics
+from .recommendation_cache import invalidate_recommendations
 
 User = get_user_model()
 
@@ -11,3 +12,9 @@ def create_learning_profile(sender, instance, created, **kwargs):
     if created:
         LearningProfile.objects.create(user=instance)
         AdaptivePath.objects.create(user=instance)
+
+@receiver([post_save, post_delete], sender=PerformanceMetrics)
+@receiver([post_save, post_delete], sender=LearningProfile)
+def invalidate_cached_recommendations(sender, instance, **kwargs):
+    """Recommendations depend on the student's profile and performance"""
+    invalidate_recommendations(instance.user_id)
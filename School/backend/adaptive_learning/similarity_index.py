@@ -0,0 +1,425 @@
+"""
+Precomputed nearest-neighbour index over learning profiles.
+
+Profiles are sharded by learning style and each student's top-K most similar
+peers within their shard are stored, so a recommendation request looks its
+neighbours up instead of scoring the whole table. The index is built offline
+(``manage.py build_recommendation_index``), persisted to disk, and kept current
+between builds by re-scoring only the profiles whose ``updated_at`` moved and
+dropping deleted ones.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from .models import LearningProfile
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_INDEX_PATH = getattr(settings, 'RECOMMENDATION_INDEX_PATH', 'recommendation_index.npz')
+RECOMMENDATION_INDEX_K = getattr(settings, 'RECOMMENDATION_INDEX_K', 50)
+
+PROFILE_FIELDS = ('user_id', 'learning_style', 'difficulty_preference', 'learning_pace', 'strengths')
+BUILD_CHUNK_SIZE = 256
+
+
+class ProfileMatrix:
+    """Learning profiles encoded as arrays for vectorized similarity
+
+    Categorical fields become integer codes, learning pace a float column and
+    strengths a multi-hot subject matrix. A pair scores one point each for
+    matching style, matching difficulty and paces within 0.2, plus the
+    strengths overlap when both have strengths, averaged over the factors.
+    """
+
+    def __init__(self, rows: List[Tuple] = ()):
+        self.styles_vocab: Dict[str, int] = {}
+        self.difficulty_vocab: Dict[str, int] = {}
+        self.subjects: Dict[str, int] = {}
+
+        self.user_ids = np.zeros(0, dtype=np.int64)
+        self.styles = np.zeros(0, dtype=np.int32)
+        self.difficulties = np.zeros(0, dtype=np.int32)
+        self.paces = np.zeros(0, dtype=np.float64)
+        self.strengths = np.zeros((0, 0), dtype=np.float32)
+        self.row_of: Dict[int, int] = {}
+        if rows:
+            self._extend(rows)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def strength_counts(self) -> np.ndarray:
+        return self.strengths.sum(axis=1)
+
+    def _encode(self, row: Tuple) -> Tuple[int, int, int, float, set]:
+        user_id, style, difficulty, pace, strengths = row
+        strengths = set(strengths or [])
+        for subject in strengths:
+            self.subjects.setdefault(subject, len(self.subjects))
+        return (
+            user_id,
+            self.styles_vocab.setdefault(style, len(self.styles_vocab)),
+            self.difficulty_vocab.setdefault(difficulty, len(self.difficulty_vocab)),
+            pace if pace is not None else 1.0,
+            strengths,
+        )
+
+    def _extend(self, rows: List[Tuple]):
+        encoded = [self._encode(row) for row in rows]
+        start = len(self)
+
+        self.user_ids = np.concatenate([self.user_ids, np.array([e[0] for e in encoded], dtype=np.int64)])
+        self.styles = np.concatenate([self.styles, np.array([e[1] for e in encoded], dtype=np.int32)])
+        self.difficulties = np.concatenate([self.difficulties, np.array([e[2] for e in encoded], dtype=np.int32)])
+        self.paces = np.concatenate([self.paces, np.array([e[3] for e in encoded], dtype=np.float64)])
+        self._grow_subjects()
+        self.strengths = np.vstack([self.strengths, np.zeros((len(encoded), len(self.subjects)), dtype=np.float32)])
+        for offset, e in enumerate(encoded):
+            self.row_of[e[0]] = start + offset
+            self.strengths[start + offset, [self.subjects[subject] for subject in e[4]]] = 1.0
+
+    def _grow_subjects(self):
+        missing = len(self.subjects) - self.strengths.shape[1]
+        if missing > 0:
+            self.strengths = np.hstack(
+                [self.strengths, np.zeros((self.strengths.shape[0], missing), dtype=np.float32)]
+            )
+
+    def upsert(self, row: Tuple) -> int:
+        """Insert or replace one profile row and return its index"""
+        i = self.row_of.get(row[0])
+        if i is None:
+            self._extend([row])
+            return self.row_of[row[0]]
+
+        user_id, style, difficulty, pace, strengths = self._encode(row)
+        self._grow_subjects()
+        self.styles[i] = style
+        self.difficulties[i] = difficulty
+        self.paces[i] = pace
+        self.strengths[i] = 0.0
+        self.strengths[i, [self.subjects[subject] for subject in strengths]] = 1.0
+        return i
+
+    def remove(self, user_id: int) -> Optional[int]:
+        """Drop a profile; later rows shift down by one"""
+        i = self.row_of.pop(user_id, None)
+        if i is None:
+            return None
+        self.user_ids = np.delete(self.user_ids, i)
+        self.styles = np.delete(self.styles, i)
+        self.difficulties = np.delete(self.difficulties, i)
+        self.paces = np.delete(self.paces, i)
+        self.strengths = np.delete(self.strengths, i, axis=0)
+        self.row_of = {uid: row for row, uid in enumerate(self.user_ids.tolist())}
+        return i
+
+    def similarity(self, profile: Dict[str, Any]) -> np.ndarray:
+        """Score a profile dict (as returned by _get_user_profile) against every row"""
+        score = (self.styles == self.styles_vocab.get(profile.get('learning_style'), -1)).astype(np.float64)
+        score += self.difficulties == self.difficulty_vocab.get(profile.get('preferred_difficulty'), -1)
+        score += np.abs(self.paces - profile.get('learning_pace', 1.0)) <= 0.2
+
+        # Strength overlap counts as a fourth factor only when both sides list strengths
+        strengths = set(profile.get('strengths') or [])
+        columns = [self.subjects[subject] for subject in strengths if subject in self.subjects]
+        counts = self.strength_counts
+        overlap = self.strengths[:, columns].sum(axis=1) if columns else np.zeros(len(self))
+        both = (counts > 0) & bool(strengths)
+        score += np.where(both, overlap / np.maximum(counts, len(strengths) or 1), 0.0)
+
+        return score / np.where(both, 4.0, 3.0)
+
+    def pairwise(self, rows: np.ndarray) -> np.ndarray:
+        """Score the given rows against every row (len(rows) x len(self))"""
+        score = (self.styles[rows, None] == self.styles[None, :]).astype(np.float32)
+        score += self.difficulties[rows, None] == self.difficulties[None, :]
+        score += np.abs(self.paces[rows, None] - self.paces[None, :]) <= 0.2
+
+        counts = self.strength_counts
+        overlap = self.strengths[rows] @ self.strengths.T
+        both = (counts[rows, None] > 0) & (counts[None, :] > 0)
+        largest = np.maximum(np.maximum(counts[rows, None], counts[None, :]), 1.0)
+        score += np.where(both, overlap / largest, 0.0)
+
+        return score / np.where(both, 4.0, 3.0)
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        return {
+            f'{prefix}user_ids': self.user_ids,
+            f'{prefix}styles': self.styles,
+            f'{prefix}difficulties': self.difficulties,
+            f'{prefix}paces': self.paces,
+            f'{prefix}strengths': self.strengths,
+            f'{prefix}vocab': np.array(json.dumps({
+                'styles': self.styles_vocab,
+                'difficulties': self.difficulty_vocab,
+                'subjects': self.subjects,
+            })),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str) -> 'ProfileMatrix':
+        matrix = cls()
+        vocab = json.loads(str(arrays[f'{prefix}vocab']))
+        matrix.styles_vocab = vocab['styles']
+        matrix.difficulty_vocab = vocab['difficulties']
+        matrix.subjects = vocab['subjects']
+        matrix.user_ids = arrays[f'{prefix}user_ids']
+        matrix.styles = arrays[f'{prefix}styles']
+        matrix.difficulties = arrays[f'{prefix}difficulties']
+        matrix.paces = arrays[f'{prefix}paces']
+        matrix.strengths = arrays[f'{prefix}strengths']
+        matrix.row_of = {user_id: i for i, user_id in enumerate(matrix.user_ids.tolist())}
+        return matrix
+
+
+class Shard:
+    """Profiles sharing one learning style and each one's top-K neighbours among them"""
+
+    def __init__(self, matrix: ProfileMatrix, k: int):
+        self.matrix = matrix
+        self.k = k
+        self.neighbour_ids = np.full((len(matrix), k), -1, dtype=np.int64)
+        self.neighbour_scores = np.full((len(matrix), k), -np.inf, dtype=np.float32)
+
+    def build(self):
+        """Score every pair in chunks and keep each row's K best"""
+        self._rescore(np.arange(len(self.matrix)))
+
+    def _rescore(self, rows: np.ndarray):
+        """Recompute the full top-K neighbour lists of the given rows"""
+        n = len(self.matrix)
+        k = min(self.k, n - 1)
+        self.neighbour_ids[rows] = -1
+        self.neighbour_scores[rows] = -np.inf
+        if k <= 0 or not len(rows):
+            return
+        for start in range(0, len(rows), BUILD_CHUNK_SIZE):
+            chunk = rows[start:start + BUILD_CHUNK_SIZE]
+            scores = self.matrix.pairwise(chunk)
+            scores[np.arange(len(chunk)), chunk] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            self.neighbour_ids[chunk, :k] = self.matrix.user_ids[top]
+            self.neighbour_scores[chunk, :k] = np.take_along_axis(scores, top, axis=1)
+
+    def _listing(self, user_id: int) -> np.ndarray:
+        """Rows that currently keep ``user_id`` as a neighbour"""
+        return np.flatnonzero((self.neighbour_ids == user_id).any(axis=1))
+
+    def update(self, row: Tuple):
+        """Re-score one profile against the shard and patch everyone's neighbour lists"""
+        user_id = row[0]
+        is_new = user_id not in self.matrix.row_of
+        i = self.matrix.upsert(row)
+        if is_new:
+            self.neighbour_ids = np.vstack([self.neighbour_ids, np.full((1, self.k), -1, dtype=np.int64)])
+            self.neighbour_scores = np.vstack(
+                [self.neighbour_scores, np.full((1, self.k), -np.inf, dtype=np.float32)]
+            )
+
+        scores = self.matrix.pairwise(np.array([i]))[0]
+        scores[i] = -np.inf
+
+        # Rows that listed this profile may now prefer a peer they never kept, so they are
+        # re-scored in full along with the profile itself
+        stale = self._listing(user_id)
+        self._forget(user_id)
+
+        # Every other row only changes if the new score beats its weakest neighbour
+        weakest = self.neighbour_scores.argmin(axis=1)
+        rows = np.flatnonzero(scores > self.neighbour_scores[np.arange(len(self.matrix)), weakest])
+        rows = np.setdiff1d(rows, np.append(stale, i))
+        self.neighbour_ids[rows, weakest[rows]] = user_id
+        self.neighbour_scores[rows, weakest[rows]] = scores[rows]
+
+        self._rescore(np.append(stale, i))
+
+    def remove(self, user_id: int):
+        i = self.matrix.remove(user_id)
+        if i is None:
+            return
+        self.neighbour_ids = np.delete(self.neighbour_ids, i, axis=0)
+        self.neighbour_scores = np.delete(self.neighbour_scores, i, axis=0)
+        # Refill the slot the removed profile leaves in its peers' lists
+        self._rescore(self._listing(user_id))
+
+    def _forget(self, user_id: int):
+        listed = self.neighbour_ids == user_id
+        self.neighbour_ids[listed] = -1
+        self.neighbour_scores[listed] = -np.inf
+
+    def neighbours(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        i = self.matrix.row_of[user_id]
+        return self.neighbour_ids[i], self.neighbour_scores[i]
+
+
+class SimilarityIndex:
+    """Top-K similar students per learning profile, sharded by learning style
+
+    Only students with the same learning style are compared, which is what
+    makes the index cheap to build; students with different styles can still
+    score above the recommendation threshold but are not considered.
+    """
+
+    def __init__(self, k: int = RECOMMENDATION_INDEX_K):
+        self.k = k
+        self.shards: Dict[str, Shard] = {}
+        self.shard_of: Dict[int, str] = {}
+        self.synced_at: Optional[datetime] = None
+        self.built_at: Optional[float] = None
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.shard_of)
+
+    @classmethod
+    def build(cls, k: int = RECOMMENDATION_INDEX_K) -> 'SimilarityIndex':
+        """Build the whole index from one query over LearningProfile"""
+        start_time = time.time()
+        index = cls(k)
+        state = LearningProfile.objects.aggregate(updated=Max('updated_at'))
+        by_style: Dict[str, List[Tuple]] = {}
+        for row in LearningProfile.objects.values_list(*PROFILE_FIELDS).iterator(chunk_size=2000):
+            by_style.setdefault(row[1], []).append(row)
+
+        for style, rows in by_style.items():
+            shard = Shard(ProfileMatrix(rows), k)
+            shard.build()
+            index.shards[style] = shard
+            for row in rows:
+                index.shard_of[row[0]] = style
+
+        index.synced_at = state['updated']
+        index.built_at = time.time()
+        logger.info(
+            f"Built recommendation index: {len(index)} profiles in {len(index.shards)} shards "
+            f"(k={k}) in {time.time() - start_time:.1f}s"
+        )
+        return index
+
+    def update(self, row: Tuple):
+        """Apply one changed profile row"""
+        user_id, style = row[0], row[1]
+        with self.lock:
+            previous = self.shard_of.get(user_id)
+            if previous is not None and previous != style:
+                self.shards[previous].remove(user_id)
+            if style not in self.shards:
+                self.shards[style] = Shard(ProfileMatrix(), self.k)
+            self.shards[style].update(row)
+            self.shard_of[user_id] = style
+
+    def refresh(self):
+        """Re-score profiles changed since the last sync and drop deleted ones"""
+        with self.lock:
+            state = LearningProfile.objects.aggregate(count=Count('id'), updated=Max('updated_at'))
+            if state['updated'] is not None and (self.synced_at is None or state['updated'] >= self.synced_at):
+                changed = LearningProfile.objects.values_list(*PROFILE_FIELDS)
+                if self.synced_at is not None:
+                    # >= rather than >: rows saved in the same instant as the last sync are re-applied, not missed
+                    changed = changed.filter(updated_at__gte=self.synced_at)
+                rows = list(changed)
+                for row in rows:
+                    self.update(row)
+                if rows:
+                    logger.info(f"Recommendation index: applied {len(rows)} profile updates")
+                self.synced_at = state['updated']
+
+            if state['count'] != len(self):
+                # Deletions don't move updated_at; find them by comparing ids
+                present = set(LearningProfile.objects.values_list('user_id', flat=True).iterator(chunk_size=5000))
+                deleted = [user_id for user_id in self.shard_of if user_id not in present]
+                for user_id in deleted:
+                    self.shards[self.shard_of.pop(user_id)].remove(user_id)
+                if deleted:
+                    logger.info(f"Recommendation index: removed {len(deleted)} deleted profiles")
+
+    def neighbours(self, user_id: int, limit: int, threshold: float) -> Optional[List[int]]:
+        """Most similar students above ``threshold``, or None if the user is not indexed"""
+        with self.lock:
+            style = self.shard_of.get(user_id)
+            if style is None:
+                return None
+            ids, scores = self.shards[style].neighbours(user_id)
+            keep = scores > threshold
+            ids, scores = ids[keep], scores[keep]
+            order = np.argsort(-scores, kind='stable')[:limit]
+            return ids[order].tolist()
+
+    def query(self, profile: Dict[str, Any], limit: int, threshold: float,
+              exclude: Optional[int] = None) -> List[int]:
+        """Score an unindexed profile against its style's shard"""
+        with self.lock:
+            shard = self.shards.get(profile.get('learning_style'))
+            if shard is None or not len(shard.matrix):
+                return []
+            scores = shard.matrix.similarity(profile)
+            if exclude is not None and exclude in shard.matrix.row_of:
+                scores[shard.matrix.row_of[exclude]] = -np.inf
+            candidates = np.flatnonzero(scores > threshold)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+            ranked = candidates[np.argsort(-scores[candidates], kind='stable')]
+            return shard.matrix.user_ids[ranked].tolist()
+
+    def save(self, path: str = RECOMMENDATION_INDEX_PATH):
+        """Write the index atomically as a single .npz file"""
+        with self.lock:
+            arrays = {
+                'meta': np.array(json.dumps({
+                    'k': self.k,
+                    'styles': list(self.shards),
+                    'synced_at': self.synced_at.isoformat() if self.synced_at else None,
+                    'built_at': self.built_at,
+                })),
+            }
+            for n, shard in enumerate(self.shards.values()):
+                arrays.update(shard.matrix.to_arrays(f'{n}/'))
+                arrays[f'{n}/neighbour_ids'] = shard.neighbour_ids
+                arrays[f'{n}/neighbour_scores'] = shard.neighbour_scores
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = RECOMMENDATION_INDEX_PATH) -> Optional['SimilarityIndex']:
+        """Read an index written by save(), or return None if there is none"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays['meta']))
+            index = cls(meta['k'])
+            for n, style in enumerate(meta['styles']):
+                shard = Shard(ProfileMatrix.from_arrays(arrays, f'{n}/'), index.k)
+                shard.neighbour_ids = arrays[f'{n}/neighbour_ids']
+                shard.neighbour_scores = arrays[f'{n}/neighbour_scores']
+                index.shards[style] = shard
+                for user_id in shard.matrix.user_ids.tolist():
+                    index.shard_of[user_id] = style
+        index.synced_at = datetime.fromisoformat(meta['synced_at']) if meta['synced_at'] else None
+        index.built_at = meta['built_at']
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                'profiles': len(self),
+                'k': self.k,
+                'shards': {style: len(shard.matrix) for style, shard in self.shards.items()},
+                'synced_at': self.synced_at.isoformat() if self.synced_at else None,
+                'built_at': self.built_at,
+            }
@@ -0,0 +1,151 @@
+import random
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from .similarity_index import ProfileMatrix, Shard
+
+STYLES = ['visual', 'auditory', 'kinesthetic']
+DIFFICULTIES = ['easy', 'medium', 'hard', 'adaptive']
+SUBJECTS = ['math', 'physics', 'chemistry', 'biology', 'history', 'art']
+
+
+def reference_similarity(profile1, profile2):
+    """Per-pair profile scoring that ProfileMatrix must reproduce."""
+    score = 0.0
+    total_factors = 0
+
+    if profile1.get('learning_style') == profile2.get('learning_style'):
+        score += 1.0
+    total_factors += 1
+
+    if profile1.get('preferred_difficulty') == profile2.get('preferred_difficulty'):
+        score += 1.0
+    total_factors += 1
+
+    if abs(profile1.get('learning_pace', 1.0) - profile2.get('learning_pace', 1.0)) <= 0.2:
+        score += 1.0
+    total_factors += 1
+
+    strengths1 = set(profile1.get('strengths', []))
+    strengths2 = set(profile2.get('strengths', []))
+    if strengths1 and strengths2:
+        score += len(strengths1 & strengths2) / max(len(strengths1), len(strengths2))
+        total_factors += 1
+
+    return score / total_factors
+
+
+def random_row(rng, user_id, styles=STYLES):
+    return (
+        user_id,
+        rng.choice(styles),
+        rng.choice(DIFFICULTIES),
+        round(rng.uniform(0.5, 1.5), 2),
+        rng.sample(SUBJECTS, rng.randint(0, 3)),
+    )
+
+
+def as_profile(row):
+    return {
+        'learning_style': row[1],
+        'preferred_difficulty': row[2],
+        'learning_pace': row[3],
+        'strengths': row[4],
+    }
+
+
+class ProfileMatrixTests(SimpleTestCase):
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.rows = [random_row(self.rng, user_id) for user_id in range(60)]
+        self.matrix = ProfileMatrix(self.rows)
+
+    def test_similarity_matches_reference(self):
+        for _ in range(20):
+            profile = as_profile(random_row(self.rng, -1))
+            expected = [reference_similarity(profile, as_profile(row)) for row in self.rows]
+            np.testing.assert_allclose(self.matrix.similarity(profile), expected, atol=1e-6)
+
+    def test_similarity_with_unknown_values(self):
+        profile = {'learning_style': 'reading', 'preferred_difficulty': 'expert',
+                   'learning_pace': 3.0, 'strengths': ['music']}
+        expected = [reference_similarity(profile, as_profile(row)) for row in self.rows]
+        np.testing.assert_allclose(self.matrix.similarity(profile), expected, atol=1e-6)
+
+    def test_pairwise_matches_reference(self):
+        rows = np.array([0, 5, 17, 59])
+        scores = self.matrix.pairwise(rows)
+        self.assertEqual(scores.shape, (len(rows), len(self.rows)))
+        for r, i in enumerate(rows):
+            expected = [reference_similarity(as_profile(self.rows[i]), as_profile(row)) for row in self.rows]
+            np.testing.assert_allclose(scores[r], expected, atol=1e-6)
+
+    def test_upsert_and_remove_keep_rows_aligned(self):
+        changed = random_row(self.rng, 10)
+        self.matrix.upsert(changed)
+        self.matrix.upsert(random_row(self.rng, 100))
+        self.matrix.remove(3)
+
+        self.assertNotIn(3, self.matrix.row_of)
+        self.assertEqual(len(self.matrix), 60)
+        i = self.matrix.row_of[10]
+        expected = [reference_similarity(as_profile(changed), as_profile(row))
+                    for row in self.rows if row[0] not in (3, 10)]
+        scores = np.delete(self.matrix.pairwise(np.array([i]))[0], [i, self.matrix.row_of[100]])
+        np.testing.assert_allclose(scores, expected, atol=1e-6)
+
+
+class ShardTests(SimpleTestCase):
+    def assert_matches_fresh_build(self, shard, rows, k):
+        fresh = Shard(ProfileMatrix(list(rows.values())), k)
+        fresh.build()
+        for user_id in rows:
+            # Ties make neighbour ids ambiguous, so compare the kept scores
+            np.testing.assert_allclose(
+                np.sort(shard.neighbours(user_id)[1]), np.sort(fresh.neighbours(user_id)[1]), atol=1e-6
+            )
+
+    def test_build_keeps_top_k(self):
+        rng = random.Random(3)
+        rows = [random_row(rng, user_id) for user_id in range(30)]
+        shard = Shard(ProfileMatrix(rows), 5)
+        shard.build()
+        for row in rows:
+            ids, scores = shard.neighbours(row[0])
+            self.assertNotIn(row[0], ids.tolist())
+            expected = sorted(
+                (reference_similarity(as_profile(row), as_profile(other)) for other in rows if other is not row),
+                reverse=True
+            )[:5]
+            np.testing.assert_allclose(np.sort(scores)[::-1], expected, atol=1e-6)
+
+    def test_incremental_updates_match_build(self):
+        rng = random.Random(1)
+        k = 5
+        rows = {user_id: random_row(rng, user_id, ['visual']) for user_id in range(40)}
+        shard = Shard(ProfileMatrix(list(rows.values())), k)
+        shard.build()
+
+        for _ in range(30):
+            user_id = rng.choice(list(rows))
+            rows[user_id] = random_row(rng, user_id, ['visual'])
+            shard.update(rows[user_id])
+        for user_id in rng.sample(list(rows), 5):
+            del rows[user_id]
+            shard.remove(user_id)
+        for user_id in range(100, 105):
+            rows[user_id] = random_row(rng, user_id, ['visual'])
+            shard.update(rows[user_id])
+
+        self.assert_matches_fresh_build(shard, rows, k)
+
+    def test_small_shard_grows_to_k(self):
+        rng = random.Random(5)
+        k = 4
+        rows = {}
+        shard = Shard(ProfileMatrix(), k)
+        for user_id in range(8):
+            rows[user_id] = random_row(rng, user_id, ['visual'])
+            shard.update(rows[user_id])
+        self.assert_matches_fresh_build(shard, rows, k)
@@ -8,6 +8,7 @@ from .services import AdaptiveLearningEngine
 from .serializers import (
     LearningProfileSerializer,
     PerformanceMetricsSerializer,
+    BulkAnswerSerializer,
     AdaptivePathSerializer,
     StudySessionSerializer,
     LearningGoalSerializer
@@ -50,7 +51,7 @@ class PerformanceMetricsViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        engine = AdaptiveLearningEngine(request.user)
+        engine = AdaptiveLearningEngine.for_request(request)
         metric = engine.analyze_performance(subject, topic, correct, time_taken)
 
         if metric:
@@ -62,6 +63,20 @@ class PerformanceMetricsViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['post'])
+    def bulk_update_performance(self, request):
+        """Update performance for a list of answers in one transaction."""
+        serializer = BulkAnswerSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        engine = AdaptiveLearningEngine.for_request(request)
+        metrics = engine.analyze_performance_batch(serializer.validated_data['answers'])
+
+        return Response({
+            'answers_processed': len(serializer.validated_data['answers']),
+            'metrics': self.get_serializer(metrics, many=True).data
+        })
+
 
 class AdaptivePathViewSet(viewsets.ModelViewSet):
     """Manage adaptive learning paths"""
@@ -78,7 +93,7 @@ class AdaptivePathViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def recommendation(self, request):
         """Get next learning recommendation"""
-        engine = AdaptiveLearningEngine(request.user)
+        engine = AdaptiveLearningEngine.for_request(request)
         recommendation = engine.get_next_recommendation()
         return Response(recommendation)
 
@@ -94,7 +109,7 @@ class AdaptivePathViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        engine = AdaptiveLearningEngine(request.user)
+        engine = AdaptiveLearningEngine.for_request(request)
         study_plan = engine.generate_study_plan(subject, duration_days)
         return Response({'study_plan': study_plan})
 
@@ -119,7 +134,7 @@ class AdaptivePathViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        engine = AdaptiveLearningEngine(request.user)
+        engine = AdaptiveLearningEngine.for_request(request)
         probability = engine.predict_success_probability(subject, target_date_obj)
         return Response({'success_probability': probability})
 
@@ -0,0 +1,247 @@
+"""
+Background AI chat generation.
+
+The chat view persists the user's message and queues an AIChatJob here so the
+web worker is released immediately. A small thread pool runs the LLM call,
+saves the reply, and pushes the finished job to the user's ``ai_chat_<id>``
+channel group; clients without a WebSocket poll the job endpoint instead.
+
+Jobs left behind by a process that died are failed as stale: running jobs
+once they have run for AI_CHAT_JOB_TIMEOUT, queued jobs only once they have
+waited longer than a full queue could take to drain (QUEUED_JOB_TIMEOUT), so
+jobs still queued in a live worker are never reaped. Stale jobs are swept when
+a process starts its pool and individually whenever one is polled.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import AIChatJob, AIConversation, AIMessage
+
+logger = logging.getLogger(__name__)
+
+AI_CHAT_WORKERS = getattr(settings, 'AI_CHAT_WORKERS', 4)
+AI_CHAT_MAX_PENDING = getattr(settings, 'AI_CHAT_MAX_PENDING', 64)
+AI_CHAT_JOB_TIMEOUT = getattr(settings, 'AI_CHAT_JOB_TIMEOUT', 300)
+# Worst case wait in a live process: every pending job ahead of this one runs to the timeout
+QUEUED_JOB_TIMEOUT = AI_CHAT_JOB_TIMEOUT * (-(-AI_CHAT_MAX_PENDING // AI_CHAT_WORKERS) + 1)
+
+
+class ChatQueueFull(Exception):
+    """Raised when too many chat jobs are already waiting in this process."""
+
+
+_executor = ThreadPoolExecutor(max_workers=AI_CHAT_WORKERS, thread_name_prefix='ai-chat')
+_pending = 0
+_pending_lock = threading.Lock()
+_reaped = False
+
+
+def user_group(user_id):
+    """Channel group that receives a user's chat job updates."""
+    return f'ai_chat_{user_id}'
+
+
+def enqueue_chat_job(user, conversation, user_message, context=''):
+    """Create a job for ``user_message`` and schedule it once the transaction commits."""
+    global _pending, _reaped
+    with _pending_lock:
+        if _pending >= AI_CHAT_MAX_PENDING:
+            raise ChatQueueFull(f"{_pending} chat jobs already pending")
+        _pending += 1
+        first_job = not _reaped
+        _reaped = True
+
+    if first_job:
+        # Jobs orphaned by a previous process would otherwise stay queued forever
+        try:
+            reap_stale_jobs()
+        except Exception as e:
+            logger.warning(f"Failed to reap stale chat jobs: {e}")
+
+    try:
+        job = AIChatJob.objects.create(
+            user=user,
+            conversation=conversation,
+            user_message=user_message,
+            context=context or ''
+        )
+    except Exception:
+        _release_slot()
+        raise
+    transaction.on_commit(lambda: _executor.submit(_run_job, job.id))
+    return job
+
+
+def _stale_jobs():
+    now = timezone.now()
+    return AIChatJob.objects.filter(
+        Q(status='running', started_at__lt=now - timedelta(seconds=AI_CHAT_JOB_TIMEOUT)) |
+        Q(status='queued', created_at__lt=now - timedelta(seconds=QUEUED_JOB_TIMEOUT))
+    )
+
+
+def reap_stale_jobs():
+    """Fail every job that has been running or queued for longer than its timeout."""
+    reaped = list(_stale_jobs().values_list('id', flat=True))
+    if reaped:
+        _stale_jobs().filter(id__in=reaped).update(
+            status='failed', error='Timed out', completed_at=timezone.now()
+        )
+        logger.warning(f"Failed {len(reaped)} stale chat jobs")
+        for job in AIChatJob.objects.filter(id__in=reaped, status='failed'):
+            notify(job)
+    return len(reaped)
+
+
+def expire_if_stale(job):
+    """Fail ``job`` if it is stale; returns the job as it now stands."""
+    if job.status in ('queued', 'running') and _stale_jobs().filter(id=job.id).update(
+        status='failed', error='Timed out', completed_at=timezone.now()
+    ):
+        job.refresh_from_db()
+        notify(job)
+    return job
+
+
+def cancel_chat_job(job):
+    """Cancel a job that has not finished; a reply that arrives later is discarded."""
+    cancelled = AIChatJob.objects.filter(
+        id=job.id, status__in=['queued', 'running']
+    ).update(status='cancelled', completed_at=timezone.now())
+    job.refresh_from_db()
+    if cancelled:
+        notify(job)
+    return bool(cancelled)
+
+
+def job_payload(job):
+    """Serialize a job for the poll endpoint and WebSocket updates."""
+    from .views import AIChatView
+
+    payload = {
+        'job_id': job.id,
+        'status': job.status,
+        'conversation_id': job.conversation_id,
+        'user_message_id': job.user_message_id,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'completed_at': job.completed_at.isoformat() if job.completed_at else None,
+    }
+    if job.status == 'completed' and job.assistant_message is not None:
+        ai_msg = job.assistant_message
+        payload.update({
+            'response': ai_msg.content,
+            'message_id': ai_msg.id,
+            'tokens_used': ai_msg.tokens_used or 0,
+            'response_time': float(ai_msg.response_time or 0),
+            'service_type': job.service_type,
+            'model': ai_msg.model_used,
+            'suggestions': AIChatView.generate_suggestions(ai_msg.content)
+        })
+    elif job.status == 'failed':
+        payload['error'] = job.error
+    return payload
+
+
+def notify(job):
+    """Push the job's current state to the owner's WebSocket group."""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            user_group(job.user_id),
+            {'type': 'chat_job_update', 'job': job_payload(job)}
+        )
+    except Exception as e:
+        logger.warning(f"Failed to publish chat job {job.id}: {e}")
+
+
+def save_ai_message(conversation, ai_response, tokens_used, response_time, model_used='gpt-3.5-turbo'):
+    """Persist an assistant reply and bump the conversation counters in one UPDATE."""
+    ai_msg = AIMessage.objects.create(
+        conversation=conversation,
+        message_type='assistant',
+        content=ai_response,
+        tokens_used=tokens_used,
+        model_used=model_used,
+        response_time=response_time,
+        word_count=len(ai_response.split()),
+        character_count=len(ai_response)
+    )
+
+    now = timezone.now()
+    AIConversation.objects.filter(id=conversation.id).update(
+        total_messages=F('total_messages') + 2,
+        last_message_at=now,
+        updated_at=now
+    )
+    return ai_msg
+
+
+def _release_slot():
+    global _pending
+    with _pending_lock:
+        _pending -= 1
+
+
+def _run_job(job_id):
+    close_old_connections()
+    try:
+        _process_job(job_id)
+    except Exception as e:
+        logger.error(f"Chat job {job_id} crashed: {e}")
+        AIChatJob.objects.filter(id=job_id, status__in=['queued', 'running']).update(
+            status='failed', error=str(e)[:1000], completed_at=timezone.now()
+        )
+        job = AIChatJob.objects.filter(id=job_id).first()
+        if job is not None:
+            notify(job)
+    finally:
+        _release_slot()
+        close_old_connections()
+
+
+def _process_job(job_id):
+    from .views import AIChatView
+
+    # Claim the job; a cancelled job is never started
+    claimed = AIChatJob.objects.filter(id=job_id, status='queued').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return
+
+    job = AIChatJob.objects.select_related(
+        'conversation__course', 'conversation__lesson', 'user_message'
+    ).get(id=job_id)
+    notify(job)
+
+    ai_response, tokens_used, response_time, service_type = AIChatView().generate_ai_response(
+        job.user_message.content, job.conversation, job.context
+    )
+
+    with transaction.atomic():
+        job = AIChatJob.objects.select_for_update().get(id=job_id)
+        if job.status != 'running':
+            # Cancelled while the model was generating
+            logger.info(f"Discarding reply for cancelled chat job {job_id}")
+            return
+
+        job.assistant_message = save_ai_message(job.conversation, ai_response, tokens_used, response_time)
+        job.service_type = service_type
+        job.status = 'completed'
+        job.completed_at = timezone.now()
+        job.save(update_fields=['assistant_message', 'service_type', 'status', 'completed_at'])
+
+    notify(job)
@@ -0,0 +1,89 @@
+import json
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from django.utils import timezone
+from .models import AIChatJob
+from . import chat_jobs
+
+
+class AIChatConsumer(AsyncWebsocketConsumer):
+    """WebSocket consumer delivering background AI chat job updates."""
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.user_id = user.id
+        self.group_name = chat_jobs.user_group(self.user_id)
+
+        # Join the user's job group
+        await self.channel_layer.group_add(
+            self.group_name,
+            self.channel_name
+        )
+
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(
+                self.group_name,
+                self.channel_name
+            )
+
+    async def receive(self, text_data):
+        data = json.loads(text_data)
+        message_type = data.get('type')
+
+        if message_type == 'ping':
+            await self.send(text_data=json.dumps({
+                'type': 'pong',
+                'timestamp': timezone.now().isoformat()
+            }))
+        elif message_type == 'job_status':
+            await self.handle_job_status(data)
+        elif message_type == 'cancel':
+            await self.handle_cancel(data)
+
+    async def handle_job_status(self, data):
+        """Send the current state of a job, e.g. after reconnecting."""
+        payload = await self.get_job_payload(data.get('job_id'))
+        await self.send_job(payload)
+
+    async def handle_cancel(self, data):
+        """Cancel one of the user's jobs; the update arrives through the group."""
+        cancelled = await self.cancel_job(data.get('job_id'))
+        if not cancelled:
+            await self.send_job(await self.get_job_payload(data.get('job_id')))
+
+    async def chat_job_update(self, event):
+        """Send job update to WebSocket."""
+        await self.send_job(event['job'])
+
+    async def send_job(self, payload):
+        if payload is None:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Job not found'
+            }))
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'chat_job_update',
+            'job': payload
+        }))
+
+    @database_sync_to_async
+    def get_job_payload(self, job_id):
+        """Load one of the user's jobs as a payload."""
+        job = AIChatJob.objects.select_related('assistant_message').filter(
+            id=job_id, user_id=self.user_id
+        ).first()
+        return chat_jobs.job_payload(chat_jobs.expire_if_stale(job)) if job else None
+
+    @database_sync_to_async
+    def cancel_job(self, job_id):
+        """Cancel one of the user's jobs."""
+        job = AIChatJob.objects.filter(id=job_id, user_id=self.user_id).first()
+        return bool(job) and chat_jobs.cancel_chat_job(job)
@@ -81,6 +81,54 @@ class AIMessage(models.Model):
         return f"{self.message_type}: {self.content[:50]}"
 
 
+class AIChatJob(models.Model):
+    """Model for background AI chat generation jobs."""
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ai_chat_jobs')
+    conversation = models.ForeignKey(AIConversation, on_delete=models.CASCADE, related_name='chat_jobs')
+    user_message = models.ForeignKey(AIMessage, on_delete=models.CASCADE, related_name='chat_jobs')
+    assistant_message = models.ForeignKey(
+        AIMessage,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='answered_jobs'
+    )
+    context = models.TextField(_('context'), blank=True)
+    status = models.CharField(_('status'), max_length=20, choices=STATUS_CHOICES, default='queued')
+    service_type = models.CharField(_('service type'), max_length=20, blank=True)
+    error = models.TextField(_('error'), blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(_('created at'), auto_now_add=True)
+    started_at = models.DateTimeField(_('started at'), blank=True, null=True)
+    completed_at = models.DateTimeField(_('completed at'), blank=True, null=True)
+
+    class Meta:
+        verbose_name = _('AI chat job')
+        verbose_name_plural = _('AI chat jobs')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Chat job {self.id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+
 class AIPromptTemplate(models.Model):
     """Model for AI prompt templates."""
 
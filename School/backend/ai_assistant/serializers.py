@@ -185,6 +185,9 @@ class AIChatRequestSerializer(serializers.Serializer):
     course_id = serializers.IntegerField(required=False)
     lesson_id = serializers.IntegerField(required=False)
     context = serializers.CharField(max_length=500, required=False)
+    stream = serializers.BooleanField(required=False, default=False)
+    # Queue generation and return a job instead of waiting (defaults to settings.AI_CHAT_BACKGROUND)
+    background = serializers.BooleanField(required=False, allow_null=True, default=None)
 
     def validate_conversation_id(self, value):
         if value:
@@ -10,6 +10,7 @@ urlpatterns = [
 
     # AI Chat
     path('chat/', views.AIChatView.as_view(), name='ai-chat'),
+    path('chat/jobs/<int:pk>/', views.AIChatJobDetailView.as_view(), name='ai-chat-job'),
 
     # AI Prompt Templates
     path('prompt-templates/', views.AIPromptTemplateListView.as_view(), name='prompt-template-list'),
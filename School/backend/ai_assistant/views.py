@@ -3,11 +3,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.db import models
 from .models import (
     AIConversation, AIMessage, AIPromptTemplate, AIStudyPlan,
-    AIQuiz, AIQuizAttempt
+    AIQuiz, AIQuizAttempt, AIChatJob
 )
 from .serializers import (
     AIConversationSerializer, AIConversationCreateSerializer, AIMessageSerializer,
@@ -19,7 +20,8 @@ from .serializers import (
 from django.conf import settings
 import json
 from datetime import timedelta
-from ai_service_client import get_ai_response
+from ai_service_client import ai_client, get_ai_response, stream_ai_response
+from . import chat_jobs
 import logging
 
 logger = logging.getLogger(__name__)
@@ -70,8 +72,14 @@ class AIChatView(APIView):
 
     permission_classes = [permissions.IsAuthenticated]
 
+    # On llama.cpp the history window starts on a multiple of HISTORY_STEP so
+    # the prompt prefix stays identical between turns and the server's slot
+    # cache can reuse it. Other backends get a plain sliding window.
+    HISTORY_WINDOW = 10
+    HISTORY_STEP = 10
+
     def post(self, request):
-        serializer = AIChatRequestSerializer(data=request.data)
+        serializer = AIChatRequestSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
 
         user_message = serializer.validated_data['message']
@@ -104,26 +112,37 @@ class AIChatView(APIView):
             character_count=len(user_message)
         )
 
+        if serializer.validated_data.get('stream'):
+            response = StreamingHttpResponse(
+                self.stream_ai_response(conversation, context),
+                content_type='text/event-stream'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        background = serializer.validated_data.get('background')
+        if background is None:
+            background = getattr(settings, 'AI_CHAT_BACKGROUND', False)
+        if background:
+            # Hand generation to the chat worker pool; the reply arrives over
+            # the ai_chat WebSocket or from the job endpoint.
+            try:
+                job = chat_jobs.enqueue_chat_job(request.user, conversation, user_msg, context)
+            except chat_jobs.ChatQueueFull:
+                return Response(
+                    {'error': 'Too many AI chat requests in progress. Please retry shortly.'},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                    headers={'Retry-After': '5'}
+                )
+            return Response(chat_jobs.job_payload(job), status=status.HTTP_202_ACCEPTED)
+
         # Generate AI response
         ai_response, tokens_used, response_time, service_type = self.generate_ai_response(
             user_message, conversation, context
         )
 
-        # Save AI message
-        ai_msg = AIMessage.objects.create(
-            conversation=conversation,
-            message_type='assistant',
-            content=ai_response,
-            tokens_used=tokens_used,
-            model_used='gpt-3.5-turbo',
-            response_time=response_time,
-            word_count=len(ai_response.split()),
-            character_count=len(ai_response)
-        )
-
-        # Update conversation
-        conversation.total_messages += 2
-        conversation.save()
+        ai_msg = self.save_ai_message(conversation, ai_response, tokens_used, response_time)
 
         response_data = {
             'response': ai_response,
@@ -141,31 +160,49 @@ class AIChatView(APIView):
 
         return Response(response_serializer.validated_data)
 
+    def save_ai_message(self, conversation, ai_response, tokens_used, response_time):
+        """Persist the assistant reply and bump the conversation counters."""
+        return chat_jobs.save_ai_message(conversation, ai_response, tokens_used, response_time)
+
+    def cache_scope(self, conversation):
+        """Students in the same course share cached answers to near-identical questions."""
+        return f"course:{conversation.course_id}" if conversation.course_id else "global"
+
+    def build_messages(self, conversation, context):
+        """Build the prompt: system message followed by recent conversation history."""
+        messages = []
+        total = conversation.messages.count()
+        step = self.HISTORY_STEP if ai_client.ai_mode == 'llamacpp' else 1
+        start = max(0, total - self.HISTORY_WINDOW) // step * step
+        recent_messages = conversation.messages.order_by('created_at')[start:]
+
+        # Add system message
+        system_prompt = self.build_system_prompt(conversation, context)
+        messages.append({"role": "system", "content": system_prompt})
+
+        # Add conversation history
+        for msg in recent_messages:
+            role = "user" if msg.message_type == "user" else "assistant"
+            messages.append({"role": role, "content": msg.content})
+
+        return messages
+
     def generate_ai_response(self, user_message, conversation, context):
         """Generate AI response using AI service with OpenAI fallback."""
         import time
         start_time = time.time()
 
         try:
-            # Build conversation history
-            messages = []
-            recent_messages = conversation.messages.order_by('-created_at')[:10]
-
-            # Add system message
-            system_prompt = self.build_system_prompt(conversation, context)
-            messages.append({"role": "system", "content": system_prompt})
-
-            # Add conversation history (in reverse order)
-            for msg in reversed(recent_messages):
-                role = "user" if msg.message_type == "user" else "assistant"
-                messages.append({"role": role, "content": msg.content})
+            messages = self.build_messages(conversation, context)
 
             # Use our AI service client with fallback
             ai_response, tokens_used, response_time, service_type = get_ai_response(
                 messages=messages,
                 model="gpt-3.5-turbo",  # Default model, will use local if available
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                conversation_id=str(conversation.id),
+                cache_scope=self.cache_scope(conversation)
             )
 
             # Adjust response time if it wasn't set by the service
@@ -180,6 +217,48 @@ class AIChatView(APIView):
             fallback_response = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
             return fallback_response, 0, round(time.time() - start_time, 2), 'fallback'
 
+    def stream_ai_response(self, conversation, context):
+        """Relay AI tokens as Server-Sent Events and save the full reply once it completes."""
+        tokens = []
+        summary = {'tokens_used': 0, 'response_time': 0, 'service_type': 'fallback'}
+
+        try:
+            messages = self.build_messages(conversation, context)
+            for event in stream_ai_response(
+                messages=messages,
+                model="gpt-3.5-turbo",
+                temperature=0.7,
+                max_tokens=1000,
+                conversation_id=str(conversation.id),
+                cache_scope=self.cache_scope(conversation)
+            ):
+                if event.get('done'):
+                    summary = event
+                    break
+                tokens.append(event['token'])
+                yield f"data: {json.dumps({'token': event['token']})}\n\n"
+        except Exception as e:
+            logger.error(f"AI response streaming failed: {e}")
+            if not tokens:
+                tokens.append("I'm sorry, I'm having trouble processing your request right now. Please try again later.")
+                yield f"data: {json.dumps({'token': tokens[0]})}\n\n"
+
+        ai_response = ''.join(tokens)
+        ai_msg = self.save_ai_message(
+            conversation, ai_response, summary.get('tokens_used', 0), summary.get('response_time', 0)
+        )
+
+        yield "data: {}\n\n".format(json.dumps({
+            'done': True,
+            'conversation_id': conversation.id,
+            'message_id': ai_msg.id,
+            'tokens_used': summary.get('tokens_used', 0),
+            'response_time': summary.get('response_time', 0),
+            'service_type': summary.get('service_type', 'fallback'),
+            'model': 'gpt-3.5-turbo',
+            'suggestions': self.generate_suggestions(ai_response)
+        }))
+
     def build_system_prompt(self, conversation, context):
         """Build system prompt for AI."""
         base_prompt = """You are an AI learning assistant for OpenEdTex, an educational platform.
@@ -201,7 +280,8 @@ class AIChatView(APIView):
 
         return base_prompt
 
-    def generate_suggestions(self, ai_response):
+    @staticmethod
+    def generate_suggestions(ai_response):
         """Generate follow-up suggestions."""
         suggestions = []
         response_lower = ai_response.lower()
@@ -218,6 +298,30 @@ class AIChatView(APIView):
         return suggestions[:3]  # Limit to 3 suggestions
 
 
+class AIChatJobDetailView(APIView):
+    """View for polling a background AI chat job."""
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        job = get_object_or_404(
+            AIChatJob.objects.select_related('assistant_message'),
+            id=pk,
+            user=request.user
+        )
+        return Response(chat_jobs.job_payload(chat_jobs.expire_if_stale(job)))
+
+    def delete(self, request, pk):
+        """Cancel the job if it has not finished yet."""
+        job = get_object_or_404(AIChatJob, id=pk, user=request.user)
+        if not chat_jobs.cancel_chat_job(job):
+            return Response(
+                {'error': f'Job already {job.status}.', **chat_jobs.job_payload(job)},
+                status=status.HTTP_409_CONFLICT
+            )
+        return Response(chat_jobs.job_payload(job))
+
+
 class AIPromptTemplateListView(generics.ListAPIView):
     """View for listing AI prompt templates."""
 
@@ -12,7 +12,8 @@ from datetime import datetime
 import openai
 from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
 import torch
-from django.core.cache import cache
+
+from semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,9 @@ class ContentGenerator:
         self.assignment_generator = None
         self.summarizer = None
 
+        # Near-identical requests (same type, grade and settings) reuse earlier results
+        self.cache = SemanticCache("content")
+
         self._initialize_models()
 
     def _initialize_models(self):
@@ -72,11 +76,12 @@ class ContentGenerator:
             logger.error(f"Failed to initialize content generation models: {e}")
 
     def generate_lesson(self, topic: str, grade_level: str, learning_objectives: List[str],
-                       duration: int = 45, difficulty: str = "intermediate") -> Dict[str, Any]:
+                       duration: int = 45, difficulty: str = "intermediate",
+                       scope: Optional[str] = None) -> Dict[str, Any]:
         """Generate a complete lesson plan"""
 
-        cache_key = f"lesson_{topic}_{grade_level}_{difficulty}_{duration}"
-        cached_result = cache.get(cache_key)
+        cache_params = {"type": "lesson", "grade_level": grade_level, "difficulty": difficulty, "duration": duration}
+        cached_result = self.cache.lookup(topic, scope, cache_params)
         if cached_result:
             return cached_result
 
@@ -110,7 +115,7 @@ class ContentGenerator:
             lesson_data['quality_score'] = quality_score
 
             # Cache the result
-            cache.set(cache_key, lesson_data, timeout=3600)  # Cache for 1 hour
+            self.cache.store(topic, lesson_data, scope, cache_params)
 
             return lesson_data
 
@@ -119,14 +124,16 @@ class ContentGenerator:
             return {"error": str(e)}
 
     def generate_quiz(self, topic: str, grade_level: str, num_questions: int = 10,
-                     difficulty: str = "intermediate", question_types: List[str] = None) -> Dict[str, Any]:
+                     difficulty: str = "intermediate", question_types: List[str] = None,
+                     scope: Optional[str] = None) -> Dict[str, Any]:
         """Generate a quiz with various question types"""
 
         if question_types is None:
             question_types = ["multiple_choice", "true_false", "short_answer"]
 
-        cache_key = f"quiz_{topic}_{grade_level}_{difficulty}_{num_questions}"
-        cached_result = cache.get(cache_key)
+        cache_params = {"type": "quiz", "grade_level": grade_level, "difficulty": difficulty,
+                        "num_questions": num_questions, "question_types": sorted(question_types)}
+        cached_result = self.cache.lookup(topic, scope, cache_params)
         if cached_result:
             return cached_result
 
@@ -160,7 +167,7 @@ class ContentGenerator:
             quiz_data['quality_score'] = quality_score
 
             # Cache the result
-            cache.set(cache_key, quiz_data, timeout=3600)
+            self.cache.store(topic, quiz_data, scope, cache_params)
 
             return quiz_data
 
@@ -169,11 +176,13 @@ class ContentGenerator:
             return {"error": str(e)}
 
     def generate_assignment(self, topic: str, grade_level: str, assignment_type: str = "homework",
-                          duration: int = 60, difficulty: str = "intermediate") -> Dict[str, Any]:
+                          duration: int = 60, difficulty: str = "intermediate",
+                          scope: Optional[str] = None) -> Dict[str, Any]:
         """Generate assignments and projects"""
 
-        cache_key = f"assignment_{topic}_{grade_level}_{assignment_type}_{difficulty}_{duration}"
-        cached_result = cache.get(cache_key)
+        cache_params = {"type": "assignment", "grade_level": grade_level, "assignment_type": assignment_type,
+                        "difficulty": difficulty, "duration": duration}
+        cached_result = self.cache.lookup(topic, scope, cache_params)
         if cached_result:
             return cached_result
 
@@ -203,7 +212,7 @@ class ContentGenerator:
             assignment_data['quality_score'] = quality_score
 
             # Cache the result
-            cache.set(cache_key, assignment_data, timeout=3600)
+            self.cache.store(topic, assignment_data, scope, cache_params)
 
             return assignment_data
 
@@ -212,11 +221,11 @@ class ContentGenerator:
             return {"error": str(e)}
 
     def generate_study_guide(self, topic: str, grade_level: str, key_concepts: List[str],
-                           study_time: int = 30) -> Dict[str, Any]:
+                           study_time: int = 30, scope: Optional[str] = None) -> Dict[str, Any]:
         """Generate study guides and review materials"""
 
-        cache_key = f"study_guide_{topic}_{grade_level}_{study_time}"
-        cached_result = cache.get(cache_key)
+        cache_params = {"type": "study_guide", "grade_level": grade_level, "study_time": study_time}
+        cached_result = self.cache.lookup(topic, scope, cache_params)
         if cached_result:
             return cached_result
 
@@ -247,7 +256,7 @@ class ContentGenerator:
             guide_data = self._parse_study_guide_content(content, topic, grade_level, key_concepts, study_time)
 
             # Cache the result
-            cache.set(cache_key, guide_data, timeout=3600)
+            self.cache.store(topic, guide_data, scope, cache_params)
 
             return guide_data
 
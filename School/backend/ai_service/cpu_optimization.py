@@ -0,0 +1,121 @@
+"""
+CPU inference optimizations for OpenEdTex AI Service
+Dynamic int8 quantization and ONNX Runtime export for GPU-less AI nodes
+"""
+
+import os
+import shutil
+import logging
+from typing import Any, Dict
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+try:
+    from optimum.onnxruntime import (
+        ORTModelForSequenceClassification,
+        ORTModelForSeq2SeqLM,
+        ORTModelForImageClassification,
+        ORTModelForVision2Seq,
+    )
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+OPTIMIZATION_MODES = ("none", "int8", "onnx")
+
+# Applied to every CPU model unless overridden per model
+DEFAULT_CPU_OPTIMIZATION = os.getenv("HF_CPU_OPTIMIZATION", "none")
+
+# Per-model overrides: "model=mode,model=mode"
+MODEL_OPTIMIZATIONS = os.getenv("HF_MODEL_OPTIMIZATIONS", "")
+
+# Exported ONNX graphs are kept here so a model is only exported once
+ONNX_CACHE_DIR = os.getenv("HF_ONNX_CACHE_DIR", "./models/onnx")
+
+# Tasks each mode knows how to optimize
+ONNX_TASKS = ("sentiment-analysis", "summarization", "image-classification", "ocr")
+INT8_TASKS = ("sentiment-analysis", "summarization", "image-classification", "ocr", "object-detection")
+
+
+def parse_model_optimizations(value: str) -> Dict[str, str]:
+    """Parse HF_MODEL_OPTIMIZATIONS into {model_name: mode}"""
+    overrides = {}
+    for entry in value.split(","):
+        model_name, _, mode = entry.strip().rpartition("=")
+        if not model_name:
+            continue
+        if mode not in OPTIMIZATION_MODES:
+            logger.warning(f"Ignoring unknown optimization {mode} for {model_name}")
+            continue
+        overrides[model_name] = mode
+    return overrides
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Dynamically quantize Linear layers to int8 for CPU inference"""
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_onnx_model(model_name: str, task: str) -> Any:
+    """Load a model on ONNX Runtime, exporting it into ONNX_CACHE_DIR the first time"""
+    if not ONNX_AVAILABLE:
+        raise ValueError("ONNX Runtime optimization requires optimum[onnxruntime]")
+
+    model_classes = {
+        "sentiment-analysis": ORTModelForSequenceClassification,
+        "summarization": ORTModelForSeq2SeqLM,
+        "image-classification": ORTModelForImageClassification,
+        "ocr": ORTModelForVision2Seq,
+    }
+    if task not in model_classes:
+        raise ValueError(f"ONNX export is not supported for task: {task}")
+
+    model_class = model_classes[task]
+    export_dir = os.path.join(ONNX_CACHE_DIR, task, model_name.replace("/", "--"))
+    if os.path.isdir(export_dir):
+        logger.info(f"Loading cached ONNX export of {model_name} for {task}")
+        return model_class.from_pretrained(export_dir)
+
+    logger.info(f"Exporting {model_name} to ONNX for {task}")
+    model = model_class.from_pretrained(model_name, export=True)
+    # Save beside the final directory and rename, so a crash never leaves a partial export to load
+    tmp_dir = f"{export_dir}.tmp-{os.getpid()}"
+    try:
+        model.save_pretrained(tmp_dir)
+        os.replace(tmp_dir, export_dir)
+    except OSError as e:
+        logger.warning(f"Could not cache ONNX export of {model_name}: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return model
+
+
+def supports(mode: str, task: str) -> bool:
+    if mode == "int8":
+        return task in INT8_TASKS
+    if mode == "onnx":
+        return ONNX_AVAILABLE and task in ONNX_TASKS
+    return True
+
+
+def output_agreement(baseline: Dict[str, Any], candidate: Dict[str, Any]) -> float:
+    """How closely an optimized result matches the float32 one, from 0 to 1"""
+    if "error" in baseline or "error" in candidate:
+        return 0.0
+    if "label" in baseline:
+        return 1.0 if baseline["label"] == candidate.get("label") else 0.0
+    if "prediction" in baseline:
+        return 1.0 if baseline["prediction"] == candidate.get("prediction") else 0.0
+
+    # Generated text (summaries, OCR): token overlap
+    for field in ("summary", "text"):
+        if field in baseline:
+            expected = set(baseline[field].lower().split())
+            actual = set(str(candidate.get(field, "")).lower().split())
+            if not expected and not actual:
+                return 1.0
+            return len(expected & actual) / max(len(expected | actual), 1)
+
+    return 1.0 if baseline == candidate else 0.0
@@ -64,12 +64,15 @@ class CurriculumConverter:
         self.ner_model = None
         self.ner_tokenizer = None
 
-        # Download NLTK data
-        try:
-            nltk.download('punkt', quiet=True)
-            nltk.download('stopwords', quiet=True)
-        except:
-            pass
+        # Download NLTK data only when it is not already installed
+        for resource, path in (('punkt', 'tokenizers/punkt'), ('stopwords', 'corpora/stopwords')):
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                try:
+                    nltk.download(resource, quiet=True)
+                except:
+                    pass
 
         self._load_models()
 
@@ -0,0 +1,214 @@
+"""
+Embedding service for OpenEdTex AI Service
+Batched local sentence-transformer embeddings with a persistent vector cache
+keyed by content hash
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_MAX_TEXTS = int(os.getenv("EMBEDDING_MAX_TEXTS", "512"))  # per request
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./models/embedding_cache.sqlite3")
+# Extra sentence-transformer models requests may name, besides EMBEDDING_MODEL and registered ones
+EMBEDDING_ALLOWED_MODELS = {
+    name.strip() for name in os.getenv("EMBEDDING_ALLOWED_MODELS", "").split(",") if name.strip()
+}
+
+
+class LocalEmbedder:
+    """Sentence-transformer loaded on first use; returns unit-length vectors"""
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = None
+        self.lock = threading.Lock()
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        if self.model is None:
+            with self.lock:
+                if self.model is None:
+                    from sentence_transformers import SentenceTransformer
+                    logger.info(f"Loading embedding model: {self.model_name}")
+                    self.model = SentenceTransformer(self.model_name, device="cpu")
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        ).astype(np.float32)
+
+
+# Shared by every cache and endpoint in the process so the model is loaded once
+local_embedder = LocalEmbedder()
+
+
+def content_hash(model_name: str, text: str) -> str:
+    """Cache key for one text under one model"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class VectorCache:
+    """Persistent content-hash -> vector store backed by SQLite
+
+    Vectors are stored as raw float32 bytes. Each thread gets its own
+    connection; WAL mode lets readers run while a batch is being written.
+    Per-model vector counts are read once at startup and then kept in
+    memory, so stats() never scans the table.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.counts_lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.counts: Dict[str, int] = dict(self._connection().execute(
+            "SELECT model, COUNT(*) FROM embeddings GROUP BY model"
+        ).fetchall())
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        conn = self._connection()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, model_name: str, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        now = time.time()
+        conn = self._connection()
+        # A key is a hash of model and text, so a row already stored (e.g. by a
+        # concurrent request) holds the same vector and can be kept as is
+        with conn:
+            conn.execute("BEGIN")
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (key, model_name, int(vector.shape[0]), np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in items.items()
+                ]
+            )
+            inserted = conn.total_changes - before
+        with self.counts_lock:
+            self.counts[model_name] = self.counts.get(model_name, 0) + inserted
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self.counts_lock:
+            vectors = dict(self.counts)
+        return {
+            "path": self.path,
+            "vectors": vectors,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+class EmbeddingService:
+    """Embeds lists of texts, computing only the ones not already cached"""
+
+    def __init__(self, cache: Optional[VectorCache] = None):
+        self.cache = cache
+        self.embedders: Dict[str, Callable[[List[str]], np.ndarray]] = {EMBEDDING_MODEL: local_embedder}
+        self.lock = threading.Lock()
+
+    def is_allowed(self, model_name: str) -> bool:
+        """Only the default, registered and allowlisted models may be loaded by name"""
+        return model_name in self.embedders or model_name in EMBEDDING_ALLOWED_MODELS
+
+    def embedder_for(self, model_name: str) -> Callable[[List[str]], np.ndarray]:
+        with self.lock:
+            embedder = self.embedders.get(model_name)
+            if embedder is None:
+                if model_name not in EMBEDDING_ALLOWED_MODELS:
+                    raise ValueError(f"Embedding model {model_name} is not in the allowed model list")
+                embedder = self.embedders[model_name] = LocalEmbedder(model_name)
+            return embedder
+
+    def register(self, model_name: str, embed_fn: Callable[[List[str]], np.ndarray]):
+        """Use ``embed_fn`` (e.g. a remote API) for ``model_name``"""
+        with self.lock:
+            self.embedders[model_name] = embed_fn
+
+    def embed(self, texts: List[str], model_name: str = EMBEDDING_MODEL) -> Dict[str, Any]:
+        """Return one vector per text, in order, plus how many came from the cache"""
+        start_time = time.time()
+        keys = [content_hash(model_name, text) for text in texts]
+        unique = dict(zip(keys, texts))
+
+        vectors = self.cache.get_many(list(unique)) if self.cache else {}
+        missing = [key for key in unique if key not in vectors]
+
+        if missing:
+            embed_fn = self.embedder_for(model_name)
+            computed = {}
+            for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+                batch = missing[start:start + EMBEDDING_BATCH_SIZE]
+                batch_vectors = np.asarray(embed_fn([unique[key] for key in batch]), dtype=np.float32)
+                computed.update(zip(batch, batch_vectors))
+            if self.cache:
+                try:
+                    self.cache.put_many(model_name, computed)
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to persist {len(computed)} embeddings: {e}")
+            vectors.update(computed)
+
+        embeddings = [vectors[key] for key in keys]
+        return {
+            "embeddings": embeddings,
+            "model": model_name,
+            "dimensions": int(embeddings[0].shape[0]) if embeddings else 0,
+            "cached": len(unique) - len(missing),
+            "computed": len(missing),
+            "processing_time": round(time.time() - start_time, 3),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default_model": EMBEDDING_MODEL,
+            "loaded_models": [
+                name for name, embedder in self.embedders.items()
+                if not isinstance(embedder, LocalEmbedder) or embedder.model is not None
+            ],
+            "cache": self.cache.stats() if self.cache else None,
+        }
@@ -14,11 +14,10 @@ from transformers import (
     AutoImageProcessor,
     AutoModelForImageClassification,
     AutoModelForObjectDetection,
-    ViTImageProcessor,
-    ViTForImageClassification,
     TrOCRProcessor,
     VisionEncoderDecoderModel,
     AutoModelForSeq2SeqLM,
+    AutoModelForSequenceClassification,
     AutoTokenizer as SummarizerTokenizer,
     pipeline as Pipeline,
     SpeechT5Processor,
@@ -27,6 +26,7 @@ from transformers import (
     Wav2Vec2Processor,
     Wav2Vec2ForCTC
 )
+import time
 from typing import List, Dict, Optional, Any, Tuple
 from PIL import Image
 import logging
@@ -34,124 +34,198 @@ import io
 import soundfile as sf
 import librosa
 
+from model_registry import ModelRegistry
+from cpu_optimization import (
+    DEFAULT_CPU_OPTIMIZATION,
+    MODEL_OPTIMIZATIONS,
+    OPTIMIZATION_MODES,
+    parse_model_optimizations,
+    quantize_int8,
+    load_onnx_model,
+    supports,
+    output_agreement,
+)
+
 logger = logging.getLogger(__name__)
 
 class HuggingFaceAI:
     """Hugging Face Transformers AI implementation with Computer Vision"""
 
-    def __init__(self):
+    def __init__(self, memory_budget_mb: Optional[int] = None):
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.models = {}
-        self.tokenizers = {}
-        self.pipelines = {}
-        
-        # Computer Vision models
-        self.cv_models = {}
-        self.cv_processors = {}
-        
-        # NLP models
-        self.nlp_models = {}
-        self.nlp_tokenizers = {}
-        self.nlp_pipelines = {}
-        
-        # Speech models
-        self.speech_models = {}
-        self.speech_processors = {}
-        self.tts_vocoder = None
+
+        # Every loaded model (text generation, CV, NLP, speech) lives in one
+        # memory-bounded LRU registry keyed "<model_name>_<task>"
+        self.registry = ModelRegistry(memory_budget_mb) if memory_budget_mb else ModelRegistry()
+
+        # Only models we ship recommendations for may be loaded on request
+        self.allow_any_model = os.getenv("HF_ALLOW_ANY_MODEL", "false").lower() == "true"
+
+        # CPU optimization per model ("none", "int8" or "onnx"); ignored on GPU
+        self.default_optimization = DEFAULT_CPU_OPTIMIZATION
+        self.model_optimizations = parse_model_optimizations(MODEL_OPTIMIZATIONS)
+
+        # Latest accuracy/latency comparison per "<model_name>_<task>"
+        self.benchmarks: Dict[str, Dict[str, Any]] = {}
+
+    def optimization_for(self, model_name: str, task: str) -> str:
+        """CPU optimization mode to use for a model"""
+        if self.device == "cuda":
+            return "none"
+        mode = self.model_optimizations.get(model_name, self.default_optimization)
+        if not supports(mode, task):
+            return "none"
+        return mode
+
+    def set_optimization(self, model_name: str, mode: str):
+        """Select the CPU optimization for a model; takes effect on its next load"""
+        if mode not in OPTIMIZATION_MODES:
+            raise ValueError(f"Unknown optimization mode: {mode}")
+        self.model_optimizations[model_name] = mode
+
+        # Free variants loaded under the previous selection
+        for key in self.registry.keys():
+            base, _, variant = key.partition("@")
+            if base.startswith(f"{model_name}_") and not base.endswith("_text-generation") \
+                    and (variant or "none") != mode:
+                self.registry.evict(key)
+
+    @staticmethod
+    def _model_key(model_name: str, task: str, optimization: str) -> str:
+        if optimization == "none":
+            return f"{model_name}_{task}"
+        return f"{model_name}_{task}@{optimization}"
+
+    def _check_model_allowed(self, model_name: str):
+        """Reject arbitrary model names coming from request parameters"""
+        if self.allow_any_model or model_name in ALLOWED_MODELS:
+            return
+        raise ValueError(f"Model {model_name} is not in the allowed model list")
 
     def load_model(self, model_name: str, use_4bit: bool = True):
         """Load a Hugging Face model"""
         try:
-            logger.info(f"Loading model: {model_name}")
-
-            # Quantization config for memory efficiency
-            if use_4bit and self.device == "cuda":
-                quantization_config = BitsAndBytesConfig(
-                    load_in_4bit=True,
-                    bnb_4bit_compute_dtype=torch.float16,
-                    bnb_4bit_use_double_quant=True,
-                    bnb_4bit_quant_type="nf4"
-                )
-            else:
-                quantization_config = None
-
-            # Load tokenizer
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            if tokenizer.pad_token is None:
-                tokenizer.pad_token = tokenizer.eos_token
-
-            # Load model
-            model = AutoModelForCausalLM.from_pretrained(
-                model_name,
-                quantization_config=quantization_config,
-                device_map="auto" if self.device == "cuda" else None,
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                low_cpu_mem_usage=True,
+            self.registry.get_or_load(
+                f"{model_name}_text-generation",
+                lambda: self._build_text_generation(model_name, use_4bit)
             )
+            return True
 
-            # Create pipeline
-            pipe = pipeline(
-                "text-generation",
-                model=model,
-                tokenizer=tokenizer,
-                device=0 if self.device == "cuda" else -1,
-                max_new_tokens=512,
-                temperature=0.7,
-                do_sample=True,
-                pad_token_id=tokenizer.eos_token_id
-            )
+        except Exception as e:
+            logger.error(f"Failed to load model {model_name}: {e}")
+            return False
 
-            self.models[model_name] = model
-            self.tokenizers[model_name] = tokenizer
-            self.pipelines[model_name] = pipe
+    def _build_text_generation(self, model_name: str, use_4bit: bool):
+        """Build a text-generation pipeline"""
+        self._check_model_allowed(model_name)
+        logger.info(f"Loading model: {model_name}")
+
+        # Quantization config for memory efficiency
+        if use_4bit and self.device == "cuda":
+            quantization_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_compute_dtype=torch.float16,
+                bnb_4bit_use_double_quant=True,
+                bnb_4bit_quant_type="nf4"
+            )
+        else:
+            quantization_config = None
+
+        # Load tokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        # Load model
+        model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            quantization_config=quantization_config,
+            device_map="auto" if self.device == "cuda" else None,
+            torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+            low_cpu_mem_usage=True,
+        )
+
+        # Create pipeline
+        pipe = pipeline(
+            "text-generation",
+            model=model,
+            tokenizer=tokenizer,
+            device=0 if self.device == "cuda" else -1,
+            max_new_tokens=512,
+            temperature=0.7,
+            do_sample=True,
+            pad_token_id=tokenizer.eos_token_id
+        )
+
+        logger.info(f"Successfully loaded model: {model_name}")
+        return pipe
 
     def load_cv_model(self, model_name: str, task: str = "image-classification"):
         """Load a computer vision model"""
         try:
-            logger.info(f"Loading CV model: {model_name} for task: {task}")
-            
-            if task == "image-classification":
-                processor = AutoImageProcessor.from_pretrained(model_name)
-                model = AutoModelForImageClassification.from_pretrained(model_name)
-            elif task == "object-detection":
-                processor = AutoImageProcessor.from_pretrained(model_name)
-                model = AutoModelForObjectDetection.from_pretrained(model_name)
-            elif task == "ocr":
-                processor = TrOCRProcessor.from_pretrained(model_name)
-                model = VisionEncoderDecoderModel.from_pretrained(model_name)
-            else:
-                raise ValueError(f"Unsupported CV task: {task}")
-            
-            # Move to device
-            if self.device == "cuda":
-                model = model.to(self.device)
-            
-            self.cv_models[f"{model_name}_{task}"] = model
-            self.cv_processors[f"{model_name}_{task}"] = processor
-            
-            logger.info(f"Successfully loaded CV model: {model_name}")
+            self._cv_components(model_name, task)
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to load CV model {model_name}: {e}")
             return False
 
+    def _cv_components(self, model_name: str, task: str,
+                       optimization: Optional[str] = None) -> Tuple[Any, Any]:
+        """Return (processor, model) for a CV task, loading through the registry"""
+        optimization = optimization or self.optimization_for(model_name, task)
+        return self.registry.get_or_load(
+            self._model_key(model_name, task, optimization),
+            lambda: self._build_cv_model(model_name, task, optimization)
+        )
+
+    def _build_cv_model(self, model_name: str, task: str,
+                        optimization: str = "none") -> Tuple[Any, Any]:
+        """Build processor and model for a CV task"""
+        self._check_model_allowed(model_name)
+        logger.info(f"Loading CV model: {model_name} for task: {task} ({optimization})")
+
+        if optimization == "onnx":
+            if task == "ocr":
+                processor = TrOCRProcessor.from_pretrained(model_name)
+            else:
+                processor = AutoImageProcessor.from_pretrained(model_name)
+            model = load_onnx_model(model_name, task)
+            logger.info(f"Successfully loaded CV model: {model_name}")
+            return processor, model
+
+        if task == "image-classification":
+            processor = AutoImageProcessor.from_pretrained(model_name)
+            model = AutoModelForImageClassification.from_pretrained(model_name)
+        elif task == "object-detection":
+            processor = AutoImageProcessor.from_pretrained(model_name)
+            model = AutoModelForObjectDetection.from_pretrained(model_name)
+        elif task == "ocr":
+            processor = TrOCRProcessor.from_pretrained(model_name)
+            model = VisionEncoderDecoderModel.from_pretrained(model_name)
+        else:
+            raise ValueError(f"Unsupported CV task: {task}")
+
+        if optimization == "int8":
+            model = quantize_int8(model)
+
+        # Move to device
+        if self.device == "cuda":
+            model = model.to(self.device)
+
+        logger.info(f"Successfully loaded CV model: {model_name}")
+        return processor, model
+
     def process_image(self, image_data: bytes, task: str = "image-classification", 
-                     model_name: str = "google/vit-base-patch16-224") -> Dict[str, Any]:
+                     model_name: str = "google/vit-base-patch16-224",
+                     optimization: Optional[str] = None) -> Dict[str, Any]:
         """Process image with computer vision models"""
         try:
-            model_key = f"{model_name}_{task}"
-            
-            if model_key not in self.cv_models:
-                if not self.load_cv_model(model_name, task):
-                    raise ValueError(f"Failed to load CV model: {model_name}")
+            processor, model = self._cv_components(model_name, task, optimization)
             
             # Convert bytes to PIL Image
             image = Image.open(io.BytesIO(image_data))
             
-            processor = self.cv_processors[model_key]
-            model = self.cv_models[model_key]
-            
             if task == "image-classification":
                 inputs = processor(images=image, return_tensors="pt")
                 if self.device == "cuda":
@@ -221,123 +295,155 @@ class HuggingFaceAI:
 
     def load_nlp_model(self, model_name: str, task: str = "text-generation"):
         """Load advanced NLP models"""
+        if task == "text-generation":
+            # Use existing text generation loading
+            return self.load_model(model_name)
+
         try:
-            logger.info(f"Loading NLP model: {model_name} for task: {task}")
-            
-            if task == "summarization":
-                tokenizer = SummarizerTokenizer.from_pretrained(model_name)
-                model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-                pipe = Pipeline("summarization", model=model, tokenizer=tokenizer)
-            elif task == "sentiment-analysis":
-                pipe = Pipeline("sentiment-analysis", model=model_name)
-                tokenizer = None
-                model = None
-            elif task == "text-generation":
-                # Use existing text generation loading
-                return self.load_model(model_name)
-            else:
-                pipe = Pipeline(task, model=model_name)
-                tokenizer = None
-                model = None
-            
-            self.nlp_pipelines[f"{model_name}_{task}"] = pipe
-            if tokenizer:
-                self.nlp_tokenizers[f"{model_name}_{task}"] = tokenizer
-            if model:
-                self.nlp_models[f"{model_name}_{task}"] = model
-            
-            logger.info(f"Successfully loaded NLP model: {model_name}")
+            self._nlp_pipeline(model_name, task)
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to load NLP model {model_name}: {e}")
             return False
 
+    def _nlp_pipeline(self, model_name: str, task: str, optimization: Optional[str] = None):
+        """Return the pipeline for an NLP task, loading through the registry"""
+        optimization = optimization or self.optimization_for(model_name, task)
+        return self.registry.get_or_load(
+            self._model_key(model_name, task, optimization),
+            lambda: self._build_nlp_pipeline(model_name, task, optimization)
+        )
+
+    def _build_nlp_pipeline(self, model_name: str, task: str, optimization: str = "none"):
+        """Build the pipeline for an NLP task"""
+        self._check_model_allowed(model_name)
+        logger.info(f"Loading NLP model: {model_name} for task: {task} ({optimization})")
+
+        if optimization == "onnx":
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = load_onnx_model(model_name, task)
+            pipe = Pipeline(task, model=model, tokenizer=tokenizer)
+        elif optimization == "int8":
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            if task == "summarization":
+                model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            else:
+                model = AutoModelForSequenceClassification.from_pretrained(model_name)
+            pipe = Pipeline(task, model=quantize_int8(model), tokenizer=tokenizer)
+        elif task == "summarization":
+            tokenizer = SummarizerTokenizer.from_pretrained(model_name)
+            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+            pipe = Pipeline("summarization", model=model, tokenizer=tokenizer)
+        else:
+            pipe = Pipeline(task, model=model_name)
+
+        logger.info(f"Successfully loaded NLP model: {model_name}")
+        return pipe
+
     def process_text_nlp(self, text: str, task: str = "sentiment-analysis",
                         model_name: str = "cardiffnlp/twitter-roberta-base-sentiment-latest") -> Dict[str, Any]:
         """Process text with NLP models"""
+        return self.process_text_nlp_batch([text], task=task, model_name=model_name)[0]
+
+    def process_text_nlp_batch(self, texts: List[str], task: str = "sentiment-analysis",
+                               model_name: str = "cardiffnlp/twitter-roberta-base-sentiment-latest",
+                               optimization: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Process several texts in one padded forward pass; returns one result per text"""
         try:
-            pipeline_key = f"{model_name}_{task}"
-            
-            if pipeline_key not in self.nlp_pipelines:
-                if not self.load_nlp_model(model_name, task):
-                    raise ValueError(f"Failed to load NLP model: {model_name}")
-            
-            pipe = self.nlp_pipelines[pipeline_key]
+            pipe = self._nlp_pipeline(model_name, task, optimization)
+            batch_size = len(texts)
             
             if task == "sentiment-analysis":
-                result = pipe(text)[0]
-                return {
-                    "task": task,
-                    "label": result["label"],
-                    "confidence": result["score"],
-                    "model": model_name
-                }
+                outputs = pipe(texts, batch_size=batch_size, truncation=True)
+                return [
+                    {
+                        "task": task,
+                        "label": result["label"],
+                        "confidence": result["score"],
+                        "model": model_name
+                    }
+                    for result in outputs
+                ]
             elif task == "summarization":
-                result = pipe(text, max_length=150, min_length=30, do_sample=False)[0]
-                return {
-                    "task": task,
-                    "summary": result["summary_text"],
-                    "model": model_name
-                }
+                outputs = pipe(texts, batch_size=batch_size, truncation=True,
+                               max_length=150, min_length=30, do_sample=False)
+                return [
+                    {
+                        "task": task,
+                        "summary": result["summary_text"],
+                        "model": model_name
+                    }
+                    for result in outputs
+                ]
             else:
-                result = pipe(text)[0]
-                return {
-                    "task": task,
-                    "result": result,
-                    "model": model_name
-                }
+                outputs = pipe(texts, batch_size=batch_size)
+                return [
+                    {
+                        "task": task,
+                        "result": result[0] if isinstance(result, list) else result,
+                        "model": model_name
+                    }
+                    for result in outputs
+                ]
                 
         except Exception as e:
             logger.error(f"NLP processing error: {e}")
-            return {"error": str(e)}
+            return [{"error": str(e)} for _ in texts]
 
     def load_speech_model(self, task: str = "text-to-speech"):
         """Load speech processing models"""
         try:
-            logger.info(f"Loading speech model for task: {task}")
-            
-            if task == "text-to-speech":
-                # Load TTS models
-                processor = SpeechT5Processor.from_pretrained("microsoft/speecht5_tts")
-                model = SpeechT5ForTextToSpeech.from_pretrained("microsoft/speecht5_tts")
-                vocoder = SpeechT5HifiGan.from_pretrained("microsoft/speecht5_hifigan")
-                
-                if self.device == "cuda":
-                    model = model.to(self.device)
-                    vocoder = vocoder.to(self.device)
-                
-                self.speech_models["tts"] = model
-                self.speech_processors["tts"] = processor
-                self.tts_vocoder = vocoder
-                
-            elif task == "speech-to-text":
-                # Load STT model
-                processor = Wav2Vec2Processor.from_pretrained("facebook/wav2vec2-base-960h")
-                model = Wav2Vec2ForCTC.from_pretrained("facebook/wav2vec2-base-960h")
-                
-                if self.device == "cuda":
-                    model = model.to(self.device)
-                
-                self.speech_models["stt"] = model
-                self.speech_processors["stt"] = processor
-            
-            logger.info(f"Successfully loaded speech model for {task}")
+            self._speech_components(task)
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to load speech model {task}: {e}")
             return False
 
+    def _speech_components(self, task: str) -> Tuple[Any, ...]:
+        """Return the components for a speech task, loading through the registry"""
+        if task == "text-to-speech":
+            key = f"{TTS_MODEL}_{task}"
+        elif task == "speech-to-text":
+            key = f"{STT_MODEL}_{task}"
+        else:
+            raise ValueError(f"Unsupported speech task: {task}")
+        return self.registry.get_or_load(key, lambda: self._build_speech_model(task))
+
+    def _build_speech_model(self, task: str) -> Tuple[Any, ...]:
+        """Build (processor, model[, vocoder]) for a speech task"""
+        logger.info(f"Loading speech model for task: {task}")
+
+        if task == "text-to-speech":
+            # Load TTS models
+            processor = SpeechT5Processor.from_pretrained(TTS_MODEL)
+            model = SpeechT5ForTextToSpeech.from_pretrained(TTS_MODEL)
+            vocoder = SpeechT5HifiGan.from_pretrained(TTS_VOCODER)
+
+            if self.device == "cuda":
+                model = model.to(self.device)
+                vocoder = vocoder.to(self.device)
+
+            components = (processor, model, vocoder)
+
+        else:
+            # Load STT model
+            processor = Wav2Vec2Processor.from_pretrained(STT_MODEL)
+            model = Wav2Vec2ForCTC.from_pretrained(STT_MODEL)
+
+            if self.device == "cuda":
+                model = model.to(self.device)
+
+            components = (processor, model)
+
+        logger.info(f"Successfully loaded speech model for {task}")
+        return components
+
     def speech_to_text(self, audio_data: bytes, sample_rate: int = 16000) -> Dict[str, Any]:
         """Convert speech audio to text"""
         try:
-            if "stt" not in self.speech_models:
-                if not self.load_speech_model("speech-to-text"):
-                    raise ValueError("Failed to load speech-to-text model")
-            
-            processor = self.speech_processors["stt"]
-            model = self.speech_models["stt"]
+            processor, model = self._speech_components("speech-to-text")
             
             # Convert bytes to numpy array
             audio_array, _ = librosa.load(io.BytesIO(audio_data), sr=sample_rate)
@@ -357,7 +463,7 @@ class HuggingFaceAI:
                 "task": "speech-to-text",
                 "transcription": transcription,
                 "confidence": float(torch.max(torch.softmax(logits, dim=-1)).item()),
-                "model": "facebook/wav2vec2-base-960h"
+                "model": STT_MODEL
             }
             
         except Exception as e:
@@ -367,13 +473,7 @@ class HuggingFaceAI:
     def text_to_speech(self, text: str, speaker_embeddings: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """Convert text to speech audio"""
         try:
-            if "tts" not in self.speech_models:
-                if not self.load_speech_model("text-to-speech"):
-                    raise ValueError("Failed to load text-to-speech model")
-            
-            processor = self.speech_processors["tts"]
-            model = self.speech_models["tts"]
-            vocoder = self.tts_vocoder
+            processor, model, vocoder = self._speech_components("text-to-speech")
             
             # Prepare inputs
             inputs = processor(text=text, return_tensors="pt")
@@ -405,17 +505,82 @@ class HuggingFaceAI:
                 "audio_data": audio_bytes,
                 "sample_rate": 16000,
                 "format": "wav",
-                "model": "microsoft/speecht5_tts"
+                "model": TTS_MODEL
             }
             
         except Exception as e:
             logger.error(f"Text-to-speech error: {e}")
             return {"error": str(e)}
 
+    def compare_optimizations(self, model_name: str, task: str, samples: List[Any],
+                              modes: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Run samples (texts or image bytes) through each CPU optimization and
+        report latency, resident size and agreement with the float32 baseline"""
+        modes = [mode for mode in (modes or OPTIMIZATION_MODES) if supports(mode, task)]
+        if "none" not in modes:
+            modes.insert(0, "none")
+        is_image = task in ("image-classification", "object-detection", "ocr")
+
+        def run(mode: str) -> List[Dict[str, Any]]:
+            if is_image:
+                return [self.process_image(sample, task=task, model_name=model_name, optimization=mode)
+                        for sample in samples]
+            return self.process_text_nlp_batch(samples, task=task, model_name=model_name, optimization=mode)
+
+        current = self.optimization_for(model_name, task)
+        results = {}
+        baseline = None
+        for mode in modes:
+            key = self._model_key(model_name, task, mode)
+            try:
+                # First pass loads (and for ONNX, exports) the model; time the second
+                run(mode)
+                start_time = time.time()
+                outputs = run(mode)
+                latency = (time.time() - start_time) * 1000 / max(len(samples), 1)
+            except Exception as e:
+                results[mode] = {"error": str(e)}
+                continue
+            finally:
+                size_mb = self.registry.stats()["models"].get(key)
+                if mode != current:
+                    self.registry.evict(key)
+
+            if baseline is None:
+                baseline = outputs
+            agreement = [output_agreement(expected, actual) for expected, actual in zip(baseline, outputs)]
+            results[mode] = {
+                "latency_ms": round(latency, 2),
+                "size_mb": size_mb,
+                "agreement": round(sum(agreement) / max(len(agreement), 1), 4),
+                "errors": sum(1 for output in outputs if "error" in output),
+            }
+
+        report = {
+            "model": model_name,
+            "task": task,
+            "samples": len(samples),
+            "selected": current,
+            "results": results,
+            "measured_at": time.time(),
+        }
+        self.benchmarks[f"{model_name}_{task}"] = report
+        return report
+
+    def get_optimization_settings(self) -> Dict[str, Any]:
+        """Current CPU optimization selection and the latest comparisons"""
+        return {
+            "device": self.device,
+            "default": self.default_optimization,
+            "overrides": dict(self.model_optimizations),
+            "benchmarks": self.benchmarks,
+        }
+
     def generate_response(self, model_name: str, messages: List[Dict[str, str]],
                          max_tokens: int = 512, temperature: float = 0.7) -> str:
         """Generate response using specified model"""
-        if model_name not in self.pipelines:
+        pipe = self.registry.get(f"{model_name}_text-generation")
+        if pipe is None:
             raise ValueError(f"Model {model_name} not loaded")
 
         try:
@@ -423,7 +588,6 @@ class HuggingFaceAI:
             prompt = self._format_messages(messages)
 
             # Generate response
-            pipe = self.pipelines[model_name]
             outputs = pipe(
                 prompt,
                 max_new_tokens=max_tokens,
@@ -462,15 +626,12 @@ class HuggingFaceAI:
 
     def get_available_models(self) -> List[str]:
         """Get list of loaded models"""
-        return list(self.models.keys())
+        suffix = "_text-generation"
+        return [key[:-len(suffix)] for key in self.registry.keys() if key.endswith(suffix)]
 
-    def unload_model(self, model_name: str):
+    def unload_model(self, model_name: str, task: str = "text-generation"):
         """Unload a model to free memory"""
-        if model_name in self.models:
-            del self.models[model_name]
-            del self.tokenizers[model_name]
-            del self.pipelines[model_name]
-            logger.info(f"Unloaded model: {model_name}")
+        return self.registry.evict(f"{model_name}_{task}")
 
 # Recommended models for different use cases
 RECOMMENDED_MODELS = {
@@ -544,3 +705,17 @@ GPU_MODELS = [
     "google/vit-base-patch16-224",  # Vision models need GPU
     "facebook/bart-large-cnn",  # Summarization needs GPU
 ]
+
+# Speech models
+TTS_MODEL = "microsoft/speecht5_tts"
+TTS_VOCODER = "microsoft/speecht5_hifigan"
+STT_MODEL = "facebook/wav2vec2-base-960h"
+
+# Models that may be loaded by name from request parameters
+ALLOWED_MODELS = (
+    {name for names in RECOMMENDED_MODELS.values() for name in names}
+    | {name for names in CV_MODELS.values() for name in names}
+    | {name for names in NLP_MODELS.values() for name in names}
+    | set(CPU_MODELS)
+    | set(GPU_MODELS)
+)
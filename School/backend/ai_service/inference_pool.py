@@ -0,0 +1,84 @@
+"""
+Bounded inference executors for OpenEdTex AI Service
+Keeps blocking model calls off the event loop and sheds load when saturated
+"""
+
+import os
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable per pool via INFERENCE_<NAME>_WORKERS / _QUEUE_DEPTH
+DEFAULT_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+DEFAULT_QUEUE_DEPTH = int(os.getenv("INFERENCE_QUEUE_DEPTH", "16"))
+
+
+class InferencePoolSaturated(Exception):
+    """Raised when a pool already has as many calls running and queued as it allows"""
+
+
+class InferencePool:
+    """Thread pool with a hard cap on running + queued calls
+
+    Threads rather than processes: torch and tokenizers release the GIL during
+    forward passes, and worker threads share the models already loaded in this
+    process instead of each loading their own copy.
+    """
+
+    def __init__(self, name: str, max_workers: int = None, max_queue_depth: int = None):
+        self.name = name
+        env_prefix = f"INFERENCE_{name.upper()}"
+        self.max_workers = max_workers or int(os.getenv(f"{env_prefix}_WORKERS", DEFAULT_WORKERS))
+        self.max_queue_depth = (
+            max_queue_depth if max_queue_depth is not None
+            else int(os.getenv(f"{env_prefix}_QUEUE_DEPTH", DEFAULT_QUEUE_DEPTH))
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"inference-{name}"
+        )
+        self.in_flight = 0
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue_depth
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn`` on the pool, or raise InferencePoolSaturated if it is full"""
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise InferencePoolSaturated(
+                f"{self.name} inference pool is saturated ({self.in_flight}/{self.capacity})"
+            )
+
+        self.in_flight += 1
+        try:
+            future = asyncio.get_event_loop().run_in_executor(
+                self.executor, functools.partial(fn, *args, **kwargs)
+            )
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        # The slot is held until the work itself finishes, not until the caller stops waiting:
+        # a cancelled request leaves its call running or queued in the executor
+        future.add_done_callback(self._release)
+        return await asyncio.shield(future)
+
+    def _release(self, _future):
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
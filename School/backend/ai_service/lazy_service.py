@@ -0,0 +1,75 @@
+"""
+Lazy service construction for OpenEdTex AI Service
+Defers heavy model loading until first use or an explicit background warm-up
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyService:
+    """Build a service object on first use, exactly once, from any thread
+
+    Attribute access returns a deferred call, so ``pool.run(service.method, ...)``
+    constructs the underlying object inside the worker thread rather than on
+    the event loop.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+        self._state = "pending"
+        self._error: Optional[str] = None
+        self._load_time: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._instance is not None
+
+    @property
+    def instance(self) -> Optional[Any]:
+        """The constructed object, or None if it has not been built yet"""
+        return self._instance
+
+    def get(self) -> Any:
+        """Return the service, constructing it if needed (blocking)"""
+        if self._instance is not None:
+            return self._instance
+
+        with self._lock:
+            if self._instance is None:
+                self._state = "loading"
+                start_time = time.time()
+                logger.info(f"Initializing {self._name} service")
+                try:
+                    instance = self._factory()
+                except Exception as e:
+                    self._state = "failed"
+                    self._error = str(e)
+                    logger.error(f"Failed to initialize {self._name} service: {e}")
+                    raise
+                self._load_time = time.time() - start_time
+                self._instance = instance
+                self._state = "ready"
+                self._error = None
+                logger.info(f"{self._name} service ready in {self._load_time:.1f}s")
+        return self._instance
+
+    def __getattr__(self, attr: str) -> Callable[..., Any]:
+        def deferred(*args, **kwargs):
+            return getattr(self.get(), attr)(*args, **kwargs)
+        deferred.__name__ = attr
+        return deferred
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self._state,
+            "load_time": round(self._load_time, 2) if self._load_time is not None else None,
+            "error": self._error,
+        }
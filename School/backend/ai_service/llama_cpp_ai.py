@@ -5,22 +5,54 @@ CPU-based inference for various LLM models
 
 import os
 import sys
-from typing import List, Dict, Optional, Any
+import time
+import atexit
+import socket
+import threading
+from typing import List, Dict, Iterator, Optional, Any
 import logging
 from pathlib import Path
 import subprocess
 import json
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
+# Server pool configuration
+LLAMA_SERVER_BIN = os.getenv("LLAMA_SERVER_BIN", "llama-server")
+LLAMA_BASE_PORT = int(os.getenv("LLAMA_BASE_PORT", "8080"))
+LLAMA_CTX_SIZE = int(os.getenv("LLAMA_CTX_SIZE", "2048"))  # tokens per slot
+LLAMA_STARTUP_TIMEOUT = float(os.getenv("LLAMA_STARTUP_TIMEOUT", "180"))  # seconds
+LLAMA_SUPERVISE_INTERVAL = float(os.getenv("LLAMA_SUPERVISE_INTERVAL", "10"))  # seconds
+LLAMA_MAX_RESTARTS = int(os.getenv("LLAMA_MAX_RESTARTS", "5"))
+LLAMA_PARALLEL = int(os.getenv("LLAMA_PARALLEL", "4"))  # KV-cache slots per server
+
 class LlamaCppAI:
-    """Llama.cpp AI implementation for CPU inference"""
+    """Llama.cpp AI implementation for CPU inference
+
+    Runs one ``llama-server`` process per model on its own port, waits for
+    each to report healthy before routing to it, and restarts processes that
+    die. All requests share one pooled HTTP session.
+    """
 
     def __init__(self, model_path: str = "./models"):
         self.model_path = Path(model_path)
         self.model_path.mkdir(exist_ok=True)
-        self.loaded_models = {}
-        self.processes = {}
+        self.log_path = self.model_path / "logs"
+        self.log_path.mkdir(exist_ok=True)
+        self.loaded_models: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.RLock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32)
+        self.session.mount("http://", adapter)
+
+        self.supervisor: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        atexit.register(self.shutdown)
 
     def download_model(self, model_url: str, model_name: str) -> bool:
         """Download a model from Hugging Face or other sources"""
@@ -52,6 +84,92 @@ class LlamaCppAI:
             logger.error(f"Download error: {e}")
             return False
 
+    def _port_in_use(self, port: int) -> bool:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            return sock.connect_ex(("127.0.0.1", port)) == 0
+
+    def _allocate_port(self) -> int:
+        """Next free port at or above LLAMA_BASE_PORT (caller holds the lock)"""
+        taken = {server["port"] for server in self.loaded_models.values()}
+        port = LLAMA_BASE_PORT
+        while port in taken or self._port_in_use(port):
+            port += 1
+        return port
+
+    def _base_url(self, model_name: str) -> str:
+        return f"http://127.0.0.1:{self.loaded_models[model_name]['port']}"
+
+    def _start_server(self, model_name: str):
+        """Spawn llama-server for a registered model (caller holds the lock)"""
+        server = self.loaded_models[model_name]
+        cmd = [
+            LLAMA_SERVER_BIN,
+            "--model", str(self.model_path / server["file"]),
+            "--host", "127.0.0.1",
+            "--port", str(server["port"]),
+            # llama-server splits --ctx-size evenly across --parallel slots
+            "--ctx-size", str(LLAMA_CTX_SIZE * LLAMA_PARALLEL),
+            "--threads", str(os.cpu_count() or 4),
+            "--n-gpu-layers", "0",  # CPU only
+            "--parallel", str(LLAMA_PARALLEL)
+        ]
+
+        logger.info(f"Starting llama.cpp server for {model_name} on port {server['port']}")
+        # Log to a file: an unread PIPE fills up and stalls the server
+        log_file = open(self.log_path / f"{model_name}.log", "a")
+        server["process"] = subprocess.Popen(
+            cmd,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            text=True
+        )
+        log_file.close()
+        server["ready"] = False
+        server["started_at"] = time.time()
+        # A fresh process has empty KV caches
+        server["slots"] = OrderedDict()
+
+    def _wait_until_ready(self, model_name: str, timeout: float = LLAMA_STARTUP_TIMEOUT) -> bool:
+        """Poll the server's /health endpoint until it has finished loading the model"""
+        server = self.loaded_models[model_name]
+        deadline = time.time() + timeout
+        delay = 0.25
+
+        while time.time() < deadline:
+            if server["process"].poll() is not None:
+                logger.error(
+                    f"llama.cpp server for {model_name} exited with code {server['process'].returncode}"
+                )
+                return False
+            try:
+                # 503 while the model is loading, 200 once it can serve
+                response = self.session.get(f"{self._base_url(model_name)}/health", timeout=2)
+                if response.status_code == 200:
+                    server["ready"] = True
+                    logger.info(
+                        f"llama.cpp server for {model_name} ready in "
+                        f"{time.time() - server['started_at']:.1f}s"
+                    )
+                    return True
+            except requests.RequestException:
+                pass
+            time.sleep(delay)
+            delay = min(delay * 2, 2.0)
+
+        logger.error(f"llama.cpp server for {model_name} not ready after {timeout:.0f}s")
+        return False
+
+    def _stop_server(self, server: Dict[str, Any]):
+        process = server.get("process")
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
     def load_model(self, model_name: str, model_file: str) -> bool:
         """Load a model using llama.cpp"""
         try:
@@ -61,75 +179,200 @@ class LlamaCppAI:
                 logger.error(f"Model file not found: {model_path}")
                 return False
 
-            # Start llama.cpp server
-            cmd = [
-                "llama-server",
-                "--model", str(model_path),
-                "--host", "127.0.0.1",
-                "--port", "8080",
-                "--ctx-size", "2048",
-                "--threads", str(os.cpu_count() or 4),
-                "--n-gpu-layers", "0"  # CPU only
-            ]
-
-            logger.info(f"Starting llama.cpp server for {model_name}")
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            self.loaded_models[model_name] = {
-                "process": process,
-                "port": 8080,
-                "file": model_file
-            }
-
-            # Wait for server to start
-            import time
-            time.sleep(5)
-
+            with self.lock:
+                server = self.loaded_models.get(model_name)
+                if server and server["process"] is not None and server["process"].poll() is None:
+                    # Already running (or still starting up in another thread)
+                    if server["ready"]:
+                        return True
+                    start = False
+                else:
+                    start = True
+                if server is None:
+                    self.loaded_models[model_name] = {
+                        "process": None,
+                        "port": self._allocate_port(),
+                        "file": model_file,
+                        "ready": False,
+                        "restarts": 0,
+                        "started_at": None,
+                        "slots": OrderedDict(),
+                        "prompt_tokens": 0,
+                        "prompt_tokens_evaluated": 0
+                    }
+                if start:
+                    self._start_server(model_name)
+
+            self._start_supervisor()
+
+            if not self._wait_until_ready(model_name):
+                self.unload_model(model_name)
+                return False
             return True
 
         except Exception as e:
             logger.error(f"Failed to load model {model_name}: {e}")
             return False
 
-    def generate_response(self, model_name: str, messages: List[Dict[str, str]],
-                         max_tokens: int = 512, temperature: float = 0.7) -> str:
-        """Generate response using loaded model"""
+    def _restart(self, model_name: str) -> bool:
+        """Restart a crashed server, up to LLAMA_MAX_RESTARTS times"""
+        with self.lock:
+            server = self.loaded_models.get(model_name)
+            if server is None:
+                return False
+            if server["process"].poll() is None:
+                # Running; may still be loading after another thread's restart
+                if server["ready"]:
+                    return True
+            elif server["restarts"] >= LLAMA_MAX_RESTARTS:
+                server["ready"] = False
+                return False
+            else:
+                server["restarts"] += 1
+                logger.warning(
+                    f"llama.cpp server for {model_name} died (code {server['process'].returncode}), "
+                    f"restart {server['restarts']}/{LLAMA_MAX_RESTARTS}"
+                )
+                self._start_server(model_name)
+        return self._wait_until_ready(model_name)
+
+    def _start_supervisor(self):
+        with self.lock:
+            if self.supervisor is None or not self.supervisor.is_alive():
+                self.supervisor = threading.Thread(
+                    target=self._supervise, name="llama-supervisor", daemon=True
+                )
+                self.supervisor.start()
+
+    def _supervise(self):
+        """Background loop that restarts servers whose process has exited"""
+        while not self.stopping.wait(LLAMA_SUPERVISE_INTERVAL):
+            for model_name in self.get_loaded_models():
+                server = self.loaded_models.get(model_name)
+                if server and server["process"].poll() is not None:
+                    self._restart(model_name)
+
+    def _slot_for(self, model_name: str, conversation_id: str) -> int:
+        """KV-cache slot pinned to a conversation, reusing the least recently used one when full"""
+        with self.lock:
+            slots = self.loaded_models[model_name]["slots"]
+            if conversation_id in slots:
+                slots.move_to_end(conversation_id)
+                return slots[conversation_id]
+
+            free = set(range(LLAMA_PARALLEL)) - set(slots.values())
+            if free:
+                slot_id = min(free)
+            else:
+                # The evicted conversation falls back to a full prompt evaluation next turn
+                _, slot_id = slots.popitem(last=False)
+            slots[conversation_id] = slot_id
+            return slot_id
+
+    def _release_slot(self, model_name: str, conversation_id: str):
+        with self.lock:
+            server = self.loaded_models.get(model_name)
+            if server:
+                server["slots"].pop(conversation_id, None)
+
+    def _ensure_running(self, model_name: str):
         if model_name not in self.loaded_models:
             raise ValueError(f"Model {model_name} not loaded")
+        server = self.loaded_models[model_name]
+        if server["process"].poll() is not None or not server["ready"]:
+            if not self._restart(model_name):
+                raise Exception(f"llama.cpp server for {model_name} is not running")
+
+    def _completion_payload(self, messages: List[Dict[str, str]], max_tokens: int,
+                            temperature: float, stream: bool = False) -> Dict[str, Any]:
+        return {
+            "prompt": self._format_messages(messages),
+            "n_predict": max_tokens,
+            "temperature": temperature,
+            "stop": ["Human:", "Assistant:", "\n\n"],
+            # Reuse the KV cache for the prefix shared with the slot's previous prompt
+            "cache_prompt": True,
+            "stream": stream
+        }
 
-        try:
-            import requests
-
-            # Format messages for llama.cpp
-            prompt = self._format_messages(messages)
-
-            # Make request to llama.cpp server
-            response = requests.post(
-                "http://127.0.0.1:8080/completion",
-                json={
-                    "prompt": prompt,
-                    "n_predict": max_tokens,
-                    "temperature": temperature,
-                    "stop": ["Human:", "Assistant:", "\n\n"]
-                },
-                timeout=60
+    def _post_completion(self, model_name: str, payload: Dict[str, Any],
+                         conversation_id: Optional[str], stream: bool = False) -> requests.Response:
+        """POST /completion pinned to the conversation's slot, retrying unpinned if the slot is refused"""
+        url = f"{self._base_url(model_name)}/completion"
+        if conversation_id:
+            pinned = dict(payload, id_slot=self._slot_for(model_name, conversation_id))
+            response = self.session.post(url, json=pinned, timeout=60, stream=stream)
+            if response.status_code == 200:
+                return response
+            logger.warning(
+                f"Slot {pinned['id_slot']} for conversation {conversation_id} rejected "
+                f"({response.status_code}); retrying without slot pinning"
             )
+            response.close()
+            self._release_slot(model_name, conversation_id)
+        return self.session.post(url, json=payload, timeout=60, stream=stream)
+
+    def _record_timings(self, model_name: str, result: Dict[str, Any]):
+        """Track how much of each prompt was served from the KV cache"""
+        tokens_evaluated = result.get("tokens_evaluated")
+        prompt_n = result.get("timings", {}).get("prompt_n")
+        if tokens_evaluated is None or prompt_n is None:
+            return
+        with self.lock:
+            server = self.loaded_models.get(model_name)
+            if server:
+                server["prompt_tokens"] += tokens_evaluated
+                server["prompt_tokens_evaluated"] += prompt_n
+
+    def generate_response(self, model_name: str, messages: List[Dict[str, str]],
+                         max_tokens: int = 512, temperature: float = 0.7,
+                         conversation_id: Optional[str] = None) -> str:
+        """Generate response using loaded model
+
+        With a ``conversation_id`` the request is pinned to one of the
+        server's slots so the shared transcript prefix is not re-evaluated.
+        """
+        try:
+            self._ensure_running(model_name)
+
+            payload = self._completion_payload(messages, max_tokens, temperature)
+            response = self._post_completion(model_name, payload, conversation_id)
 
             if response.status_code == 200:
                 result = response.json()
+                self._record_timings(model_name, result)
                 return result.get("content", "").strip()
             else:
                 raise Exception(f"Server error: {response.status_code}")
 
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Generation error: {e}")
             return f"Error generating response: {str(e)}"
 
+    def generate_stream(self, model_name: str, messages: List[Dict[str, str]],
+                        max_tokens: int = 512, temperature: float = 0.7,
+                        conversation_id: Optional[str] = None) -> Iterator[str]:
+        """Yield response tokens as llama-server produces them"""
+        self._ensure_running(model_name)
+
+        payload = self._completion_payload(messages, max_tokens, temperature, stream=True)
+        response = self._post_completion(model_name, payload, conversation_id, stream=True)
+        if response.status_code != 200:
+            raise Exception(f"Server error: {response.status_code}")
+
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                chunk = json.loads(line[len("data:"):].strip())
+                if chunk.get("content"):
+                    yield chunk["content"]
+                if chunk.get("stop"):
+                    self._record_timings(model_name, chunk)
+                    break
+
     def _format_messages(self, messages: List[Dict[str, str]]) -> str:
         """Format messages for llama.cpp"""
         formatted = ""
@@ -150,16 +393,41 @@ class LlamaCppAI:
 
     def unload_model(self, model_name: str):
         """Unload a model"""
-        if model_name in self.loaded_models:
-            process = self.loaded_models[model_name]["process"]
-            process.terminate()
-            process.wait()
-            del self.loaded_models[model_name]
+        with self.lock:
+            server = self.loaded_models.pop(model_name, None)
+        if server:
+            self._stop_server(server)
             logger.info(f"Unloaded model: {model_name}")
 
     def get_loaded_models(self) -> List[str]:
         """Get list of loaded models"""
-        return list(self.loaded_models.keys())
+        with self.lock:
+            return list(self.loaded_models.keys())
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """Port, readiness and restart count per model server"""
+        with self.lock:
+            return {
+                model_name: {
+                    "port": server["port"],
+                    "ready": server["ready"],
+                    "running": server["process"] is not None and server["process"].poll() is None,
+                    "restarts": server["restarts"],
+                    "uptime": round(time.time() - server["started_at"], 1) if server["started_at"] else None,
+                    "conversations": len(server["slots"]),
+                    "prompt_cache_hit_rate": round(
+                        1 - server["prompt_tokens_evaluated"] / server["prompt_tokens"], 3
+                    ) if server["prompt_tokens"] else None
+                }
+                for model_name, server in self.loaded_models.items()
+            }
+
+    def shutdown(self):
+        """Stop the supervisor and every server process"""
+        self.stopping.set()
+        for model_name in self.get_loaded_models():
+            self.unload_model(model_name)
+        self.session.close()
 
 # Popular GGUF models for different use cases
 GGUF_MODELS = {
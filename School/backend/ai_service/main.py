@@ -3,14 +3,18 @@ OpenEdTex AI Service - Self-hosted AI models with OpenAI fallback
 """
 
 import os
+import json
+import time
+import hashlib
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, AsyncIterator, Callable, Iterator
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import httpx
 import openai
@@ -23,7 +27,21 @@ logger = logging.getLogger(__name__)
 # Configuration
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-AI_MODE = os.getenv("AI_MODE", "hybrid")  # 'ollama', 'openai', or 'hybrid'
+AI_MODE = os.getenv("AI_MODE", "hybrid")  # 'ollama', 'openai', 'llamacpp', or 'hybrid'
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "15"))  # seconds
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))  # seconds per probe
+
+# Comma-separated services to initialize in the background once the port is open
+# (huggingface, curriculum, content, recommendations, llamacpp, embeddings), and HuggingFace models to
+# preload as "<task>=<model>" entries, e.g. "sentiment-analysis=cardiffnlp/twitter-roberta-base-sentiment-latest"
+AI_WARMUP = [name.strip() for name in os.getenv("AI_WARMUP", "").split(",") if name.strip()]
+HF_WARMUP_MODELS = [entry.strip() for entry in os.getenv("HF_WARMUP_MODELS", "").split(",") if entry.strip()]
+
+# GGUF models served through llama.cpp, as "<name>=<file.gguf>" entries
+LLAMA_MODEL_PATH = os.getenv("LLAMA_MODEL_PATH", "./models")
+LLAMA_MODELS = dict(
+    entry.strip().split("=", 1) for entry in os.getenv("LLAMA_MODELS", "").split(",") if "=" in entry
+)
 
 # Initialize clients
 ollama_client = OllamaClient(host=OLLAMA_BASE_URL)
@@ -33,16 +51,68 @@ from huggingface_ai import HuggingFaceAI, CV_MODELS, NLP_MODELS
 from curriculum_converter import CurriculumConverter
 from content_generator import ContentGenerator
 from recommendation_engine import RecommendationEngine
+from llama_cpp_ai import LlamaCppAI, LLAMA_CTX_SIZE, LLAMA_PARALLEL
+from micro_batcher import MicroBatcher
+from inference_pool import InferencePool, InferencePoolSaturated
+from lazy_service import LazyService
+from semantic_cache import SemanticCache
+from embeddings import EmbeddingService, VectorCache, EMBEDDING_MODEL, EMBEDDING_MAX_TEXTS
+
+# AI services are constructed on first use or by the background warm-up,
+# so the port opens before any model weights are read
+hf_ai = LazyService("huggingface", HuggingFaceAI)
+curriculum_converter = LazyService("curriculum", CurriculumConverter)
+content_generator = LazyService("content", ContentGenerator)
+recommendation_engine = LazyService("recommendations", RecommendationEngine)
+llama_ai = LazyService("llamacpp", lambda: LlamaCppAI(LLAMA_MODEL_PATH))
+
+services = {
+    "huggingface": hf_ai,
+    "curriculum": curriculum_converter,
+    "content": content_generator,
+    "recommendations": recommendation_engine,
+    "llamacpp": llama_ai,
+}
+
+# Warm-up progress, reported by /health/ready
+warmup_status: Dict[str, Any] = {"complete": False, "failed": []}
+
+# Bounded worker pools so blocking inference never runs on the event loop
+inference_pools = {
+    "vision": InferencePool("vision"),
+    "nlp": InferencePool("nlp"),
+    "speech": InferencePool("speech"),
+    "curriculum": InferencePool("curriculum", max_workers=1),
+    "content": InferencePool("content"),
+    "recommendations": InferencePool("recommendations"),
+    "llamacpp": InferencePool("llamacpp", max_workers=LLAMA_PARALLEL),
+    "embeddings": InferencePool("embeddings"),
+}
 
-# Initialize AI services
-hf_ai = HuggingFaceAI()
-curriculum_converter = CurriculumConverter()
-content_generator = ContentGenerator()
-recommendation_engine = RecommendationEngine()
+# Coalesce concurrent NLP calls per (task, model) into one forward pass
+nlp_batcher = MicroBatcher(
+    lambda key, texts: hf_ai.process_text_nlp_batch(texts, task=key[0], model_name=key[1]),
+    runner=inference_pools["nlp"].run
+)
+
+# Answers to near-identical questions, shared within a cache_scope (e.g. a course)
+chat_cache = SemanticCache("chat")
+
+# Batched local embeddings, persisted by content hash so each text is embedded once
+embedding_service = EmbeddingService(VectorCache())
+
+OPENAI_EMBEDDING_MODELS = ["text-embedding-ada-002", "text-embedding-3-small", "text-embedding-3-large"]
 
-# Initialize AI services
-hf_ai = HuggingFaceAI()
-curriculum_converter = CurriculumConverter()
+def _openai_embedder(model: str) -> Callable[[List[str]], Any]:
+    """Embed a batch of texts with one OpenAI request"""
+    def embed(texts: List[str]):
+        response = openai_client.embeddings.create(input=texts, model=model)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    return embed
+
+if openai_client:
+    for _model in OPENAI_EMBEDDING_MODELS:
+        embedding_service.register(_model, _openai_embedder(_model))
 
 # Available models
 OLLAMA_MODELS = [
@@ -68,6 +138,8 @@ class ChatRequest(BaseModel):
     temperature: Optional[float] = 0.7
     max_tokens: Optional[int] = 1000
     stream: Optional[bool] = False
+    conversation_id: Optional[str] = None  # pins llama.cpp KV-cache reuse to the conversation
+    cache_scope: Optional[str] = None  # opt in to the semantic answer cache within this scope
 
 class ChatResponse(BaseModel):
     response: str
@@ -81,13 +153,42 @@ class ModelInfo(BaseModel):
     context_length: int
     description: str
 
+class EmbeddingRequest(BaseModel):
+    texts: List[str]
+    model: Optional[str] = None  # defaults to the local EMBEDDING_MODEL
+
+class OptimizationRequest(BaseModel):
+    model: str
+    mode: str  # 'none', 'int8' or 'onnx'
+
+class BenchmarkRequest(BaseModel):
+    model: str
+    task: str = "sentiment-analysis"
+    texts: List[str]
+    modes: Optional[List[str]] = None
+
+# Cached backend availability, refreshed by the background health monitor
+backend_health: Dict[str, Dict[str, Any]] = {
+    "ollama": {"available": False, "latency_ms": None, "checked_at": None},
+    "openai": {"available": openai_client is not None, "latency_ms": None, "checked_at": None},
+}
+
 # FastAPI app
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting OpenEdTex AI Service")
+    # The monitor probes straight away; the port opens without waiting on unreachable backends
+    monitor_task = asyncio.create_task(health_monitor())
+    warmup_task = asyncio.create_task(warm_up())
     yield
     # Shutdown
+    monitor_task.cancel()
+    warmup_task.cancel()
+    for pool in inference_pools.values():
+        pool.shutdown()
+    if llama_ai.ready:
+        llama_ai.instance.shutdown()
     logger.info("Shutting down OpenEdTex AI Service")
 
 app = FastAPI(
@@ -106,6 +207,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(InferencePoolSaturated)
+async def inference_saturated_handler(request, exc: InferencePoolSaturated):
+    """Shed load instead of queueing unbounded work behind slow models"""
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 # Helper functions
 async def check_ollama_health() -> bool:
     """Check if Ollama service is healthy"""
@@ -118,11 +224,97 @@ async def check_ollama_health() -> bool:
         logger.warning(f"Ollama health check failed: {e}")
         return False
 
+async def check_openai_health() -> bool:
+    """Check if the OpenAI API is reachable with the configured key"""
+    if not openai_client:
+        return False
+    try:
+        await asyncio.get_event_loop().run_in_executor(
+            None, openai_client.models.list
+        )
+        return True
+    except Exception as e:
+        logger.warning(f"OpenAI health check failed: {e}")
+        return False
+
+async def _probe_backend(name: str, check) -> None:
+    """Run one health check and record its result and latency"""
+    start = time.perf_counter()
+    try:
+        available = await asyncio.wait_for(check(), HEALTH_CHECK_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"{name} health check timed out after {HEALTH_CHECK_TIMEOUT}s")
+        available = False
+    backend_health[name] = {
+        "available": available,
+        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+        "checked_at": time.time(),
+    }
+
+async def refresh_backend_health() -> None:
+    """Probe all backends concurrently and update the cached table"""
+    probes = [_probe_backend("ollama", check_ollama_health)]
+    if openai_client:
+        probes.append(_probe_backend("openai", check_openai_health))
+    await asyncio.gather(*probes)
+
+async def health_monitor() -> None:
+    """Keep backend_health fresh so request handlers never probe inline"""
+    while True:
+        try:
+            await refresh_backend_health()
+        except Exception as e:
+            logger.warning(f"Backend health refresh failed: {e}")
+        await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+def _warm_up_hf_model(entry: str) -> bool:
+    """Preload one "<task>=<model>" entry from HF_WARMUP_MODELS"""
+    task, _, model_name = entry.partition("=")
+    if task in ("text-to-speech", "speech-to-text"):
+        return hf_ai.load_speech_model(task)
+    if task in ("image-classification", "object-detection", "ocr"):
+        return hf_ai.load_cv_model(model_name, task)
+    return hf_ai.load_nlp_model(model_name, task)
+
+async def _warm_up_one(name: str, fn: Callable[[], Any]) -> None:
+    loop = asyncio.get_event_loop()
+    try:
+        if await loop.run_in_executor(None, fn) is False:
+            raise RuntimeError("load returned False")
+    except Exception as e:
+        logger.error(f"Warm-up of {name} failed: {e}")
+        warmup_status["failed"].append(name)
+
+async def warm_up() -> None:
+    """Initialize AI_WARMUP services and HF_WARMUP_MODELS concurrently in the background"""
+    jobs = []
+    for name in AI_WARMUP:
+        if name == "embeddings":
+            jobs.append(_warm_up_one(name, lambda: embedding_service.embed(["warm up"], EMBEDDING_MODEL)))
+            continue
+        if name not in services:
+            logger.warning(f"Unknown warm-up service: {name}")
+            continue
+        jobs.append(_warm_up_one(name, services[name].get))
+    for entry in HF_WARMUP_MODELS:
+        jobs.append(_warm_up_one(entry, lambda entry=entry: _warm_up_hf_model(entry)))
+
+    start_time = time.time()
+    await asyncio.gather(*jobs)
+    warmup_status["complete"] = True
+    if jobs:
+        logger.info(f"Warm-up finished in {time.time() - start_time:.1f}s")
+
 def select_model(requested_model: Optional[str] = None) -> tuple[str, str]:
-    """Select the best available model based on request and availability"""
+    """Select the best available model based on request and cached availability"""
     if AI_MODE == "ollama":
         model = requested_model or OLLAMA_MODELS[0]
         return model, "ollama"
+    elif AI_MODE == "llamacpp":
+        if not LLAMA_MODELS:
+            raise HTTPException(status_code=503, detail="No llama.cpp models configured")
+        model = requested_model if requested_model in LLAMA_MODELS else next(iter(LLAMA_MODELS))
+        return model, "llamacpp"
     elif AI_MODE == "openai":
         if not openai_client:
             raise HTTPException(status_code=503, detail="OpenAI client not configured")
@@ -132,17 +324,18 @@ def select_model(requested_model: Optional[str] = None) -> tuple[str, str]:
         # Try Ollama first, fallback to OpenAI
         if requested_model and requested_model in OLLAMA_MODELS:
             return requested_model, "ollama"
+        elif requested_model and requested_model in LLAMA_MODELS:
+            return requested_model, "llamacpp"
         elif requested_model and requested_model in OPENAI_MODELS:
             if openai_client:
                 return requested_model, "openai"
             else:
                 raise HTTPException(status_code=503, detail="OpenAI client not configured")
 
-        # Auto-select based on availability
-        ollama_healthy = asyncio.run(check_ollama_health())
-        if ollama_healthy:
+        # Auto-select based on the monitor's last probe
+        if backend_health["ollama"]["available"]:
             return OLLAMA_MODELS[0], "ollama"
-        elif openai_client:
+        elif openai_client and backend_health["openai"]["available"]:
             return OPENAI_MODELS[0], "openai"
         else:
             raise HTTPException(status_code=503, detail="No AI models available")
@@ -155,17 +348,43 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
-    ollama_status = await check_ollama_health()
-    openai_status = openai_client is not None
+    """Health check endpoint (served from the background monitor's cache)"""
+    ollama_status = backend_health["ollama"]["available"]
+    openai_status = backend_health["openai"]["available"]
 
     return {
         "status": "healthy" if ollama_status or openai_status else "unhealthy",
         "ollama": ollama_status,
         "openai": openai_status,
-        "mode": AI_MODE
+        "mode": AI_MODE,
+        "backends": backend_health,
+        "inference": {name: pool.stats() for name, pool in inference_pools.items()},
+        "models": hf_ai.instance.registry.stats() if hf_ai.ready else {},
+        "services": {name: service.status() for name, service in services.items()},
+        "llamacpp": llama_ai.instance.get_status() if llama_ai.ready else {},
+        "embeddings": embedding_service.stats(),
+        "semantic_cache": {
+            "chat": chat_cache.stats(),
+            "content": content_generator.instance.cache.stats() if content_generator.ready else {}
+        }
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: the configured warm-up has finished without failures"""
+    ready = warmup_status["complete"] and not warmup_status["failed"]
+    body = {
+        "status": "ready" if ready else "warming_up" if not warmup_status["complete"] else "degraded",
+        "warmup": warmup_status,
+        "services": {name: service.status() for name, service in services.items()}
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
 @app.get("/models", response_model=List[ModelInfo])
 async def list_models():
     """List available models"""
@@ -197,17 +416,232 @@ async def list_models():
                 description=f"OpenAI {model_name}"
             ))
 
+    # llama.cpp models
+    for model_name, model_file in LLAMA_MODELS.items():
+        models.append(ModelInfo(
+            name=model_name,
+            provider="llamacpp",
+            context_length=LLAMA_CTX_SIZE,  # per request slot
+            description=f"llama.cpp {model_file}"
+        ))
+
     return models
 
+@app.get("/models/optimizations")
+async def get_model_optimizations():
+    """CPU optimization selected per model and the latest accuracy/latency comparisons"""
+    return hf_ai.get_optimization_settings()
+
+@app.put("/models/optimizations")
+async def set_model_optimization(request: OptimizationRequest):
+    """Select the CPU optimization for a model"""
+    try:
+        hf_ai.set_optimization(request.model, request.mode)
+        return hf_ai.get_optimization_settings()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/models/benchmark")
+async def benchmark_text_model(request: BenchmarkRequest):
+    """Compare float32, int8 and ONNX variants of an NLP model on sample texts"""
+    try:
+        return await inference_pools["nlp"].run(
+            hf_ai.compare_optimizations, request.model, request.task, request.texts, request.modes
+        )
+
+    except InferencePoolSaturated:
+        raise
+    except Exception as e:
+        logger.error(f"Model benchmark error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/vision/benchmark")
+async def benchmark_vision_model(file: UploadFile = File(...), model: str = "google/vit-base-patch16-224",
+                                 task: str = "image-classification"):
+    """Compare float32, int8 and ONNX variants of a vision model on a sample image"""
+    try:
+        image_data = await file.read()
+        return await inference_pools["vision"].run(
+            hf_ai.compare_optimizations, model, task, [image_data]
+        )
+
+    except InferencePoolSaturated:
+        raise
+    except Exception as e:
+        logger.error(f"Model benchmark error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _sse_event(payload: Dict[str, Any]) -> str:
+    """Encode a payload as a single Server-Sent Events frame"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+async def _iterate_in_executor(iterator_factory: Callable[[], Iterator[Any]]) -> AsyncIterator[Any]:
+    """Drain a blocking iterator from a worker thread without stalling the event loop"""
+    loop = asyncio.get_event_loop()
+    sentinel = object()
+    iterator = await loop.run_in_executor(None, lambda: iter(iterator_factory()))
+
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, sentinel)
+        if item is sentinel:
+            break
+        yield item
+
+def _ensure_llama_model(model: str) -> None:
+    """Start the model's llama.cpp server on first use (blocking)"""
+    if model not in llama_ai.get_loaded_models():
+        if not llama_ai.load_model(model, LLAMA_MODELS[model]):
+            raise HTTPException(status_code=503, detail=f"llama.cpp model {model} failed to start")
+
+def _llama_generate(request: ChatRequest, model: str) -> str:
+    _ensure_llama_model(model)
+    return llama_ai.generate_response(
+        model, request.messages,
+        max_tokens=request.max_tokens,
+        temperature=request.temperature,
+        conversation_id=request.conversation_id
+    )
+
+def _llama_stream(request: ChatRequest, model: str) -> Iterator[str]:
+    _ensure_llama_model(model)
+    return llama_ai.generate_stream(
+        model, request.messages,
+        max_tokens=request.max_tokens,
+        temperature=request.temperature,
+        conversation_id=request.conversation_id
+    )
+
+async def _stream_chat_tokens(request: ChatRequest, model: str, provider: str) -> AsyncIterator[str]:
+    """Yield response tokens as the backend produces them"""
+    if provider == "ollama":
+        chunks = _iterate_in_executor(
+            lambda: ollama_client.chat(
+                model=model,
+                messages=request.messages,
+                options={
+                    "temperature": request.temperature,
+                    "num_predict": request.max_tokens
+                },
+                stream=True
+            )
+        )
+        async for chunk in chunks:
+            token = chunk.get('message', {}).get('content', '')
+            if token:
+                yield token
+
+    elif provider == "openai":
+        chunks = _iterate_in_executor(
+            lambda: openai_client.chat.completions.create(
+                model=model,
+                messages=request.messages,
+                temperature=request.temperature,
+                max_tokens=request.max_tokens,
+                stream=True
+            )
+        )
+        async for chunk in chunks:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+    elif provider == "llamacpp":
+        async for token in _iterate_in_executor(lambda: _llama_stream(request, model)):
+            yield token
+
+def _chat_cache_key(request: ChatRequest) -> Optional[tuple]:
+    """(question, exact-match params) for the semantic cache, or None if the request opted out
+
+    Only the latest user message is compared semantically; everything before
+    it (system prompt, history) must match exactly via its hash.
+    """
+    if not request.cache_scope or not request.messages or request.messages[-1].get("role") != "user":
+        return None
+    context = hashlib.sha1(json.dumps(request.messages[:-1], sort_keys=True).encode()).hexdigest()
+    return request.messages[-1].get("content", ""), {"model": request.model, "context": context}
+
+def _store_chat_answer(request: ChatRequest, cache_key: tuple, response_text: str, model: str) -> None:
+    if response_text and not response_text.startswith("Error generating response"):
+        question, params = cache_key
+        chat_cache.store(question, {"response": response_text, "model_used": model},
+                         request.cache_scope, params)
+
+async def _cached_chat_events(cached: Dict[str, Any], start_time: float) -> AsyncIterator[str]:
+    yield _sse_event({"token": cached["response"]})
+    yield _sse_event({
+        "done": True,
+        "model_used": cached["model_used"],
+        "tokens_used": 0,
+        "processing_time": round(time.time() - start_time, 2),
+        "cached": True
+    })
+
+async def _stream_chat_events(request: ChatRequest, model: str, provider: str,
+                              start_time: float, cache_key: Optional[tuple] = None) -> AsyncIterator[str]:
+    """Wrap the token stream in SSE frames, ending with a summary frame"""
+    try:
+        tokens = []
+        async for token in _stream_chat_tokens(request, model, provider):
+            tokens.append(token)
+            yield _sse_event({"token": token})
+
+        yield _sse_event({
+            "done": True,
+            "model_used": model,
+            "tokens_used": None,  # Streaming backends don't report usage per chunk
+            "processing_time": round(time.time() - start_time, 2)
+        })
+
+        if cache_key:
+            await asyncio.get_event_loop().run_in_executor(
+                None, _store_chat_answer, request, cache_key, "".join(tokens), model
+            )
+
+    except Exception as e:
+        logger.error(f"Streaming chat error: {e}")
+        yield _sse_event({"error": str(e), "done": True})
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
-    """Chat with AI models"""
-    import time
+    """Chat with AI models
+
+    When ``stream`` is set the response is a ``text/event-stream`` where each
+    ``data:`` frame carries either a ``token`` or the final ``done`` summary.
+    """
     start_time = time.time()
 
     try:
+        cache_key = _chat_cache_key(request)
+        if cache_key:
+            question, params = cache_key
+            cached = await asyncio.get_event_loop().run_in_executor(
+                None, chat_cache.lookup, question, request.cache_scope, params
+            )
+            if cached:
+                if request.stream:
+                    return StreamingResponse(
+                        _cached_chat_events(cached, start_time),
+                        media_type="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+                    )
+                return ChatResponse(
+                    response=cached["response"],
+                    model_used=cached["model_used"],
+                    tokens_used=0,
+                    processing_time=round(time.time() - start_time, 2)
+                )
+
         model, provider = select_model(request.model)
 
+        if request.stream:
+            return StreamingResponse(
+                _stream_chat_events(request, model, provider, start_time, cache_key),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
         if provider == "ollama":
             # Use Ollama
             response = await asyncio.get_event_loop().run_in_executor(
@@ -239,8 +673,15 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
             response_text = openai_response.choices[0].message.content
             tokens_used = openai_response.usage.total_tokens
 
+        elif provider == "llamacpp":
+            response_text = await inference_pools["llamacpp"].run(_llama_generate, request, model)
+            tokens_used = None
+
         processing_time = time.time() - start_time
 
+        if cache_key:
+            background_tasks.add_task(_store_chat_answer, request, cache_key, response_text, model)
+
         return ChatResponse(
             response=response_text,
             model_used=model,
@@ -248,33 +689,44 @@ async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
             processing_time=round(processing_time, 2)
         )
 
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/embeddings")
-async def create_embeddings(text: str, model: Optional[str] = None):
-    """Create embeddings for text"""
+async def create_embeddings(request: Optional[EmbeddingRequest] = None,
+                            text: Optional[str] = None, model: Optional[str] = None):
+    """Create embeddings for a batch of texts (or a single ``text`` query param)"""
     try:
-        if not model:
-            model = "text-embedding-ada-002"  # OpenAI default
+        if request is not None:
+            texts, model = request.texts, request.model or model
+        elif text is not None:
+            texts = [text]
+        else:
+            raise HTTPException(status_code=422, detail="Provide 'texts' in the body or a 'text' query parameter")
 
-        if openai_client:
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: openai_client.embeddings.create(
-                    input=text,
-                    model=model
-                )
+        if not texts:
+            raise HTTPException(status_code=422, detail="'texts' must not be empty")
+        if len(texts) > EMBEDDING_MAX_TEXTS:
+            raise HTTPException(
+                status_code=413, detail=f"At most {EMBEDDING_MAX_TEXTS} texts per request"
             )
-            return {
-                "embeddings": response.data[0].embedding,
-                "model": model,
-                "tokens_used": response.usage.total_tokens
-            }
-        else:
-            raise HTTPException(status_code=503, detail="Embeddings service not available")
 
+        model = model or EMBEDDING_MODEL
+        if model in OPENAI_EMBEDDING_MODELS and not openai_client:
+            raise HTTPException(status_code=503, detail=f"{model} requires OpenAI, which is not configured")
+        if not embedding_service.is_allowed(model):
+            raise HTTPException(status_code=400, detail=f"Embedding model {model} is not in the allowed model list")
+
+        result = await inference_pools["embeddings"].run(embedding_service.embed, texts, model)
+        vectors = [vector.tolist() for vector in result["embeddings"]]
+        result["embeddings"] = vectors if request is not None else vectors[0]
+        return result
+
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Embeddings error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -284,13 +736,17 @@ async def classify_image(file: UploadFile = File(...), model: str = "google/vit-
     """Classify an uploaded image"""
     try:
         image_data = await file.read()
-        result = hf_ai.process_image(image_data, task="image-classification", model_name=model)
+        result = await inference_pools["vision"].run(
+            hf_ai.process_image, image_data, task="image-classification", model_name=model
+        )
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Image classification error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -300,13 +756,17 @@ async def detect_objects(file: UploadFile = File(...), model: str = "facebook/de
     """Detect objects in an uploaded image"""
     try:
         image_data = await file.read()
-        result = hf_ai.process_image(image_data, task="object-detection", model_name=model)
+        result = await inference_pools["vision"].run(
+            hf_ai.process_image, image_data, task="object-detection", model_name=model
+        )
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Object detection error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -316,13 +776,17 @@ async def extract_text(file: UploadFile = File(...), model: str = "microsoft/tro
     """Extract text from an uploaded image"""
     try:
         image_data = await file.read()
-        result = hf_ai.process_image(image_data, task="ocr", model_name=model)
+        result = await inference_pools["vision"].run(
+            hf_ai.process_image, image_data, task="ocr", model_name=model
+        )
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"OCR error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -331,13 +795,15 @@ async def extract_text(file: UploadFile = File(...), model: str = "microsoft/tro
 async def analyze_sentiment(text: str, model: str = "cardiffnlp/twitter-roberta-base-sentiment-latest"):
     """Analyze sentiment of text"""
     try:
-        result = hf_ai.process_text_nlp(text, task="sentiment-analysis", model_name=model)
+        result = await nlp_batcher.submit(("sentiment-analysis", model), text)
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Sentiment analysis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -346,14 +812,17 @@ async def analyze_sentiment(text: str, model: str = "cardiffnlp/twitter-roberta-
 async def analyze_sentiment_batch(texts: List[str], model: str = "cardiffnlp/twitter-roberta-base-sentiment-latest"):
     """Analyze sentiment of multiple texts"""
     try:
-        results = []
-        for text in texts:
-            result = hf_ai.process_text_nlp(text, task="sentiment-analysis", model_name=model)
-            if "error" not in result:
-                results.append(result)
+        if nlp_batcher.max_queue_size and len(texts) > nlp_batcher.max_queue_size:
+            raise HTTPException(
+                status_code=413, detail=f"At most {nlp_batcher.max_queue_size} texts per request"
+            )
+        batch_results = await nlp_batcher.submit_many(("sentiment-analysis", model), texts)
+        results = [result for result in batch_results if "error" not in result]
         
         return {"results": results, "total_processed": len(results)}
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Batch sentiment analysis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -362,13 +831,15 @@ async def analyze_sentiment_batch(texts: List[str], model: str = "cardiffnlp/twi
 async def analyze_emotion(text: str, model: str = "j-hartmann/emotion-english-distilroberta-base"):
     """Analyze emotions in text"""
     try:
-        result = hf_ai.process_text_nlp(text, task="sentiment-analysis", model_name=model)
+        result = await nlp_batcher.submit(("sentiment-analysis", model), text)
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Emotion analysis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -377,13 +848,15 @@ async def analyze_emotion(text: str, model: str = "j-hartmann/emotion-english-di
 async def summarize_text(text: str, model: str = "facebook/bart-large-cnn"):
     """Summarize text content"""
     try:
-        result = hf_ai.process_text_nlp(text, task="summarization", model_name=model)
+        result = await nlp_batcher.submit(("summarization", model), text)
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Summarization error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -399,16 +872,21 @@ async def convert_curriculum(file: UploadFile = File(...)):
             buffer.write(content)
         
         # Convert to curriculum
-        result = curriculum_converter.convert_to_curriculum(temp_path)
-        
-        # Clean up temp file
-        os.remove(temp_path)
+        try:
+            result = await inference_pools["curriculum"].run(
+                curriculum_converter.convert_to_curriculum, temp_path
+            )
+        finally:
+            # Clean up temp file
+            os.remove(temp_path)
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Curriculum conversion error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -418,13 +896,15 @@ async def speech_to_text(file: UploadFile = File(...), sample_rate: int = 16000)
     """Convert uploaded speech audio to text"""
     try:
         audio_data = await file.read()
-        result = hf_ai.speech_to_text(audio_data, sample_rate)
+        result = await inference_pools["speech"].run(hf_ai.speech_to_text, audio_data, sample_rate)
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Speech-to-text error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -433,7 +913,7 @@ async def speech_to_text(file: UploadFile = File(...), sample_rate: int = 16000)
 async def text_to_speech(text: str):
     """Convert text to speech audio"""
     try:
-        result = hf_ai.text_to_speech(text)
+        result = await inference_pools["speech"].run(hf_ai.text_to_speech, text)
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
@@ -446,26 +926,35 @@ async def text_to_speech(text: str):
             headers={"Content-Disposition": "attachment; filename=speech.wav"}
         )
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Text-to-speech error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _course_scope(course_id: Optional[int]) -> Optional[str]:
+    """Semantic cache scope so cached content is only shared within a course"""
+    return f"course:{course_id}" if course_id is not None else None
+
 @app.post("/content/generate-lesson")
 async def generate_lesson(
     topic: str,
     grade_level: str,
     learning_objectives: List[str],
     duration: int = 45,
-    difficulty: str = "intermediate"
+    difficulty: str = "intermediate",
+    course_id: Optional[int] = None
 ):
     """Generate a complete lesson plan"""
     try:
-        result = content_generator.generate_lesson(
+        result = await inference_pools["content"].run(
+            content_generator.generate_lesson,
             topic=topic,
             grade_level=grade_level,
             learning_objectives=learning_objectives,
             duration=duration,
-            difficulty=difficulty
+            difficulty=difficulty,
+            scope=_course_scope(course_id)
         )
         
         if "error" in result:
@@ -473,6 +962,8 @@ async def generate_lesson(
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Lesson generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -483,16 +974,19 @@ async def generate_quiz(
     grade_level: str,
     num_questions: int = 10,
     difficulty: str = "intermediate",
-    question_types: Optional[List[str]] = None
+    question_types: Optional[List[str]] = None,
+    course_id: Optional[int] = None
 ):
     """Generate a quiz"""
     try:
-        result = content_generator.generate_quiz(
+        result = await inference_pools["content"].run(
+            content_generator.generate_quiz,
             topic=topic,
             grade_level=grade_level,
             num_questions=num_questions,
             difficulty=difficulty,
-            question_types=question_types
+            question_types=question_types,
+            scope=_course_scope(course_id)
         )
         
         if "error" in result:
@@ -500,6 +994,8 @@ async def generate_quiz(
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Quiz generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -510,16 +1006,19 @@ async def generate_assignment(
     grade_level: str,
     assignment_type: str = "homework",
     duration: int = 60,
-    difficulty: str = "intermediate"
+    difficulty: str = "intermediate",
+    course_id: Optional[int] = None
 ):
     """Generate an assignment"""
     try:
-        result = content_generator.generate_assignment(
+        result = await inference_pools["content"].run(
+            content_generator.generate_assignment,
             topic=topic,
             grade_level=grade_level,
             assignment_type=assignment_type,
             duration=duration,
-            difficulty=difficulty
+            difficulty=difficulty,
+            scope=_course_scope(course_id)
         )
         
         if "error" in result:
@@ -527,6 +1026,8 @@ async def generate_assignment(
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Assignment generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -536,15 +1037,18 @@ async def generate_study_guide(
     topic: str,
     grade_level: str,
     key_concepts: List[str],
-    study_time: int = 30
+    study_time: int = 30,
+    course_id: Optional[int] = None
 ):
     """Generate a study guide"""
     try:
-        result = content_generator.generate_study_guide(
+        result = await inference_pools["content"].run(
+            content_generator.generate_study_guide,
             topic=topic,
             grade_level=grade_level,
             key_concepts=key_concepts,
-            study_time=study_time
+            study_time=study_time,
+            scope=_course_scope(course_id)
         )
         
         if "error" in result:
@@ -552,6 +1056,8 @@ async def generate_study_guide(
         
         return result
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Study guide generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -560,9 +1066,13 @@ async def generate_study_guide(
 async def get_course_recommendations(user_id: int, limit: int = 5):
     """Get personalized course recommendations"""
     try:
-        recommendations = recommendation_engine.get_course_recommendations(user_id, limit)
+        recommendations = await inference_pools["recommendations"].run(
+            recommendation_engine.get_course_recommendations, user_id, limit
+        )
         return {"recommendations": recommendations}
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Course recommendations error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -575,11 +1085,13 @@ async def get_study_material_recommendations(
 ):
     """Get study material recommendations"""
     try:
-        recommendations = recommendation_engine.get_study_material_recommendations(
-            user_id, topic, limit
+        recommendations = await inference_pools["recommendations"].run(
+            recommendation_engine.get_study_material_recommendations, user_id, topic, limit
         )
         return {"recommendations": recommendations}
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Study material recommendations error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -592,11 +1104,13 @@ async def get_learning_path_recommendations(
 ):
     """Get learning path recommendations"""
     try:
-        learning_path = recommendation_engine.get_learning_path_recommendations(
-            user_id, subject, current_level
+        learning_path = await inference_pools["recommendations"].run(
+            recommendation_engine.get_learning_path_recommendations, user_id, subject, current_level
         )
         return learning_path
         
+    except (HTTPException, InferencePoolSaturated):
+        raise
     except Exception as e:
         logger.error(f"Learning path recommendations error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,138 @@
+"""
+Dynamic micro-batching for OpenEdTex AI inference
+Coalesces concurrent single-item requests into one padded forward pass
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from inference_pool import InferencePoolSaturated
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable per batcher
+MAX_BATCH_SIZE = int(os.getenv("NLP_MAX_BATCH_SIZE", "32"))
+MAX_WAIT_MS = float(os.getenv("NLP_MAX_WAIT_MS", "10"))
+MAX_QUEUE_SIZE = int(os.getenv("NLP_MAX_QUEUE_SIZE", "256"))  # per key; 0 = unbounded
+
+
+class MicroBatcher:
+    """Queue requests per model key and run them as batches
+
+    Callers ``await submit(key, item)`` and get back their own result. A
+    worker task per key waits for the first item, then keeps collecting until
+    either ``max_batch_size`` items are queued or ``max_wait_ms`` has passed
+    since the first one arrived, and hands the whole batch to ``process_fn``.
+    Each key's queue holds at most ``max_queue_size`` waiting items; beyond
+    that ``submit`` raises InferencePoolSaturated instead of queueing.
+    """
+
+    def __init__(self, process_fn: Callable[[Hashable, List[Any]], List[Any]],
+                 max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: float = MAX_WAIT_MS,
+                 max_queue_size: int = MAX_QUEUE_SIZE,
+                 runner: Optional[Callable[..., Awaitable[Any]]] = None):
+        self.process_fn = process_fn
+        self.runner = runner
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max(0, max_queue_size)
+        self.rejected = 0
+        self.queues: Dict[Hashable, asyncio.Queue] = {}
+        self.workers: Dict[Hashable, asyncio.Task] = {}
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """Queue one item for the batch identified by ``key`` and wait for its result"""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        queue = self._queue(key)
+        try:
+            queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self._reject(key, 1)
+        return await future
+
+    async def submit_many(self, key: Hashable, items: List[Any]) -> List[Any]:
+        """Queue several items at once; they may be split across or merged into batches
+
+        All items are rejected together if the queue cannot take every one of them.
+        """
+        queue = self._queue(key)
+        if queue.maxsize and queue.qsize() + len(items) > queue.maxsize:
+            self._reject(key, len(items))
+        return list(await asyncio.gather(*(self.submit(key, item) for item in items)))
+
+    def _queue(self, key: Hashable) -> asyncio.Queue:
+        """The queue for ``key``, with its worker task running"""
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = asyncio.Queue(maxsize=self.max_queue_size)
+        if key not in self.workers or self.workers[key].done():
+            self.workers[key] = asyncio.create_task(self._run(key, queue))
+        return queue
+
+    def _reject(self, key: Hashable, count: int):
+        self.rejected += count
+        raise InferencePoolSaturated(
+            f"Batch queue for {key} is full ({self.queues[key].qsize()}/{self.max_queue_size})"
+        )
+
+    async def _collect(self, queue: asyncio.Queue) -> List[Tuple[Any, asyncio.Future]]:
+        """Block for the first item, then gather more until the batch is full or the window closes"""
+        batch = [await queue.get()]
+        deadline = asyncio.get_event_loop().time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - asyncio.get_event_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self, key: Hashable, queue: asyncio.Queue):
+        """Worker loop for one model key"""
+        while True:
+            batch = await self._collect(queue)
+            items = [item for item, _ in batch]
+
+            try:
+                results = await self._execute(key, items)
+                if len(results) != len(items):
+                    raise ValueError(
+                        f"Batch for {key} returned {len(results)} results for {len(items)} inputs"
+                    )
+            except Exception as e:
+                logger.error(f"Batch inference failed for {key}: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _execute(self, key: Hashable, items: List[Any]) -> List[Any]:
+        """Run the blocking batch function off the event loop"""
+        if self.runner is not None:
+            return await self.runner(self.process_fn, key, items)
+        return await asyncio.get_event_loop().run_in_executor(
+            None, self.process_fn, key, items
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Current queue depth per model key"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "max_queue_size": self.max_queue_size,
+            "rejected": self.rejected,
+            "queues": {str(key): queue.qsize() for key, queue in self.queues.items()},
+        }
@@ -0,0 +1,195 @@
+"""
+Model registry for OpenEdTex AI Service
+Tracks resident model memory, enforces a RAM budget with LRU eviction,
+and deduplicates concurrent loads of the same model. Room for a model is
+reserved (and made by eviction) before it is loaded, so the budget also
+covers loads in progress.
+"""
+
+import os
+import gc
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "4096"))
+# Reserved for a model that has never been loaded in this process
+MODEL_LOAD_ESTIMATE_MB = int(os.getenv("MODEL_LOAD_ESTIMATE_MB", "1024"))
+
+
+def estimate_model_bytes(obj: Any) -> int:
+    """Best-effort resident size of a model, pipeline, or tuple of components"""
+    if obj is None:
+        return 0
+    if isinstance(obj, (tuple, list)):
+        return sum(estimate_model_bytes(part) for part in obj)
+
+    # ONNX Runtime models: the exported graph files are what get mapped in. Seq2seq and
+    # vision2seq models keep one graph per component instead of a single model_path.
+    onnx_paths = [
+        getattr(obj, attr, None)
+        for attr in ("model_path", "encoder_model_path", "decoder_model_path", "decoder_with_past_model_path")
+    ]
+    onnx_paths = [path for path in onnx_paths if path is not None]
+    if onnx_paths:
+        total = 0
+        for path in onnx_paths:
+            # Large graphs store their weights in an external "<name>_data" file
+            for candidate in (path, f"{path}_data"):
+                try:
+                    total += os.path.getsize(candidate)
+                except (OSError, TypeError):
+                    pass
+        return total
+
+    # transformers pipelines wrap the model they run
+    model = getattr(obj, "model", None)
+    if model is not None and not hasattr(obj, "state_dict"):
+        return estimate_model_bytes(model)
+
+    if hasattr(obj, "state_dict"):
+        # state_dict rather than parameters() so int8 packed weights are counted
+        total = 0
+        try:
+            for value in obj.state_dict().values():
+                for tensor in (value if isinstance(value, tuple) else (value,)):
+                    if hasattr(tensor, "element_size"):
+                        total += tensor.numel() * tensor.element_size()
+        except Exception:
+            pass
+        return total
+
+    # Processors and tokenizers are small next to the weights
+    return 0
+
+
+class ModelRegistry:
+    """Thread-safe LRU cache of loaded models bounded by total memory"""
+
+    def __init__(self, memory_budget_mb: int = MODEL_MEMORY_BUDGET_MB):
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.loading: Dict[str, Future] = {}
+        self.reserved: Dict[str, int] = {}
+        # Size of each model's last load, used as its reservation next time
+        self.known_sizes: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.entries.values())
+
+    @property
+    def committed_bytes(self) -> int:
+        """Resident models plus the reservations of loads in progress"""
+        return self.resident_bytes + sum(self.reserved.values())
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a loaded model and mark it recently used, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            return entry["value"]
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], estimate_mb: Optional[int] = None) -> Any:
+        """Return the model for ``key``, loading it once even under concurrent requests
+
+        Before loading, the size of the model's previous load (or
+        ``estimate_mb``, or MODEL_LOAD_ESTIMATE_MB) is reserved and older
+        models are evicted to make room for it.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry["value"]
+
+            pending = self.loading.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.loading[key] = Future()
+                self.reserved[key] = self.known_sizes.get(
+                    key, (estimate_mb or MODEL_LOAD_ESTIMATE_MB) * 1024 * 1024
+                )
+                self._evict_over_budget(keep=key)
+
+        if not owner:
+            # Another thread is already loading this model; share its result
+            return pending.result()
+
+        try:
+            value = loader()
+            size = estimate_model_bytes(value)
+        except Exception as e:
+            with self.lock:
+                del self.loading[key]
+                del self.reserved[key]
+            pending.set_exception(e)
+            raise
+
+        with self.lock:
+            self.entries[key] = {"value": value, "size": size}
+            self.known_sizes[key] = size
+            del self.loading[key]
+            del self.reserved[key]
+            self._evict_over_budget(keep=key)
+
+        pending.set_result(value)
+        logger.info(
+            f"Registered model {key} ({size / 1024 / 1024:.0f} MB, "
+            f"{self.resident_bytes / 1024 / 1024:.0f}/{self.memory_budget / 1024 / 1024:.0f} MB resident)"
+        )
+        return value
+
+    def _evict_over_budget(self, keep: str):
+        """Drop least-recently-used models until the budget is met (caller holds the lock)
+
+        Loads in progress are counted but cannot be evicted.
+        """
+        freed = False
+        while self.committed_bytes > self.memory_budget:
+            victim = next((key for key in self.entries if key != keep), None)
+            if victim is None:
+                logger.warning(f"Model {keep} and the loads in progress exceed the memory budget")
+                break
+            entry = self.entries.pop(victim)
+            self.evictions += 1
+            freed = True
+            logger.info(f"Evicted model {victim} ({entry['size'] / 1024 / 1024:.0f} MB)")
+        if freed:
+            gc.collect()
+
+    def evict(self, key: str) -> bool:
+        """Explicitly unload a model"""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+        if entry is None:
+            return False
+        gc.collect()
+        logger.info(f"Unloaded model: {key}")
+        return True
+
+    def keys(self) -> List[str]:
+        with self.lock:
+            return list(self.entries.keys())
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "memory_budget_mb": round(self.memory_budget / 1024 / 1024),
+                "resident_mb": round(self.resident_bytes / 1024 / 1024),
+                "reserved_mb": round(sum(self.reserved.values()) / 1024 / 1024),
+                "evictions": self.evictions,
+                "loading": list(self.loading.keys()),
+                "models": {
+                    key: round(entry["size"] / 1024 / 1024)
+                    for key, entry in self.entries.items()
+                },
+            }
@@ -4,7 +4,9 @@ Recommends courses, study materials, and learning resources based on user behavi
 """
 
 import os
+import time
 import logging
+import threading
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import numpy as np
@@ -13,13 +15,20 @@ from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 from django.contrib.auth import get_user_model
-from django.db.models import Avg, Count, Q
+from django.db.models import Avg, Count, Q, Sum
 from adaptive_learning.models import PerformanceMetrics, LearningProfile
+from adaptive_learning.similarity_index import SimilarityIndex, RECOMMENDATION_INDEX_PATH
+from adaptive_learning.recommendation_cache import cached_recommendations
 from ai_assistant.models import AIConversation, AIMessage
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+SIMILARITY_THRESHOLD = 0.6
+# How often to apply profile changes to the similarity index and check for a newer build on disk
+RECOMMENDATION_INDEX_REFRESH = float(os.getenv("RECOMMENDATION_INDEX_REFRESH", "30"))  # seconds
+
+
 class RecommendationEngine:
     """AI-powered recommendation system for educational content"""
 
@@ -29,8 +38,48 @@ class RecommendationEngine:
         self.user_profiles = {}
         self.content_features = {}
 
+        # Top-K similar students per profile, built offline by build_recommendation_index
+        self.index_path = RECOMMENDATION_INDEX_PATH
+        self.index_mtime = None
+        self.index_checked = 0.0
+        self.lock = threading.Lock()
+
+    def _get_similarity_index(self) -> Optional[SimilarityIndex]:
+        """Return the similarity index, loading it from disk and then refreshing incrementally
+
+        Returns None until ``build_recommendation_index`` has written one; the
+        full build is never run inside a request.
+        """
+        with self.lock:
+            if time.time() - self.index_checked < RECOMMENDATION_INDEX_REFRESH:
+                return self.user_similarity_matrix
+            self.index_checked = time.time()
+
+            # Pick up a newer offline build
+            mtime = os.path.getmtime(self.index_path) if os.path.exists(self.index_path) else None
+            if mtime is not None and mtime != self.index_mtime:
+                self.user_similarity_matrix = SimilarityIndex.load(self.index_path)
+                self.index_mtime = mtime
+                logger.info(f"Loaded recommendation index from {self.index_path}")
+
+            if self.user_similarity_matrix is None:
+                logger.warning(
+                    f"No recommendation index at {self.index_path}; run build_recommendation_index. "
+                    f"Serving content-based recommendations only"
+                )
+            else:
+                self.user_similarity_matrix.refresh()
+
+            return self.user_similarity_matrix
+
     def get_course_recommendations(self, user_id: int, limit: int = 5) -> List[Dict[str, Any]]:
         """Get personalized course recommendations for a user"""
+        return cached_recommendations(
+            user_id, 'courses', {'limit': limit},
+            lambda: self._compute_course_recommendations(user_id, limit)
+        )
+
+    def _compute_course_recommendations(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
         try:
             user = User.objects.get(id=user_id)
 
@@ -61,6 +110,13 @@ class RecommendationEngine:
     def get_study_material_recommendations(self, user_id: int, topic: str = None,
                                          limit: int = 10) -> List[Dict[str, Any]]:
         """Get study material recommendations"""
+        return cached_recommendations(
+            user_id, 'materials', {'topic': topic, 'limit': limit},
+            lambda: self._compute_study_material_recommendations(user_id, topic, limit)
+        )
+
+    def _compute_study_material_recommendations(self, user_id: int, topic: Optional[str],
+                                                limit: int) -> List[Dict[str, Any]]:
         try:
             user = User.objects.get(id=user_id)
 
@@ -82,6 +138,14 @@ class RecommendationEngine:
     def get_learning_path_recommendations(self, user_id: int, subject: str,
                                         current_level: str) -> Dict[str, Any]:
         """Get recommended learning path for a subject"""
+        return cached_recommendations(
+            user_id, 'learning_path', {'subject': subject, 'current_level': current_level},
+            lambda: self._compute_learning_path_recommendations(user_id, subject, current_level),
+            cacheable=lambda result: bool(result) and 'error' not in result
+        )
+
+    def _compute_learning_path_recommendations(self, user_id: int, subject: str,
+                                               current_level: str) -> Dict[str, Any]:
         try:
             user = User.objects.get(id=user_id)
 
@@ -143,102 +207,59 @@ class RecommendationEngine:
     def _find_similar_users(self, user, limit: int = 10) -> List[int]:
         """Find users with similar learning profiles and performance"""
         try:
-            # Get all users with learning profiles
-            all_profiles = LearningProfile.objects.exclude(user=user).select_related('user')
-
-            similar_users = []
-            user_profile = self._get_user_profile(user)
-
-            for profile in all_profiles:
-                similarity_score = self._calculate_profile_similarity(user_profile, {
-                    'learning_style': profile.learning_style,
-                    'preferred_difficulty': profile.difficulty_preference,
-                    'strengths': profile.strengths,
-                    'weaknesses': profile.weaknesses,
-                    'learning_pace': profile.learning_pace
-                })
-
-                if similarity_score > 0.6:  # Similarity threshold
-                    similar_users.append((profile.user.id, similarity_score))
-
-            # Sort by similarity and return top users
-            similar_users.sort(key=lambda x: x[1], reverse=True)
-            return [user_id for user_id, score in similar_users[:limit]]
+            index = self._get_similarity_index()
+            if index is None:
+                return []
+            similar_users = index.neighbours(user.id, limit, SIMILARITY_THRESHOLD)
+            if similar_users is None:
+                # Profile created since the last refresh; score it against its shard directly
+                similar_users = index.query(self._get_user_profile(user), limit, SIMILARITY_THRESHOLD, exclude=user.id)
+            return similar_users
 
         except Exception as e:
             logger.error(f"Failed to find similar users: {e}")
             return []
 
-    def _calculate_profile_similarity(self, profile1: Dict, profile2: Dict) -> float:
-        """Calculate similarity between two learning profiles"""
-        try:
-            score = 0.0
-            total_factors = 0
-
-            # Learning style similarity
-            if profile1.get('learning_style') == profile2.get('learning_style'):
-                score += 1.0
-            total_factors += 1
-
-            # Difficulty preference similarity
-            if profile1.get('preferred_difficulty') == profile2.get('preferred_difficulty'):
-                score += 1.0
-            total_factors += 1
-
-            # Learning pace similarity (within 20% range)
-            pace1 = profile1.get('learning_pace', 1.0)
-            pace2 = profile2.get('learning_pace', 1.0)
-            if abs(pace1 - pace2) <= 0.2:
-                score += 1.0
-            total_factors += 1
-
-            # Subject strengths overlap
-            strengths1 = set(profile1.get('strengths', []))
-            strengths2 = set(profile2.get('strengths', []))
-            if strengths1 and strengths2:
-                overlap = len(strengths1.intersection(strengths2))
-                score += overlap / max(len(strengths1), len(strengths2))
-                total_factors += 1
-
-            return score / total_factors if total_factors > 0 else 0.0
-
-        except Exception as e:
-            logger.error(f"Profile similarity calculation failed: {e}")
-            return 0.0
-
     def _get_collaborative_recommendations(self, similar_users: List[int], current_user) -> List[Dict]:
         """Get collaborative filtering recommendations"""
         try:
-            recommendations = []
+            if not similar_users:
+                return []
+
+            # Subjects each similar user performs well in, from one grouped query
+            high_performance = PerformanceMetrics.objects.filter(
+                user_id__in=similar_users
+            ).values('user_id', 'subject').annotate(
+                avg_accuracy=Avg('correct_answers') / Avg('total_questions'),
+                avg_mastery=Avg('mastery_level')
+            ).filter(avg_accuracy__gte=0.8)  # High performers only
+
+            by_user: Dict[int, List[Dict]] = {}
+            for perf in high_performance:
+                by_user.setdefault(perf['user_id'], []).append(perf)
+
+            # Current user's mastery in those subjects, from a second query
+            subjects = {perf['subject'] for perfs in by_user.values() for perf in perfs}
+            user_mastery = dict(
+                PerformanceMetrics.objects.filter(
+                    user=current_user, subject__in=subjects
+                ).values('subject').annotate(
+                    avg_mastery=Avg('mastery_level')
+                ).values_list('subject', 'avg_mastery')
+            ) if subjects else {}
 
-            # Get subjects that similar users perform well in
+            recommendations = []
             for user_id in similar_users:
-                try:
-                    similar_user = User.objects.get(id=user_id)
-                    performance = PerformanceMetrics.objects.filter(
-                        user=similar_user
-                    ).values('subject').annotate(
-                        avg_accuracy=Avg('correct_answers') / Avg('total_questions'),
-                        avg_mastery=Avg('mastery_level')
-                    ).filter(avg_accuracy__gte=0.8)  # High performers only
-
-                    for perf in performance:
-                        # Check if current user hasn't mastered this subject
-                        user_perf = PerformanceMetrics.objects.filter(
-                            user=current_user,
-                            subject=perf['subject']
-                        ).aggregate(avg_mastery=Avg('mastery_level'))
-
-                        if not user_perf['avg_mastery'] or user_perf['avg_mastery'] < 0.7:
-                            recommendations.append({
-                                'subject': perf['subject'],
-                                'reason': 'Similar students excel in this subject',
-                                'confidence': min(perf['avg_accuracy'], 0.95),
-                                'type': 'collaborative'
-                            })
-
-                except User.DoesNotExist:
-                    continue
+                for perf in by_user.get(user_id, []):
+                    # Check if current user hasn't mastered this subject
+                    mastery = user_mastery.get(perf['subject'])
+                    if not mastery or mastery < 0.7:
+                        recommendations.append({
+                            'subject': perf['subject'],
+                            'reason': 'Similar students excel in this subject',
+                            'confidence': min(perf['avg_accuracy'], 0.95),
+                            'type': 'collaborative'
+                        })
 
             return recommendations
 
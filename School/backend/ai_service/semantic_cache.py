@@ -0,0 +1,210 @@
+"""
+Semantic response cache for OpenEdTex AI Service
+Reuses answers to near-identical prompts by comparing sentence embeddings
+"""
+
+import os
+import re
+import copy
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from embeddings import EMBEDDING_MODEL, LocalEmbedder, local_embedder
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))  # cosine similarity
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))  # seconds
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+SEMANTIC_CACHE_EMBEDDING_MODEL = os.getenv("SEMANTIC_CACHE_EMBEDDING_MODEL", EMBEDDING_MODEL)
+
+# Share the embedding endpoint's model unless the cache is configured with its own
+semantic_embedder = (
+    local_embedder if SEMANTIC_CACHE_EMBEDDING_MODEL == EMBEDDING_MODEL
+    else LocalEmbedder(SEMANTIC_CACHE_EMBEDDING_MODEL)
+)
+
+
+# Prompts with numbers or math differ in tokens the embedding barely weighs
+# ("what is 2+3" vs "what is 2+5"), so they are only ever matched exactly
+EXACT_ONLY_PATTERN = re.compile(r"[0-9+*/^=<>%\u00b1\u00d7\u00f7\u2200-\u22ff]")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _exact_only(text: str) -> bool:
+    return bool(EXACT_ONLY_PATTERN.search(text))
+
+
+class SemanticCache:
+    """TTL + LRU cache whose lookups match on embedding similarity
+
+    Entries are grouped into buckets by ``scope`` (e.g. a course) and by the
+    exact ``params`` the answer depends on (grade level, model, ...); only the
+    free-text prompt is compared semantically, and only within its bucket.
+    Prompts containing digits or math symbols, and every prompt when there is
+    no embedder, are served from exact (normalized) matches only.
+    """
+
+    def __init__(self, name: str, embed_fn: Optional[Callable[[List[str]], np.ndarray]] = semantic_embedder,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl: int = SEMANTIC_CACHE_TTL,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.buckets: Dict[str, Dict[int, None]] = {}
+        self.exact: Dict[tuple, int] = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _bucket(scope: Optional[str], params: Optional[Dict[str, Any]]) -> str:
+        return f"{scope or 'global'}|{json.dumps(params or {}, sort_keys=True, default=str)}"
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self.embed_fn is None or _exact_only(text):
+            return None
+        try:
+            return np.asarray(self.embed_fn([text])[0], dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Semantic cache {self.name}: embedding failed, exact matching only: {e}")
+            return None
+
+    def _remove(self, entry_id: int):
+        """Drop one entry (caller holds the lock)"""
+        entry = self.entries.pop(entry_id)
+        self.buckets[entry["bucket"]].pop(entry_id, None)
+        if not self.buckets[entry["bucket"]]:
+            del self.buckets[entry["bucket"]]
+        if self.exact.get((entry["bucket"], entry["text"])) == entry_id:
+            del self.exact[(entry["bucket"], entry["text"])]
+
+    def _hit(self, entry_id: int) -> Any:
+        """Mark an entry recently used and return a copy of its value (caller holds the lock)"""
+        self.entries.move_to_end(entry_id)
+        self.hits += 1
+        return copy.deepcopy(self.entries[entry_id]["value"])
+
+    def lookup(self, text: str, scope: Optional[str] = None,
+               params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """Return a cached answer for a prompt close enough to ``text``, or None"""
+        return self._lookup(text, scope, params)[0]
+
+    def _lookup(self, text: str, scope: Optional[str],
+                params: Optional[Dict[str, Any]]) -> tuple:
+        """Return (cached value or None, the prompt's embedding if one was computed)"""
+        bucket = self._bucket(scope, params)
+        normalized = _normalize(text)
+        now = time.time()
+
+        with self.lock:
+            entry_id = self.exact.get((bucket, normalized))
+            if entry_id is not None:
+                if self.entries[entry_id]["expires"] > now:
+                    return self._hit(entry_id), None
+                self._remove(entry_id)
+
+        vector = self._embed(text)
+        if vector is None:
+            with self.lock:
+                self.misses += 1
+            return None, None
+
+        with self.lock:
+            for entry_id in [i for i in self.buckets.get(bucket, ()) if self.entries[i]["expires"] <= now]:
+                self._remove(entry_id)
+
+            candidates = [i for i in self.buckets.get(bucket, ()) if self.entries[i]["vector"] is not None]
+            if candidates:
+                matrix = np.stack([self.entries[i]["vector"] for i in candidates])
+                similarities = matrix @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self.semantic_hits += 1
+                    return self._hit(candidates[best]), vector
+
+            self.misses += 1
+            return None, vector
+
+    def store(self, text: str, value: Any, scope: Optional[str] = None,
+              params: Optional[Dict[str, Any]] = None,
+              vector: Optional[np.ndarray] = None):
+        """Cache an answer for ``text``, evicting the least recently used entries when full"""
+        if vector is None:
+            vector = self._embed(text)
+        bucket = self._bucket(scope, params)
+        normalized = _normalize(text)
+
+        with self.lock:
+            previous = self.exact.get((bucket, normalized))
+            if previous is not None:
+                self._remove(previous)
+
+            entry_id = self.next_id
+            self.next_id += 1
+            self.entries[entry_id] = {
+                "bucket": bucket,
+                "text": normalized,
+                "vector": vector,
+                "value": copy.deepcopy(value),
+                "expires": time.time() + self.ttl,
+            }
+            self.buckets.setdefault(bucket, {})[entry_id] = None
+            self.exact[(bucket, normalized)] = entry_id
+
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, text: str, compute: Callable[[], Any], scope: Optional[str] = None,
+                       params: Optional[Dict[str, Any]] = None,
+                       cacheable: Callable[[Any], bool] = lambda value: True) -> Any:
+        """Serve from the cache or call ``compute`` and cache its result"""
+        cached, vector = self._lookup(text, scope, params)
+        if cached is not None:
+            return cached
+
+        value = compute()
+        if cacheable(value):
+            self.store(text, value, scope, params, vector=vector)
+        return value
+
+    def clear(self, scope: Optional[str] = None):
+        """Drop every entry, or only those in one scope"""
+        with self.lock:
+            for entry_id in list(self.entries):
+                if scope is None or self.entries[entry_id]["bucket"].startswith(f"{scope}|"):
+                    self._remove(entry_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
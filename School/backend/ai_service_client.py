@@ -4,35 +4,217 @@ Handles communication with self-hosted AI service with OpenAI fallback
 """
 
 import os
+import json
 import logging
+import threading
 import requests
-from typing import List, Dict, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, List, Dict, Iterator, Optional, Tuple
 import openai
 import time
 
 logger = logging.getLogger(__name__)
 
+# Connection and failover tuning
+AI_SERVICE_CONNECT_TIMEOUT = float(os.getenv('AI_SERVICE_CONNECT_TIMEOUT', '2'))
+AI_SERVICE_TIMEOUT = float(os.getenv('AI_SERVICE_TIMEOUT', '30'))
+AI_SERVICE_POOL_SIZE = int(os.getenv('AI_SERVICE_POOL_SIZE', '20'))
+# Opt-in: start the next backend in parallel once the current one has been silent this long.
+# Off by default (0) since a hedge to OpenAI is a paid call that the sync path cannot cancel.
+AI_SERVICE_HEDGE_AFTER = float(os.getenv('AI_SERVICE_HEDGE_AFTER', '0'))
+# Skip a backend for BREAKER_COOLDOWN seconds after BREAKER_FAILURES consecutive failures
+AI_SERVICE_BREAKER_FAILURES = int(os.getenv('AI_SERVICE_BREAKER_FAILURES', '3'))
+AI_SERVICE_BREAKER_COOLDOWN = float(os.getenv('AI_SERVICE_BREAKER_COOLDOWN', '30'))
+
+FALLBACK_RESPONSE = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
+
+
+class CircuitBreaker:
+    """Stops calling a backend after repeated failures until a cooldown has passed
+
+    After the cooldown a single trial call is let through (half-open); its
+    success closes the breaker, its failure re-opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = AI_SERVICE_BREAKER_FAILURES,
+                 cooldown: float = AI_SERVICE_BREAKER_COOLDOWN):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Give back a half-open trial whose attempt was cancelled or never ran"""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info(f"{self.name} circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial_in_flight:
+                    logger.warning(
+                        f"{self.name} circuit open for {self.cooldown:.0f}s after {self.failures} failures"
+                    )
+                self.opened_at = time.time()
+            self.trial_in_flight = False
+
+    def status(self) -> Dict[str, Any]:
+        return {'state': self.state, 'failures': self.failures}
+
+
 class AIServiceClient:
-    """Client for communicating with AI services"""
+    """Client for communicating with AI services
+
+    Calls share one keep-alive ``requests`` session. Each backend sits behind a circuit breaker, and when
+    the preferred backend is slow the next one is started in parallel (hedged)
+    and whichever answers first wins.
+    """
 
     def __init__(self):
         self.ai_service_url = os.getenv('AI_SERVICE_URL', 'http://localhost:8001')
         self.openai_api_key = os.getenv('OPENAI_API_KEY', '')
-        self.ai_mode = os.getenv('AI_MODE', 'hybrid')  # 'ollama', 'openai', 'hybrid'
+        self.ai_mode = os.getenv('AI_MODE', 'hybrid')  # 'ollama', 'openai', 'llamacpp', 'hybrid'
+        self.hedge_after = AI_SERVICE_HEDGE_AFTER
+
+        # Pooled keep-alive connections to the AI service
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=AI_SERVICE_POOL_SIZE, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Hedged attempts run here so the caller can return as soon as one succeeds
+        self.executor = ThreadPoolExecutor(max_workers=AI_SERVICE_POOL_SIZE, thread_name_prefix='ai-client')
+
+        self.service_breaker = CircuitBreaker('ai_service')
+        self.openai_breaker = CircuitBreaker('openai')
 
         # Initialize OpenAI client if available
         self.openai_client = None
         if self.openai_api_key:
             try:
-                self.openai_client = openai.OpenAI(api_key=self.openai_api_key)
+                self.openai_client = openai.OpenAI(api_key=self.openai_api_key, max_retries=1)
             except Exception as e:
                 logger.warning(f"Failed to initialize OpenAI client: {e}")
                 self.openai_client = None
 
+    def _uses_service(self) -> bool:
+        return self.ai_mode in ['hybrid', 'ollama', 'llamacpp']
+
+    def _uses_openai(self) -> bool:
+        return self.ai_mode in ['hybrid', 'openai'] and self.openai_client is not None
+
+    def _service_attempt(self, messages, model, temperature, max_tokens,
+                         conversation_id, cache_scope) -> Optional[Tuple[str, int, str]]:
+        response = self._call_ai_service(messages, model, temperature, max_tokens,
+                                         conversation_id, cache_scope)
+        if response:
+            self.service_breaker.record_success()
+            return response['response'], response.get('tokens_used') or 0, 'ollama'
+        self.service_breaker.record_failure()
+        return None
+
+    def _openai_attempt(self, messages, model, temperature, max_tokens) -> Optional[Tuple[str, int, str]]:
+        try:
+            response = self._call_openai(messages, model, temperature, max_tokens)
+            self.openai_breaker.record_success()
+            return response[0], response[1], 'openai'
+        except Exception as e:
+            logger.error(f"OpenAI fallback failed: {e}")
+            self.openai_breaker.record_failure()
+            return None
+
+    def _attempts(self, messages, model, temperature, max_tokens,
+                  conversation_id, cache_scope) -> List[Tuple[CircuitBreaker, Callable[[], Optional[Tuple[str, int, str]]]]]:
+        """Backends to try in preference order, each with the breaker guarding it"""
+        attempts = []
+        if self._uses_service():
+            attempts.append((self.service_breaker, lambda: self._service_attempt(
+                messages, model, temperature, max_tokens, conversation_id, cache_scope)))
+        if self._uses_openai():
+            attempts.append((self.openai_breaker, lambda: self._openai_attempt(
+                messages, model, temperature, max_tokens)))
+        return attempts
+
+    def _hedged(self, attempts: List[Tuple[CircuitBreaker, Callable[[], Optional[Any]]]]) -> Optional[Any]:
+        """Run attempts in order, starting the next early if the current one is slow
+
+        A backend's breaker is only consulted when its attempt is about to
+        start, so a half-open trial is never claimed by an attempt that does
+        not run. Returns the first non-None result; slower attempts are left
+        to finish in the background and their results discarded.
+        """
+        pending = list(attempts)
+        futures = {}
+
+        def launch() -> bool:
+            while pending:
+                breaker, attempt = pending.pop(0)
+                if breaker.allow():
+                    futures[self.executor.submit(attempt)] = breaker
+                    return True
+            return False
+
+        launch()
+        while futures:
+            can_hedge = bool(pending) and self.hedge_after > 0
+            done, _ = wait(futures, timeout=self.hedge_after if can_hedge else None,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                logger.info(f"AI backend slow after {self.hedge_after}s, hedging with the next one")
+                launch()
+                continue
+
+            for future in done:
+                breaker = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"AI backend attempt failed: {e}")
+                    breaker.record_failure()
+                    result = None
+                if result is not None:
+                    return result
+            if not futures:
+                launch()
+        return None
+
     def chat_completion(self, messages: List[Dict[str, str]],
                        model: Optional[str] = None,
                        temperature: float = 0.7,
-                       max_tokens: int = 1000) -> Tuple[str, int, float, str]:
+                       max_tokens: int = 1000,
+                       conversation_id: Optional[str] = None,
+                       cache_scope: Optional[str] = None) -> Tuple[str, int, float, str]:
         """
         Generate chat completion with fallback logic
 
@@ -41,47 +223,166 @@ class AIServiceClient:
         """
         start_time = time.time()
 
-        # Try AI service first (if in hybrid or ollama mode)
-        if self.ai_mode in ['hybrid', 'ollama']:
+        # AI service first (hybrid/ollama/llamacpp), then OpenAI (hybrid/openai), hedged
+        result = self._hedged(self._attempts(messages, model, temperature, max_tokens,
+                                             conversation_id, cache_scope))
+        if result is not None:
+            response_text, tokens_used, service_type = result
+            return response_text, tokens_used, round(time.time() - start_time, 2), service_type
+
+        # Final fallback
+        response_time = round(time.time() - start_time, 2)
+        return FALLBACK_RESPONSE, 0, response_time, 'fallback'
+
+    def stream_chat_completion(self, messages: List[Dict[str, str]],
+                               model: Optional[str] = None,
+                               temperature: float = 0.7,
+                               max_tokens: int = 1000,
+                               conversation_id: Optional[str] = None,
+                               cache_scope: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a chat completion token by token with the same fallback order
+
+        Yields ``{"token": str}`` events followed by one final event of the form
+        ``{"done": True, "tokens_used": int, "response_time": float, "service_type": str}``.
+        """
+        start_time = time.time()
+
+        if self._uses_service() and self.service_breaker.allow():
+            streamed_any = False
             try:
-                response = self._call_ai_service(messages, model, temperature, max_tokens)
-                if response:
-                    response_time = round(time.time() - start_time, 2)
-                    return response['response'], response.get('tokens_used', 0), response_time, 'ollama'
+                for event in self._stream_ai_service(messages, model, temperature, max_tokens,
+                                                     conversation_id, cache_scope):
+                    if event.get('error'):
+                        raise Exception(event['error'])
+                    if event.get('done'):
+                        self.service_breaker.record_success()
+                        yield {
+                            'done': True,
+                            'tokens_used': event.get('tokens_used') or 0,
+                            'response_time': round(time.time() - start_time, 2),
+                            'service_type': 'ollama'
+                        }
+                        return
+                    streamed_any = True
+                    yield {'token': event.get('token', '')}
+            except GeneratorExit:
+                # Caller stopped reading; the attempt never settled
+                self.service_breaker.release()
+                raise
             except Exception as e:
-                logger.warning(f"AI service failed: {e}")
+                logger.warning(f"AI service stream failed: {e}")
+                self.service_breaker.record_failure()
 
-        # Fallback to OpenAI (if in hybrid or openai mode)
-        if self.ai_mode in ['hybrid', 'openai'] and self.openai_client:
+            # Once tokens have reached the caller we can't switch backends mid-answer
+            if streamed_any:
+                yield {
+                    'done': True,
+                    'tokens_used': 0,
+                    'response_time': round(time.time() - start_time, 2),
+                    'service_type': 'ollama'
+                }
+                return
+
+        if self._uses_openai() and self.openai_breaker.allow():
             try:
-                response = self._call_openai(messages, model, temperature, max_tokens)
-                response_time = round(time.time() - start_time, 2)
-                return response[0], response[1], response[2], 'openai'
+                for token in self._stream_openai(messages, model, temperature, max_tokens):
+                    yield {'token': token}
+                self.openai_breaker.record_success()
+                yield {
+                    'done': True,
+                    'tokens_used': 0,
+                    'response_time': round(time.time() - start_time, 2),
+                    'service_type': 'openai'
+                }
+                return
+            except GeneratorExit:
+                self.openai_breaker.release()
+                raise
             except Exception as e:
-                logger.error(f"OpenAI fallback failed: {e}")
+                logger.error(f"OpenAI streaming fallback failed: {e}")
+                self.openai_breaker.record_failure()
 
-        # Final fallback
-        fallback_response = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-        response_time = round(time.time() - start_time, 2)
-        return fallback_response, 0, response_time, 'fallback'
+        yield {'token': FALLBACK_RESPONSE}
+        yield {
+            'done': True,
+            'tokens_used': 0,
+            'response_time': round(time.time() - start_time, 2),
+            'service_type': 'fallback'
+        }
+
+    def _stream_ai_service(self, messages: List[Dict[str, str]],
+                           model: Optional[str],
+                           temperature: float,
+                           max_tokens: int,
+                           conversation_id: Optional[str] = None,
+                           cache_scope: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Read the local AI service's SSE stream and yield decoded events"""
+        payload = {
+            "messages": messages,
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            "conversation_id": conversation_id,
+            "cache_scope": cache_scope
+        }
+
+        with self.session.post(
+            f"{self.ai_service_url}/chat",
+            json=payload,
+            stream=True,
+            timeout=(AI_SERVICE_CONNECT_TIMEOUT, AI_SERVICE_TIMEOUT)  # connect, max gap between tokens
+        ) as response:
+            if response.status_code != 200:
+                raise Exception(f"AI service returned status {response.status_code}")
+
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                yield json.loads(line[len('data:'):].strip())
+
+    def _stream_openai(self, messages: List[Dict[str, str]],
+                       model: Optional[str],
+                       temperature: float,
+                       max_tokens: int) -> Iterator[str]:
+        """Stream tokens directly from the OpenAI API"""
+        if not self.openai_client:
+            raise Exception("OpenAI client not initialized")
+
+        stream = self.openai_client.chat.completions.create(
+            model=model or "gpt-3.5-turbo",
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
     def _call_ai_service(self, messages: List[Dict[str, str]],
                         model: Optional[str],
                         temperature: float,
-                        max_tokens: int) -> Optional[Dict]:
+                        max_tokens: int,
+                        conversation_id: Optional[str] = None,
+                        cache_scope: Optional[str] = None) -> Optional[Dict]:
         """Call the local AI service"""
         try:
             payload = {
                 "messages": messages,
                 "model": model,
                 "temperature": temperature,
-                "max_tokens": max_tokens
+                "max_tokens": max_tokens,
+                "conversation_id": conversation_id,
+                "cache_scope": cache_scope
             }
 
-            response = requests.post(
+            response = self.session.post(
                 f"{self.ai_service_url}/chat",
                 json=payload,
-                timeout=30
+                timeout=(AI_SERVICE_CONNECT_TIMEOUT, AI_SERVICE_TIMEOUT)
             )
 
             if response.status_code == 200:
@@ -119,7 +420,7 @@ class AIServiceClient:
     def get_available_models(self) -> List[Dict]:
         """Get list of available models from AI service"""
         try:
-            response = requests.get(f"{self.ai_service_url}/models", timeout=10)
+            response = self.session.get(f"{self.ai_service_url}/models", timeout=10)
             if response.status_code == 200:
                 return response.json()
             return []
@@ -130,9 +431,14 @@ class AIServiceClient:
     def health_check(self) -> Dict:
         """Check AI service health"""
         try:
-            response = requests.get(f"{self.ai_service_url}/health", timeout=5)
+            response = self.session.get(f"{self.ai_service_url}/health", timeout=5)
             if response.status_code == 200:
-                return response.json()
+                health = response.json()
+                health['client_circuits'] = {
+                    'ai_service': self.service_breaker.status(),
+                    'openai': self.openai_breaker.status()
+                }
+                return health
             return {"status": "unhealthy"}
         except Exception as e:
             return {"status": "unreachable"}
@@ -143,11 +449,29 @@ ai_client = AIServiceClient()
 def get_ai_response(messages: List[Dict[str, str]],
                    model: Optional[str] = None,
                    temperature: float = 0.7,
-                   max_tokens: int = 1000) -> Tuple[str, int, float, str]:
+                   max_tokens: int = 1000,
+                   conversation_id: Optional[str] = None,
+                   cache_scope: Optional[str] = None) -> Tuple[str, int, float, str]:
     """
     Convenience function to get AI response
 
     Returns:
         Tuple of (response_text, tokens_used, response_time, service_type)
     """
-    return ai_client.chat_completion(messages, model, temperature, max_tokens)
+    return ai_client.chat_completion(messages, model, temperature, max_tokens, conversation_id, cache_scope)
+
+
+def stream_ai_response(messages: List[Dict[str, str]],
+                       model: Optional[str] = None,
+                       temperature: float = 0.7,
+                       max_tokens: int = 1000,
+                       conversation_id: Optional[str] = None,
+                       cache_scope: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Convenience function to stream an AI response
+
+    Yields:
+        ``{"token": str}`` events, then a final ``{"done": True, ...}`` summary
+    """
+    return ai_client.stream_chat_completion(messages, model, temperature, max_tokens,
+                                            conversation_id, cache_scope)
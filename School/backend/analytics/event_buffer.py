@@ -0,0 +1,188 @@
+"""
+Buffered analytics event ingestion.
+
+``track_event`` and the event list endpoint hand unsaved AnalyticsEvent
+instances to ``record_event``, which appends them to an in-process queue and
+returns immediately. A background writer thread drains the queue and stores
+each batch with one ``bulk_create``. bulk_create sends no post_save signals,
+so the batch is folded into UserAnalytics once per user instead of once per
+event.
+
+If the database is unavailable the writer retries a batch with exponential
+backoff and only drops it after ANALYTICS_EVENT_WRITE_RETRIES failed
+attempts. Events still in the queue when a process is killed are lost; a
+normal interpreter shutdown flushes them.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+
+from .models import AnalyticsEvent
+from .signals import record_user_activity
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_EVENT_BUFFERING = getattr(settings, 'ANALYTICS_EVENT_BUFFERING', True)
+ANALYTICS_EVENT_BATCH_SIZE = getattr(settings, 'ANALYTICS_EVENT_BATCH_SIZE', 500)
+ANALYTICS_EVENT_FLUSH_INTERVAL = getattr(settings, 'ANALYTICS_EVENT_FLUSH_INTERVAL', 2.0)
+ANALYTICS_EVENT_MAX_BUFFER = getattr(settings, 'ANALYTICS_EVENT_MAX_BUFFER', 10000)
+ANALYTICS_EVENT_WRITE_RETRIES = getattr(settings, 'ANALYTICS_EVENT_WRITE_RETRIES', 5)
+ANALYTICS_EVENT_RETRY_DELAY = 0.5  # seconds, doubled after each failed attempt
+
+_queue = queue.Queue(maxsize=ANALYTICS_EVENT_MAX_BUFFER)
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def record_event(event):
+    """Queue an unsaved event for the background writer.
+
+    Returns True if the event was buffered, False if it was written inline
+    (buffering disabled or the buffer is full).
+    """
+    if not ANALYTICS_EVENT_BUFFERING:
+        write_events([event])
+        return False
+
+    _ensure_writer()
+    try:
+        _queue.put_nowait(event)
+        return True
+    except queue.Full:
+        # Back-pressure: the request pays for its own write rather than dropping the event
+        logger.warning(f"Analytics event buffer full ({ANALYTICS_EVENT_MAX_BUFFER}), writing inline")
+        write_events([event])
+        return False
+
+
+def write_events(events):
+    """Store events with bulk_create and fold them into the users' analytics."""
+    saved = _store(events)
+    _record_activity(saved)
+    return len(saved)
+
+
+def _store(events, saved=None):
+    """Insert events in one transaction, skipping any that violate a constraint.
+
+    Committed events are appended to ``saved``, which is also returned.
+    """
+    saved = [] if saved is None else saved
+    try:
+        with transaction.atomic():
+            AnalyticsEvent.objects.bulk_create(events, batch_size=ANALYTICS_EVENT_BATCH_SIZE)
+        saved.extend(events)
+    except IntegrityError:
+        # One event with a dangling foreign key must not drop the whole batch
+        for event in events:
+            try:
+                with transaction.atomic():
+                    AnalyticsEvent.objects.bulk_create([event])
+                saved.append(event)
+            except IntegrityError as e:
+                logger.warning(f"Dropping analytics event {event.event_type} for user {event.user_id}: {e}")
+    return saved
+
+
+def _store_with_retry(events):
+    """Like _store, but retry transient database errors with exponential backoff."""
+    saved = []
+    for attempt in range(ANALYTICS_EVENT_WRITE_RETRIES):
+        try:
+            return _store(events, saved)
+        except DatabaseError as e:
+            if attempt == ANALYTICS_EVENT_WRITE_RETRIES - 1:
+                raise
+            delay = ANALYTICS_EVENT_RETRY_DELAY * 2 ** attempt
+            logger.warning(f"Writing {len(events)} analytics events failed ({e}); retrying in {delay}s")
+            time.sleep(delay)
+            # Retry only what was rolled back, without the primary keys the failed insert handed out
+            committed = {id(event) for event in saved}
+            events = [event for event in events if id(event) not in committed]
+            for event in events:
+                event.pk = None
+            close_old_connections()
+
+
+def _record_activity(saved):
+    latest = {}
+    for event in saved:
+        if event.user_id not in latest or event.timestamp > latest[event.user_id]:
+            latest[event.user_id] = event.timestamp
+    for user_id, timestamp in latest.items():
+        record_user_activity(user_id, timestamp)
+
+
+def flush():
+    """Write everything currently buffered in this process."""
+    written = 0
+    while True:
+        batch = _drain(block=False)
+        if not batch:
+            return written
+        written += write_events(batch)
+
+
+def pending():
+    """Number of events waiting in this process's buffer."""
+    return _queue.qsize()
+
+
+def _drain(block=True):
+    """Collect up to one batch, waiting at most the flush interval after the first event."""
+    batch = []
+    try:
+        batch.append(_queue.get() if block else _queue.get_nowait())
+    except queue.Empty:
+        return batch
+
+    deadline = time.monotonic() + ANALYTICS_EVENT_FLUSH_INTERVAL
+    while len(batch) < ANALYTICS_EVENT_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        try:
+            batch.append(_queue.get(timeout=remaining) if block and remaining > 0 else _queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _ensure_writer():
+    global _writer, _writer_pid
+    # Threads do not survive fork, so a pre-forked worker starts its own writer
+    if _writer is not None and _writer_pid == os.getpid() and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is not None and _writer_pid == os.getpid() and _writer.is_alive():
+            return
+        _writer = threading.Thread(target=_run_writer, name='analytics-event-writer', daemon=True)
+        _writer_pid = os.getpid()
+        _writer.start()
+
+
+def _run_writer():
+    while True:
+        batch = _drain()
+        close_old_connections()
+        try:
+            _record_activity(_store_with_retry(batch))
+        except Exception as e:
+            logger.error(f"Dropping {len(batch)} analytics events after failed writes: {e}")
+        finally:
+            close_old_connections()
+
+
+@atexit.register
+def _flush_at_exit():
+    if not _queue.empty():
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Failed to flush analytics events at exit: {e}")
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from analytics.rollups import roll_up, ANALYTICS_ROLLUP_REWIND_HOURS
+
+
+class Command(BaseCommand):
+    help = 'Roll analytics events, sessions and quiz attempts up into hourly and daily buckets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Rebuild buckets from this date (YYYY-MM-DD) instead of the last rollup',
+        )
+        parser.add_argument(
+            '--rewind-hours',
+            type=int,
+            default=ANALYTICS_ROLLUP_REWIND_HOURS,
+            help='Hours before the last rollup to re-roll for late data',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = timezone.make_aware(datetime.strptime(options['since'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+
+        def progress(chunk_start, chunk_end):
+            self.stdout.write(f'  {chunk_start:%Y-%m-%d %H:%M} -> {chunk_end:%Y-%m-%d %H:%M}')
+
+        self.stdout.write('Rolling up analytics...')
+        stats = roll_up(since=since, rewind_hours=options['rewind_hours'], progress=progress)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rolled up {stats['start']:%Y-%m-%d %H:%M} -> {stats['end']:%Y-%m-%d %H:%M}: "
+                f"{stats['hourly_buckets']} hourly and {stats['daily_buckets']} daily buckets in {stats['seconds']}s"
+            )
+        )
@@ -1,5 +1,8 @@
-from django.core.management.base import BaseCommand
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from analytics.models import PlatformAnalytics, CourseAnalytics, UserAnalytics
+from analytics.recompute import recompute, recompute_parallel, DEFAULT_CHUNK_SIZE
 
 
 class Command(BaseCommand):
@@ -26,42 +29,39 @@ class Command(BaseCommand):
             action='store_true',
             help='Update all analytics',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Rows recomputed and written per transaction',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes to split the course/user id range across',
+        )
 
     def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be at least 1')
+
         if options['all'] or options['update_platform']:
             self.stdout.write('Updating platform analytics...')
+            start_time = time.time()
             platform_analytics = PlatformAnalytics.update_daily_stats()
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'Successfully updated platform analytics for {platform_analytics.date}'
+                    f'Successfully updated platform analytics for {platform_analytics.date} '
+                    f'in {time.time() - start_time:.1f}s'
                 )
             )
 
         if options['all'] or options['update_courses']:
-            self.stdout.write('Updating course analytics...')
-            course_analytics = CourseAnalytics.objects.all()
-            updated_count = 0
-            for analytics in course_analytics:
-                analytics.update_metrics()
-                updated_count += 1
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Successfully updated {updated_count} course analytics'
-                )
-            )
+            self._recompute('courses', CourseAnalytics, options)
 
         if options['all'] or options['update_users']:
-            self.stdout.write('Updating user analytics...')
-            user_analytics = UserAnalytics.objects.all()
-            updated_count = 0
-            for analytics in user_analytics:
-                analytics.update_metrics()
-                updated_count += 1
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Successfully updated {updated_count} user analytics'
-                )
-            )
+            self._recompute('users', UserAnalytics, options)
 
         if not any([options['update_platform'], options['update_courses'], options['update_users'], options['all']]):
             self.stdout.write(
@@ -69,3 +69,26 @@ class Command(BaseCommand):
                     'No update options specified. Use --help for available options.'
                 )
             )
+
+    def _recompute(self, kind, model, options):
+        total = model.objects.count()
+        workers = options['workers']
+        self.stdout.write(f'Updating {kind} analytics ({total} rows, {workers} worker(s))...')
+        start_time = time.time()
+
+        if workers > 1:
+            def progress(start_id, end_id, done, seconds):
+                self.stdout.write(f'  ids {start_id}-{end_id}: {done} rows in {seconds:.1f}s')
+
+            updated_count = recompute_parallel(kind, workers, options['chunk_size'], progress=progress)
+        else:
+            def progress(done, seconds):
+                self.stdout.write(f'  {done}/{total} rows ({done / seconds if seconds else 0:.0f} rows/s)')
+
+            updated_count = recompute(kind, chunk_size=options['chunk_size'], progress=progress)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully updated {updated_count} {kind[:-1]} analytics in {time.time() - start_time:.1f}s'
+            )
+        )
@@ -0,0 +1,177 @@
+# Generated by Django 4.2.7 on 2026-10-16 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0001_initial"),
+        ("analytics", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("rolled_up_to", models.DateTimeField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SessionRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=4
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("cohort", models.CharField(blank=True, max_length=20)),
+                ("session_count", models.PositiveIntegerField(default=0)),
+                ("duration_total", models.PositiveBigIntegerField(default=0)),
+                ("duration_count", models.PositiveIntegerField(default=0)),
+                ("bounce_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "ordering": ["-bucket_start"],
+                "indexes": [
+                    models.Index(
+                        fields=["granularity", "bucket_start"],
+                        name="analytics_s_granula_15a6c4_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="QuizRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=4
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("attempt_count", models.PositiveIntegerField(default=0)),
+                (
+                    "score_total",
+                    models.DecimalField(decimal_places=2, default=0.0, max_digits=14),
+                ),
+                ("passed_count", models.PositiveIntegerField(default=0)),
+                (
+                    "course",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="courses.course",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-bucket_start"],
+                "indexes": [
+                    models.Index(
+                        fields=["granularity", "bucket_start"],
+                        name="analytics_q_granula_236430_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="EventRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "granularity",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=4
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                (
+                    "event_type",
+                    models.CharField(
+                        choices=[
+                            ("login", "User Login"),
+                            ("logout", "User Logout"),
+                            ("page_view", "Page View"),
+                            ("course_view", "Course View"),
+                            ("lesson_view", "Lesson View"),
+                            ("quiz_start", "Quiz Start"),
+                            ("quiz_complete", "Quiz Complete"),
+                            ("ai_chat", "AI Chat Interaction"),
+                            ("classroom_join", "Classroom Join"),
+                            ("classroom_leave", "Classroom Leave"),
+                            ("enrollment", "Course Enrollment"),
+                            ("completion", "Course Completion"),
+                            ("download", "Resource Download"),
+                            ("search", "Search Query"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("cohort", models.CharField(blank=True, max_length=20)),
+                ("event_count", models.PositiveIntegerField(default=0)),
+                (
+                    "course",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="courses.course",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-bucket_start"],
+                "indexes": [
+                    models.Index(
+                        fields=["granularity", "bucket_start", "event_type"],
+                        name="analytics_e_granula_c55968_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -206,7 +206,11 @@ class UserAnalytics(models.Model):
         return f"Analytics for {self.user.username}"
 
     def update_metrics(self):
-        """Update all analytics metrics for the user."""
+        """Recompute all analytics metrics for the user.
+
+        Signals keep these counters current incrementally; this full
+        recomputation is only used to build a missing row or repair drift.
+        """
         from courses.models import Enrollment
         from ai_assistant.models import AIQuizAttempt, AIConversation
 
@@ -220,7 +224,7 @@ class UserAnalytics(models.Model):
             self.average_session_duration = self.total_session_time // self.total_sessions
 
         # Learning metrics
-        enrollments = Enrollment.objects.filter(user=self.user)
+        enrollments = Enrollment.objects.filter(student=self.user)
         self.courses_enrolled = enrollments.count()
         self.courses_completed = enrollments.filter(status='completed').count()
 
@@ -349,6 +353,84 @@ class PlatformAnalytics(models.Model):
         return analytics
 
 
+ROLLUP_GRANULARITIES = [
+    ('hour', 'Hour'),
+    ('day', 'Day'),
+]
+
+
+class EventRollup(models.Model):
+    """Event counts per hour or day, event type, course and user cohort (role)."""
+
+    granularity = models.CharField(max_length=4, choices=ROLLUP_GRANULARITIES)
+    bucket_start = models.DateTimeField()
+    event_type = models.CharField(max_length=20, choices=AnalyticsEvent.EVENT_TYPES)
+    course = models.ForeignKey('courses.Course', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    cohort = models.CharField(max_length=20, blank=True)
+    event_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-bucket_start']
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start', 'event_type']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} x{self.event_count} ({self.granularity} of {self.bucket_start})"
+
+
+class SessionRollup(models.Model):
+    """Session totals per hour or day of session start and user cohort (role)."""
+
+    granularity = models.CharField(max_length=4, choices=ROLLUP_GRANULARITIES)
+    bucket_start = models.DateTimeField()
+    cohort = models.CharField(max_length=20, blank=True)
+    session_count = models.PositiveIntegerField(default=0)
+    duration_total = models.PositiveBigIntegerField(default=0)  # in seconds
+    duration_count = models.PositiveIntegerField(default=0)  # sessions with a recorded duration
+    bounce_count = models.PositiveIntegerField(default=0)  # sessions with a single page view
+
+    class Meta:
+        ordering = ['-bucket_start']
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.session_count} sessions ({self.granularity} of {self.bucket_start})"
+
+
+class QuizRollup(models.Model):
+    """Quiz attempt totals per hour or day of attempt start and course."""
+
+    granularity = models.CharField(max_length=4, choices=ROLLUP_GRANULARITIES)
+    bucket_start = models.DateTimeField()
+    course = models.ForeignKey('courses.Course', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    attempt_count = models.PositiveIntegerField(default=0)
+    score_total = models.DecimalField(max_digits=14, decimal_places=2, default=0.00)
+    passed_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-bucket_start']
+        indexes = [
+            models.Index(fields=['granularity', 'bucket_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.attempt_count} quiz attempts ({self.granularity} of {self.bucket_start})"
+
+
+class RollupWatermark(models.Model):
+    """How far the rollup tables are complete; raw rows after this are not rolled up yet."""
+
+    name = models.CharField(max_length=50, unique=True)
+    rolled_up_to = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} rolled up to {self.rolled_up_to}"
+
+
 class Report(models.Model):
     """Model for generated analytics reports."""
 
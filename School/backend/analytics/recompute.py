@@ -0,0 +1,217 @@
+"""
+Bulk recomputation of UserAnalytics and CourseAnalytics.
+
+This is the repair path behind ``manage.py update_analytics``: it produces
+the same values as ``update_metrics()`` but for a whole chunk of rows at a
+time, using one grouped ``values().annotate()`` query per source table and a
+single ``bulk_update`` per chunk. ``recompute_parallel`` splits the id space
+into ranges and runs them in a process pool.
+"""
+
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import connections, transaction
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+from .models import AnalyticsEvent, UserSession, CourseAnalytics, UserAnalytics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+USER_FIELDS = [
+    'total_sessions', 'total_session_time', 'average_session_duration',
+    'courses_enrolled', 'courses_completed', 'quizzes_attempted', 'average_quiz_score',
+    'total_ai_interactions', 'last_activity', 'last_updated',
+]
+COURSE_FIELDS = [
+    'total_enrollments', 'active_enrollments', 'completion_rate',
+    'total_reviews', 'average_rating', 'quizzes_attempted', 'average_quiz_score',
+    'last_updated',
+]
+
+
+def _grouped(queryset, key, **aggregates):
+    """Run one grouped aggregate query and index the rows by ``key``."""
+    return {row[key]: row for row in queryset.values(key).annotate(**aggregates).order_by()}
+
+
+def _recompute_users(rows):
+    from courses.models import Enrollment
+    from ai_assistant.models import AIQuizAttempt, AIConversation
+
+    user_ids = [row.user_id for row in rows]
+    sessions = _grouped(
+        UserSession.objects.filter(user_id__in=user_ids), 'user_id',
+        count=Count('id'), total_time=Sum('duration')
+    )
+    enrollments = _grouped(
+        Enrollment.objects.filter(student_id__in=user_ids), 'student_id',
+        count=Count('id'), completed=Count('id', filter=Q(status='completed'))
+    )
+    quizzes = _grouped(
+        AIQuizAttempt.objects.filter(user_id__in=user_ids), 'user_id',
+        count=Count('id'), avg_score=Avg('score')
+    )
+    conversations = _grouped(
+        AIConversation.objects.filter(user_id__in=user_ids), 'user_id',
+        total_messages=Sum('total_messages')
+    )
+    events = _grouped(
+        AnalyticsEvent.objects.filter(user_id__in=user_ids), 'user_id',
+        last_activity=Max('timestamp')
+    )
+
+    now = timezone.now()
+    for analytics in rows:
+        user_id = analytics.user_id
+
+        session = sessions.get(user_id, {})
+        analytics.total_sessions = session.get('count', 0)
+        analytics.total_session_time = session.get('total_time') or 0
+        if analytics.total_sessions > 0:
+            analytics.average_session_duration = analytics.total_session_time // analytics.total_sessions
+
+        enrollment = enrollments.get(user_id, {})
+        analytics.courses_enrolled = enrollment.get('count', 0)
+        analytics.courses_completed = enrollment.get('completed', 0)
+
+        quiz = quizzes.get(user_id, {})
+        analytics.quizzes_attempted = quiz.get('count', 0)
+        if analytics.quizzes_attempted > 0:
+            analytics.average_quiz_score = quiz.get('avg_score') or 0
+
+        analytics.total_ai_interactions = conversations.get(user_id, {}).get('total_messages') or 0
+
+        if user_id in events:
+            analytics.last_activity = events[user_id]['last_activity']
+
+        # bulk_update does not apply auto_now
+        analytics.last_updated = now
+
+    UserAnalytics.objects.bulk_update(rows, USER_FIELDS)
+
+
+def _recompute_courses(rows):
+    from courses.models import Enrollment, CourseReview
+    from ai_assistant.models import AIQuizAttempt
+
+    course_ids = [row.course_id for row in rows]
+    enrollments = _grouped(
+        Enrollment.objects.filter(course_id__in=course_ids), 'course_id',
+        count=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        completed=Count('id', filter=Q(status='completed'))
+    )
+    reviews = _grouped(
+        CourseReview.objects.filter(course_id__in=course_ids), 'course_id',
+        count=Count('id'), avg_rating=Avg('rating')
+    )
+    quizzes = _grouped(
+        AIQuizAttempt.objects.filter(quiz__course_id__in=course_ids), 'quiz__course_id',
+        count=Count('id'), avg_score=Avg('score')
+    )
+
+    now = timezone.now()
+    for analytics in rows:
+        course_id = analytics.course_id
+
+        enrollment = enrollments.get(course_id, {})
+        analytics.total_enrollments = enrollment.get('count', 0)
+        analytics.active_enrollments = enrollment.get('active', 0)
+        if analytics.total_enrollments > 0:
+            analytics.completion_rate = round(enrollment['completed'] / analytics.total_enrollments * 100, 2)
+
+        review = reviews.get(course_id, {})
+        analytics.total_reviews = review.get('count', 0)
+        if analytics.total_reviews > 0:
+            analytics.average_rating = round(review.get('avg_rating') or 0, 2)
+
+        quiz = quizzes.get(course_id, {})
+        analytics.quizzes_attempted = quiz.get('count', 0)
+        if analytics.quizzes_attempted > 0:
+            analytics.average_quiz_score = round(quiz.get('avg_score') or 0, 2)
+
+        # bulk_update does not apply auto_now
+        analytics.last_updated = now
+
+    CourseAnalytics.objects.bulk_update(rows, COURSE_FIELDS)
+
+
+KINDS = {
+    'users': (UserAnalytics, _recompute_users),
+    'courses': (CourseAnalytics, _recompute_courses),
+}
+
+
+def recompute(kind, start_id=None, end_id=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Recompute analytics rows with ids in [start_id, end_id], one transaction per chunk.
+
+    Returns the number of rows updated. ``progress(done, seconds)`` is called
+    after every chunk.
+    """
+    model, recompute_chunk = KINDS[kind]
+    start_time = time.time()
+    queryset = model.objects.order_by('id')
+    if start_id is not None:
+        queryset = queryset.filter(id__gte=start_id)
+    if end_id is not None:
+        queryset = queryset.filter(id__lte=end_id)
+
+    done = 0
+    last_id = None
+    while True:
+        # Keyset pagination keeps each chunk query cheap however far in we are
+        chunk_queryset = queryset.filter(id__gt=last_id) if last_id is not None else queryset
+        rows = list(chunk_queryset[:chunk_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            recompute_chunk(rows)
+        done += len(rows)
+        last_id = rows[-1].id
+        if progress:
+            progress(done, time.time() - start_time)
+    return done
+
+
+def _recompute_worker(kind, start_id, end_id, chunk_size):
+    import django
+    django.setup()
+    start_time = time.time()
+    done = recompute(kind, start_id, end_id, chunk_size)
+    connections.close_all()
+    return start_id, end_id, done, time.time() - start_time
+
+
+def recompute_parallel(kind, workers, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Recompute every row of ``kind`` across ``workers`` processes, one id range each.
+
+    ``progress(start_id, end_id, done, seconds)`` is called as each range finishes.
+    """
+    model, _ = KINDS[kind]
+    bounds = model.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return 0
+
+    span = bounds['high'] - bounds['low'] + 1
+    step = -(-span // workers)
+    ranges = [
+        (low, min(low + step - 1, bounds['high']))
+        for low in range(bounds['low'], bounds['high'] + 1, step)
+    ]
+
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_recompute_worker, kind, low, high, chunk_size) for low, high in ranges]
+        for future in as_completed(futures):
+            start_id, end_id, done, seconds = future.result()
+            total += done
+            if progress:
+                progress(start_id, end_id, done, seconds)
+    return total
@@ -0,0 +1,253 @@
+"""
+Hourly and daily rollups of analytics events, sessions and quiz attempts.
+
+``manage.py rollup_analytics`` aggregates raw rows into hourly buckets up to
+the last full hour, sums those into daily buckets, and records how far it got
+in a RollupWatermark. Each run re-rolls the last ANALYTICS_ROLLUP_REWIND_HOURS
+so late events (buffered or client-timestamped) and sessions whose duration
+is filled in after they end are picked up.
+
+Dashboard views read a time window with ``event_counts``, ``session_totals``
+and ``quiz_totals``: whole days come from daily buckets, the remaining whole
+hours from hourly buckets, and only the partial hours at the edges and the
+tail after the watermark are scanned raw.
+"""
+
+import time
+import logging
+from datetime import timedelta, timezone as dt_timezone
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import (
+    AnalyticsEvent, UserSession, EventRollup, SessionRollup, QuizRollup,
+    RollupWatermark
+)
+from ai_assistant.models import AIQuizAttempt
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_ROLLUP_REWIND_HOURS = getattr(settings, 'ANALYTICS_ROLLUP_REWIND_HOURS', 24)
+WATERMARK_NAME = 'analytics'
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def _floor_hour(value):
+    return value.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(value):
+    return _floor_hour(value).replace(hour=0)
+
+
+def _ceil(value, floor, step):
+    floored = floor(value)
+    return floored if floored == value else floored + step
+
+
+# (rollup model, raw queryset, raw time field, dimensions, aggregates over raw rows)
+def _sources():
+    return [
+        (
+            EventRollup, AnalyticsEvent.objects.all(), 'timestamp',
+            {'event_type': 'event_type', 'course_id': 'course_id', 'cohort': 'user__role'},
+            {'event_count': Count('id')},
+        ),
+        (
+            SessionRollup, UserSession.objects.all(), 'start_time',
+            {'cohort': 'user__role'},
+            {
+                'session_count': Count('id'),
+                'duration_total': Sum('duration'),
+                'duration_count': Count('duration'),
+                'bounce_count': Count('id', filter=Q(page_views=1)),
+            },
+        ),
+        (
+            QuizRollup, AIQuizAttempt.objects.all(), 'started_at',
+            {'course_id': 'quiz__course_id'},
+            {
+                'attempt_count': Count('id'),
+                'score_total': Sum('score'),
+                'passed_count': Count('id', filter=Q(score__gte=70)),
+            },
+        ),
+    ]
+
+
+def get_watermark():
+    """End of the rolled-up period, or None before the first rollup."""
+    return RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('rolled_up_to', flat=True).first()
+
+
+def _roll_up_hours(start, end):
+    """Rebuild the hourly buckets in [start, end) from raw rows."""
+    created = 0
+    for model, queryset, time_field, dimensions, aggregates in _sources():
+        model.objects.filter(granularity='hour', bucket_start__gte=start, bucket_start__lt=end).delete()
+        rows = queryset.filter(**{f'{time_field}__gte': start, f'{time_field}__lt': end}).annotate(
+            bucket=TruncHour(time_field, tzinfo=dt_timezone.utc)
+        ).values('bucket', *dimensions.values()).annotate(**aggregates).order_by()
+        buckets = model.objects.bulk_create([
+            model(
+                granularity='hour',
+                bucket_start=row['bucket'],
+                **{field: row[source] or ('' if field == 'cohort' else None) for field, source in dimensions.items()},
+                **{field: row[field] or 0 for field in aggregates}
+            )
+            for row in rows
+        ], batch_size=1000)
+        created += len(buckets)
+    return created
+
+
+def _roll_up_days(start, end):
+    """Rebuild the daily buckets in [start, end) by summing hourly buckets."""
+    created = 0
+    for model, _, _, dimensions, aggregates in _sources():
+        model.objects.filter(granularity='day', bucket_start__gte=start, bucket_start__lt=end).delete()
+        rows = model.objects.filter(granularity='hour', bucket_start__gte=start, bucket_start__lt=end).annotate(
+            day=TruncDay('bucket_start', tzinfo=dt_timezone.utc)
+        ).values('day', *dimensions).annotate(**{field: Sum(field) for field in aggregates}).order_by()
+        buckets = model.objects.bulk_create([
+            model(
+                granularity='day',
+                bucket_start=row['day'],
+                **{field: row[field] for field in dimensions},
+                **{field: row[field] for field in aggregates}
+            )
+            for row in rows
+        ], batch_size=1000)
+        created += len(buckets)
+    return created
+
+
+def roll_up(since=None, now=None, rewind_hours=ANALYTICS_ROLLUP_REWIND_HOURS, progress=None):
+    """Bring the rollups up to the last full hour, one day per transaction.
+
+    ``since`` forces a rebuild from that point; otherwise the run starts
+    ``rewind_hours`` before the current watermark (or at the oldest raw row).
+    """
+    start_time = time.time()
+    end = _floor_hour(now or timezone.now())
+    watermark = get_watermark()
+
+    if since is not None:
+        start = _floor_hour(since)
+    elif watermark is not None:
+        start = min(watermark, end) - timedelta(hours=rewind_hours)
+    else:
+        oldest = [
+            queryset.aggregate(oldest=Min(time_field))['oldest']
+            for _, queryset, time_field, _, _ in _sources()
+        ]
+        oldest = [value for value in oldest if value is not None]
+        start = _floor_hour(min(oldest)) if oldest else end
+
+    stats = {'start': start, 'end': end, 'hourly_buckets': 0, 'daily_buckets': 0}
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(_floor_day(chunk_start) + DAY, end)
+        with transaction.atomic():
+            stats['hourly_buckets'] += _roll_up_hours(chunk_start, chunk_end)
+            stats['daily_buckets'] += _roll_up_days(_floor_day(chunk_start), _floor_day(chunk_start) + DAY)
+            RollupWatermark.objects.update_or_create(
+                name=WATERMARK_NAME, defaults={'rolled_up_to': max(chunk_end, watermark or chunk_end)}
+            )
+        if progress:
+            progress(chunk_start, chunk_end)
+        chunk_start = chunk_end
+
+    stats['seconds'] = round(time.time() - start_time, 2)
+    logger.info(f"Rolled up analytics {start} -> {end}: {stats['hourly_buckets']} hourly buckets in {stats['seconds']}s")
+    return stats
+
+
+def split_window(start, end, watermark):
+    """Split [start, end) into daily bucket ranges, hourly bucket ranges and raw ranges."""
+    if watermark is None or min(watermark, end) <= start:
+        return [], [], [(start, end)]
+
+    first_hour = _ceil(start, _floor_hour, HOUR)
+    last_hour = _floor_hour(min(watermark, end))
+    if first_hour >= last_hour:
+        return [], [], [(start, end)]
+
+    first_day = _ceil(first_hour, _floor_day, DAY)
+    last_day = _floor_day(last_hour)
+    if first_day < last_day:
+        daily = [(first_day, last_day)]
+        hourly = [(first_hour, first_day), (last_day, last_hour)]
+    else:
+        daily = []
+        hourly = [(first_hour, last_hour)]
+
+    raw = [(start, first_hour), (last_hour, end)]
+    return daily, [r for r in hourly if r[0] < r[1]], [r for r in raw if r[0] < r[1]]
+
+
+def _windowed_totals(model, start, end, group_by=None, **filters):
+    """Sum a rollup's measures over [start, end), combining buckets with a raw scan of the edges."""
+    source = next(source for source in _sources() if source[0] is model)
+    _, queryset, time_field, dimensions, aggregates = source
+    daily, hourly, raw = split_window(start, end or timezone.now(), get_watermark())
+
+    parts = []
+    bucket_q = [
+        Q(granularity=granularity, bucket_start__gte=a, bucket_start__lt=b)
+        for granularity, ranges in (('day', daily), ('hour', hourly))
+        for a, b in ranges
+    ]
+    if bucket_q:
+        buckets = model.objects.filter(reduce(or_, bucket_q), **filters)
+        sums = {field: Sum(field) for field in aggregates}
+        parts.append(buckets.values(group_by).annotate(**sums).order_by() if group_by else [buckets.aggregate(**sums)])
+
+    if raw:
+        raw_filters = {dimensions.get(field, field): value for field, value in filters.items()}
+        rows = queryset.filter(
+            reduce(or_, [Q(**{f'{time_field}__gte': a, f'{time_field}__lt': b}) for a, b in raw]), **raw_filters
+        )
+        if group_by:
+            parts.append([
+                {group_by: row[dimensions[group_by]], **{field: row[field] for field in aggregates}}
+                for row in rows.values(dimensions[group_by]).annotate(**aggregates).order_by()
+            ])
+        else:
+            parts.append([rows.aggregate(**aggregates)])
+
+    totals = {}
+    for part in parts:
+        for row in part:
+            key = row[group_by] if group_by else None
+            bucket = totals.setdefault(key, dict.fromkeys(aggregates, 0))
+            for field in aggregates:
+                bucket[field] += row[field] or 0
+    if group_by:
+        return totals
+    return totals.get(None, dict.fromkeys(aggregates, 0))
+
+
+def event_counts(start, end=None, event_types=None):
+    """Number of events of each type in [start, end)."""
+    filters = {'event_type__in': event_types} if event_types else {}
+    counts = _windowed_totals(EventRollup, start, end, group_by='event_type', **filters)
+    return {event_type: totals['event_count'] for event_type, totals in counts.items()}
+
+
+def session_totals(start, end=None):
+    """Session count, duration total/count and bounces for sessions started in [start, end)."""
+    return _windowed_totals(SessionRollup, start, end)
+
+
+def quiz_totals(start, end=None):
+    """Attempt count, score total and passes for quiz attempts started in [start, end)."""
+    return _windowed_totals(QuizRollup, start, end)
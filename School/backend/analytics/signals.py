@@ -1,4 +1,19 @@
-from django.db.models.signals import post_save, post_delete
+"""
+Keep analytics rows current as activity happens.
+
+User counters and course quiz statistics are maintained incrementally with
+single ``F()`` UPDATEs, so recording a chat message or an event costs one
+query instead of a full recomputation. ``update_metrics`` is only run when
+an analytics row is missing; ``manage.py update_analytics`` recomputes
+everything from scratch and repairs any drift (e.g. after bulk deletes,
+which send no per-row signals).
+"""
+
+from decimal import Decimal
+
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.utils import timezone
@@ -7,11 +22,29 @@ from .models import (
     PlatformAnalytics
 )
 from courses.models import Enrollment, CourseReview
-from ai_assistant.models import AIQuizAttempt, AIConversation, AIMessage
+from ai_assistant.models import AIQuizAttempt, AIMessage
 
 User = get_user_model()
 
 
+def _increment(model, lookup, **updates):
+    """Apply F() updates to one analytics row, building the row from scratch if it is missing."""
+    updates['last_updated'] = timezone.now()
+    if not model.objects.filter(**lookup).update(**updates):
+        analytics, _ = model.objects.get_or_create(**lookup)
+        analytics.update_metrics()
+
+
+def _decrement(field, amount=1):
+    """Counter decrement that cannot go below zero."""
+    return Greatest(F(field) - amount, 0)
+
+
+def _running_average(average_field, count_field, value):
+    """New average after adding ``value`` to ``count_field`` samples."""
+    return (F(average_field) * F(count_field) + Decimal(str(value))) / (F(count_field) + 1)
+
+
 @receiver(post_save, sender=User)
 def create_user_analytics(sender, instance, created, **kwargs):
     """Create user analytics when a user is created."""
@@ -34,40 +67,109 @@ def update_course_analytics_on_review(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=AIQuizAttempt)
-def update_course_analytics_on_quiz_attempt(sender, instance, created, **kwargs):
-    """Update course analytics when a quiz is attempted."""
-    if instance.quiz.course:
-        course_analytics, _ = CourseAnalytics.objects.get_or_create(course=instance.quiz.course)
-        course_analytics.update_metrics()
+def update_analytics_on_quiz_attempt(sender, instance, created, **kwargs):
+    """Count a new quiz attempt for the user and the quiz's course."""
+    if not created:
+        return
+    _increment(
+        UserAnalytics, {'user_id': instance.user_id},
+        quizzes_attempted=F('quizzes_attempted') + 1,
+        average_quiz_score=_running_average('average_quiz_score', 'quizzes_attempted', instance.score)
+    )
+    if instance.quiz.course_id:
+        _increment(
+            CourseAnalytics, {'course_id': instance.quiz.course_id},
+            quizzes_attempted=F('quizzes_attempted') + 1,
+            average_quiz_score=_running_average('average_quiz_score', 'quizzes_attempted', instance.score)
+        )
+
+
+def record_user_activity(user_id, timestamp):
+    """Move the user's last activity forward to ``timestamp`` if it is newer."""
+    updated = UserAnalytics.objects.filter(user_id=user_id).filter(
+        Q(last_activity__isnull=True) | Q(last_activity__lt=timestamp)
+    ).update(last_activity=timestamp, last_updated=timezone.now())
+    if not updated and not UserAnalytics.objects.filter(user_id=user_id).exists():
+        UserAnalytics.objects.create(user_id=user_id).update_metrics()
 
 
 @receiver(post_save, sender=AnalyticsEvent)
 def update_user_analytics_on_event(sender, instance, created, **kwargs):
-    """Update user analytics when an event is tracked."""
+    """Move the user's last activity forward when an event is tracked."""
     if created:
-        user_analytics, _ = UserAnalytics.objects.get_or_create(user=instance.user)
-        user_analytics.update_metrics()
+        record_user_activity(instance.user_id, instance.timestamp)
 
 
-@receiver(post_save, sender=UserSession)
-def update_user_analytics_on_session(sender, instance, created, **kwargs):
-    """Update user analytics when a session is created or updated."""
-    user_analytics, _ = UserAnalytics.objects.get_or_create(user=instance.user)
-    user_analytics.update_metrics()
+@receiver(post_init, sender=UserSession)
+def remember_session_duration(sender, instance, **kwargs):
+    """Remember the loaded duration so a later save can add only the difference."""
+    instance._analytics_duration = instance.__dict__.get('duration') or 0
 
 
-@receiver(post_save, sender=AIConversation)
-def update_user_analytics_on_conversation(sender, instance, created, **kwargs):
-    """Update user analytics when a conversation is created."""
-    user_analytics, _ = UserAnalytics.objects.get_or_create(user=instance.user)
-    user_analytics.update_metrics()
+@receiver(post_save, sender=UserSession)
+def update_user_analytics_on_session(sender, instance, created, **kwargs):
+    """Add a new session and any change in session time to the user's totals."""
+    new_sessions = 1 if created else 0
+    added_time = (instance.duration or 0) - instance._analytics_duration
+    instance._analytics_duration = instance.duration or 0
+    if not new_sessions and not added_time:
+        return
+    _increment(
+        UserAnalytics, {'user_id': instance.user_id},
+        total_sessions=F('total_sessions') + new_sessions,
+        total_session_time=Greatest(F('total_session_time') + added_time, 0),
+        average_session_duration=Greatest(F('total_session_time') + added_time, 0) / Greatest(
+            F('total_sessions') + new_sessions, 1
+        )
+    )
 
 
 @receiver(post_save, sender=AIMessage)
 def update_user_analytics_on_message(sender, instance, created, **kwargs):
-    """Update user analytics when a message is sent."""
-    user_analytics, _ = UserAnalytics.objects.get_or_create(user=instance.conversation.user)
-    user_analytics.update_metrics()
+    """Count each answered exchange as two AI interactions.
+
+    Mirrors ``AIConversation.total_messages``, which ``save_ai_message`` bumps
+    by two per reply, so greetings and the user messages of failed or
+    cancelled jobs are not counted.
+    """
+    if created and instance.message_type == 'assistant':
+        _increment(
+            UserAnalytics, {'user_id': instance.conversation.user_id},
+            total_ai_interactions=F('total_ai_interactions') + 2
+        )
+
+
+@receiver(post_init, sender=Enrollment)
+def remember_enrollment_status(sender, instance, **kwargs):
+    """Remember the loaded status so completions are counted once."""
+    instance._analytics_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Enrollment)
+def update_user_analytics_on_enrollment(sender, instance, created, **kwargs):
+    """Count enrollments and completions for the student."""
+    was_completed = not created and instance._analytics_status == 'completed'
+    is_completed = instance.status == 'completed'
+    instance._analytics_status = instance.status
+
+    updates = {}
+    if created:
+        updates['courses_enrolled'] = F('courses_enrolled') + 1
+    if is_completed and not was_completed:
+        updates['courses_completed'] = F('courses_completed') + 1
+    elif was_completed and not is_completed:
+        updates['courses_completed'] = _decrement('courses_completed')
+    if updates:
+        _increment(UserAnalytics, {'user_id': instance.student_id}, **updates)
+
+
+@receiver(post_delete, sender=Enrollment)
+def update_user_analytics_on_enrollment_delete(sender, instance, **kwargs):
+    """Remove a deleted enrollment from the student's counts."""
+    updates = {'courses_enrolled': _decrement('courses_enrolled')}
+    if instance.status == 'completed':
+        updates['courses_completed'] = _decrement('courses_completed')
+    UserAnalytics.objects.filter(user_id=instance.student_id).update(last_updated=timezone.now(), **updates)
 
 
 @receiver(post_delete, sender=Enrollment)
@@ -0,0 +1,58 @@
+"""
+Learning-streak arithmetic shared by analytics dashboards and gamification.
+
+A streak is the number of consecutive days with activity ending today.
+``activity_streak`` derives it from one query of the user's distinct
+activity dates; ``advance_streak`` is the incremental form used when a
+stored streak is bumped as activity happens.
+"""
+
+from datetime import timedelta
+
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AnalyticsEvent
+
+
+def streak_length(activity_dates, today):
+    """Consecutive days ending at ``today`` covered by ``activity_dates`` (newest first, distinct)."""
+    streak = 0
+    expected = today
+    for activity_date in activity_dates:
+        if activity_date > expected:
+            continue
+        if activity_date != expected:
+            break
+        streak += 1
+        expected -= timedelta(days=1)
+    return streak
+
+
+def activity_streak(user, today=None):
+    """Current streak of days with analytics events, computed in a single query."""
+    today = today or timezone.now().date()
+    activity_dates = AnalyticsEvent.objects.filter(
+        user=user,
+        timestamp__date__lte=today
+    ).annotate(
+        day=TruncDate('timestamp')
+    ).values_list('day', flat=True).distinct().order_by('-day')
+    # Rows arrive newest first, so a long history is only read up to the first gap
+    return streak_length(activity_dates.iterator(), today)
+
+
+def advance_streak(current_streak, last_activity_date, activity_date):
+    """Streak after activity on ``activity_date``, given the streak as of ``last_activity_date``."""
+    if last_activity_date is None:
+        return 1
+
+    days_diff = (activity_date - last_activity_date).days
+    if days_diff == 1:
+        # Consecutive day
+        return current_streak + 1
+    if days_diff > 1:
+        # Streak broken
+        return 1
+    # Same day, or a late record for a day already counted
+    return max(current_streak, 1)
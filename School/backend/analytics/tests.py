@@ -0,0 +1,139 @@
+import random
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.test import SimpleTestCase
+
+from .rollups import split_window
+from .streaks import advance_streak, streak_length
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class SplitWindowTests(SimpleTestCase):
+    def assert_partition(self, start, end, watermark):
+        """The three range lists tile [start, end) exactly, with buckets aligned and rolled up."""
+        daily, hourly, raw = split_window(start, end, watermark)
+        ranges = sorted(daily + hourly + raw)
+        self.assertEqual(ranges[0][0], start)
+        self.assertEqual(ranges[-1][1], end)
+        for (_, previous_end), (next_start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(previous_end, next_start)
+        for a, b in ranges:
+            self.assertLess(a, b)
+
+        for a, b in daily:
+            self.assertEqual((a.hour, a.minute, a.second, a.microsecond), (0, 0, 0, 0))
+            self.assertEqual((b.hour, b.minute, b.second, b.microsecond), (0, 0, 0, 0))
+        for a, b in hourly:
+            self.assertEqual((a.minute, a.second, a.microsecond), (0, 0, 0))
+            self.assertEqual((b.minute, b.second, b.microsecond), (0, 0, 0))
+        for a, b in daily + hourly:
+            self.assertLessEqual(b, watermark)
+        return daily, hourly, raw
+
+    def test_no_watermark_scans_raw(self):
+        start, end = utc(2024, 3, 1, 10), utc(2024, 3, 5, 10)
+        self.assertEqual(split_window(start, end, None), ([], [], [(start, end)]))
+
+    def test_watermark_before_window_scans_raw(self):
+        start, end = utc(2024, 3, 1, 10), utc(2024, 3, 5, 10)
+        self.assertEqual(split_window(start, end, utc(2024, 3, 1, 9)), ([], [], [(start, end)]))
+        self.assertEqual(split_window(start, end, start), ([], [], [(start, end)]))
+
+    def test_window_inside_one_hour_scans_raw(self):
+        start, end = utc(2024, 3, 1, 10, 5), utc(2024, 3, 1, 10, 55)
+        self.assertEqual(split_window(start, end, utc(2024, 3, 2)), ([], [], [(start, end)]))
+
+    def test_aligned_days_use_daily_buckets_only(self):
+        start, end = utc(2024, 3, 1), utc(2024, 3, 4)
+        self.assertEqual(split_window(start, end, utc(2024, 3, 10)), ([(start, end)], [], []))
+
+    def test_hours_within_one_day(self):
+        start, end = utc(2024, 3, 1, 10), utc(2024, 3, 1, 15)
+        self.assertEqual(split_window(start, end, utc(2024, 3, 2)), ([], [(start, end)], []))
+
+    def test_unaligned_edges(self):
+        start, end = utc(2024, 3, 1, 10, 30), utc(2024, 3, 3, 5, 15)
+        watermark = utc(2024, 3, 3, 3)
+        daily, hourly, raw = self.assert_partition(start, end, watermark)
+        self.assertEqual(daily, [(utc(2024, 3, 2), utc(2024, 3, 3))])
+        self.assertEqual(hourly, [(utc(2024, 3, 1, 11), utc(2024, 3, 2)), (utc(2024, 3, 3), watermark)])
+        self.assertEqual(raw, [(start, utc(2024, 3, 1, 11)), (watermark, end)])
+
+    def test_watermark_mid_hour_is_not_bucketed(self):
+        start, end = utc(2024, 3, 1, 8), utc(2024, 3, 1, 20)
+        daily, hourly, raw = self.assert_partition(start, end, utc(2024, 3, 1, 12, 40))
+        self.assertEqual(hourly, [(start, utc(2024, 3, 1, 12))])
+        self.assertEqual(raw, [(utc(2024, 3, 1, 12), end)])
+
+    def test_non_utc_input(self):
+        offset = dt_timezone(timedelta(hours=5, minutes=30))
+        start = datetime(2024, 3, 1, 10, 0, tzinfo=offset)
+        end = datetime(2024, 3, 4, 10, 0, tzinfo=offset)
+        self.assert_partition(start, end, utc(2024, 3, 5))
+
+    def test_random_windows_are_partitioned(self):
+        rng = random.Random(11)
+        origin = utc(2024, 1, 1)
+        for _ in range(500):
+            start = origin + timedelta(minutes=rng.randint(0, 60 * 24 * 10))
+            end = start + timedelta(minutes=rng.randint(1, 60 * 24 * 10))
+            watermark = origin + timedelta(minutes=rng.randint(0, 60 * 24 * 25))
+            daily, hourly, raw = split_window(start, end, watermark)
+            if daily or hourly:
+                self.assert_partition(start, end, watermark)
+            else:
+                self.assertEqual(raw, [(start, end)])
+
+
+class StreakTests(SimpleTestCase):
+    today = date(2024, 3, 10)
+
+    def days_ago(self, *offsets):
+        return [self.today - timedelta(days=offset) for offset in offsets]
+
+    def test_streak_length(self):
+        self.assertEqual(streak_length([], self.today), 0)
+        self.assertEqual(streak_length(self.days_ago(0), self.today), 1)
+        self.assertEqual(streak_length(self.days_ago(0, 1, 2, 3), self.today), 4)
+
+    def test_streak_stops_at_first_gap(self):
+        self.assertEqual(streak_length(self.days_ago(0, 1, 3, 4), self.today), 2)
+
+    def test_no_activity_today_is_no_streak(self):
+        self.assertEqual(streak_length(self.days_ago(1, 2, 3), self.today), 0)
+
+    def test_future_dates_are_skipped(self):
+        dates = [self.today + timedelta(days=2), self.today + timedelta(days=1)] + self.days_ago(0, 1)
+        self.assertEqual(streak_length(dates, self.today), 2)
+
+    def test_stops_reading_at_the_gap(self):
+        def dates():
+            yield from self.days_ago(0, 1, 5)
+            raise AssertionError('read past the first gap')
+        self.assertEqual(streak_length(dates(), self.today), 2)
+
+    def test_advance_streak(self):
+        yesterday, today = self.days_ago(1, 0)
+        self.assertEqual(advance_streak(0, None, today), 1)
+        self.assertEqual(advance_streak(4, yesterday, today), 5)
+        self.assertEqual(advance_streak(4, today, today), 4)
+        self.assertEqual(advance_streak(0, today, today), 1)
+        self.assertEqual(advance_streak(4, self.today - timedelta(days=3), today), 1)
+        # A late record for an earlier day never shortens the streak
+        self.assertEqual(advance_streak(4, today, yesterday), 4)
+
+    def test_advance_streak_matches_streak_length(self):
+        rng = random.Random(2)
+        start = self.today - timedelta(days=60)
+        active = sorted({start + timedelta(days=rng.randint(0, 60)) for _ in range(45)})
+        streak, last = 0, None
+        for activity_date in active:
+            streak = advance_streak(streak, last, activity_date)
+            last = activity_date
+            self.assertEqual(streak, streak_length(sorted(active, reverse=True), activity_date))
@@ -2,15 +2,22 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Count, Avg, Sum
+from django.db.models import Count, Q, Sum
 from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
-from datetime import timedelta
+import time
+import uuid
+from datetime import datetime, timedelta
 from .models import (
     AnalyticsEvent, UserSession, CourseAnalytics, UserAnalytics,
     PlatformAnalytics, Report
 )
+from .event_buffer import record_event
+from .rollups import event_counts, quiz_totals, session_totals
+from .streaks import activity_streak
 from .serializers import (
     AnalyticsEventSerializer, UserSessionSerializer, CourseAnalyticsSerializer,
     UserAnalyticsSerializer, PlatformAnalyticsSerializer, ReportSerializer,
@@ -18,6 +25,10 @@ from .serializers import (
     EngagementMetricsSerializer, LearningAnalyticsSerializer, EventTrackingSerializer
 )
 
+SUMMARY_CACHE_TTL = getattr(settings, 'ANALYTICS_SUMMARY_CACHE_TTL', 60)
+SUMMARY_LOCK_TIMEOUT = 10
+SUMMARY_MAX_DAYS = 365
+
 
 class AnalyticsEventListView(generics.ListCreateAPIView):
     """View for listing and creating analytics events."""
@@ -53,13 +64,25 @@ class AnalyticsEventListView(generics.ListCreateAPIView):
 
         return queryset.order_by('-timestamp')
 
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        buffered = self.perform_create(serializer)
+        return Response(
+            serializer.data,
+            status=status.HTTP_202_ACCEPTED if buffered else status.HTTP_201_CREATED
+        )
+
     def perform_create(self, serializer):
         # Set user to current user if not specified
+        event_data = dict(serializer.validated_data)
         user = self.request.user
-        if user.is_authenticated and not serializer.validated_data.get('user'):
-            serializer.save(user=user)
-        else:
-            serializer.save()
+        if user.is_authenticated and not event_data.get('user'):
+            event_data['user'] = user
+
+        # Written in the background by the event buffer; the instance has no id until then
+        serializer.instance = AnalyticsEvent(**event_data)
+        return record_event(serializer.instance)
 
 
 class UserSessionListView(generics.ListCreateAPIView):
@@ -222,48 +245,70 @@ class ReportDetailView(generics.RetrieveUpdateDestroyAPIView):
         return super().update(request, *args, **kwargs)
 
 
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated])
-def analytics_summary(request):
-    """Get overall analytics summary."""
+def _cached_with_lock(cache_key, ttl, compute):
+    """Serve ``compute()`` from the cache, letting one caller at a time refresh it.
+
+    Entries outlive their TTL so that, once stale, the caller holding the lock
+    recomputes while everyone else keeps serving the stale copy. Only a cold
+    cache makes callers wait for the lock holder, and only briefly.
+    """
+    entry = cache.get(cache_key)
+    if entry is not None and entry['expires_at'] > time.time():
+        return entry['data']
+
+    lock_key = f"{cache_key}_lock"
+    token = uuid.uuid4().hex
+    locked = cache.add(lock_key, token, timeout=SUMMARY_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return entry['data']
+        # Cold cache: wait for the caller that is computing it, then compute without the lock
+        deadline = time.time() + SUMMARY_LOCK_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return entry['data']
+
+    try:
+        data = compute()
+        cache.set(cache_key, {'data': data, 'expires_at': time.time() + ttl}, timeout=ttl * 10)
+        return data
+    finally:
+        # Only release our own lock; it may have expired and been taken by another caller
+        if locked and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def _compute_analytics_summary(days):
+    from courses.models import Course, Enrollment
 
     # Date range
-    days = int(request.query_params.get('days', 30))
     date_from = timezone.now().date() - timedelta(days=days)
+    window_start = timezone.make_aware(datetime.combine(date_from, datetime.min.time()))
 
     # Platform metrics
-    total_users = UserAnalytics.objects.count()
-    active_users = UserAnalytics.objects.filter(
-        last_activity__gte=date_from
-    ).count()
-
-    from courses.models import Course, Enrollment
+    user_totals = UserAnalytics.objects.aggregate(
+        total_users=Count('id'),
+        active_users=Count('id', filter=Q(last_activity__gte=window_start))
+    )
     total_courses = Course.objects.count()
-    total_enrollments = Enrollment.objects.filter(
-        enrolled_at__gte=date_from
-    ).count()
 
-    # Session metrics
-    sessions = UserSession.objects.filter(start_time__gte=date_from)
-    total_sessions = sessions.count()
-    total_page_views = AnalyticsEvent.objects.filter(
-        timestamp__gte=date_from,
-        event_type='page_view'
-    ).count()
-    total_ai_interactions = AnalyticsEvent.objects.filter(
-        timestamp__gte=date_from,
-        event_type='ai_chat'
-    ).count()
-
-    # Completion rate
-    enrollments = Enrollment.objects.all()
-    total_enrollments_all = enrollments.count()
-    completed_enrollments = enrollments.filter(status='completed').count()
+    # Enrollments in the window and overall completion rate
+    enrollment_totals = Enrollment.objects.aggregate(
+        recent=Count('id', filter=Q(enrolled_at__gte=window_start)),
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='completed'))
+    )
     average_completion_rate = (
-        (completed_enrollments / total_enrollments_all * 100)
-        if total_enrollments_all > 0 else 0
+        (enrollment_totals['completed'] / enrollment_totals['total'] * 100)
+        if enrollment_totals['total'] > 0 else 0
     )
 
+    # Session metrics (pre-aggregated buckets plus the raw tail, see analytics.rollups)
+    total_sessions = session_totals(window_start)['session_count']
+    event_totals = event_counts(window_start, event_types=['page_view', 'ai_chat'])
+
     # Top courses
     top_courses = CourseAnalytics.objects.select_related('course').order_by(
         '-total_views'
@@ -279,13 +324,13 @@ def analytics_summary(request):
     )
 
     data = {
-        'total_users': total_users,
-        'active_users': active_users,
+        'total_users': user_totals['total_users'],
+        'active_users': user_totals['active_users'],
         'total_courses': total_courses,
-        'total_enrollments': total_enrollments,
+        'total_enrollments': enrollment_totals['recent'],
         'total_sessions': total_sessions,
-        'total_page_views': total_page_views,
-        'total_ai_interactions': total_ai_interactions,
+        'total_page_views': event_totals.get('page_view', 0),
+        'total_ai_interactions': event_totals.get('ai_chat', 0),
         'average_completion_rate': round(average_completion_rate, 2),
         'top_courses': list(top_courses),
         'recent_activity': list(recent_activity)
@@ -293,8 +338,24 @@ def analytics_summary(request):
 
     serializer = AnalyticsSummarySerializer(data=data)
     serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
 
-    return Response(serializer.validated_data)
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def analytics_summary(request):
+    """Get overall analytics summary."""
+
+    # Clamped so query strings cannot mint unlimited cache keys
+    days = min(max(int(request.query_params.get('days', 30)), 1), SUMMARY_MAX_DAYS)
+
+    # Polled by every open admin dashboard; the figures are the same for all viewers
+    data = _cached_with_lock(
+        f"analytics_summary_{days}",
+        SUMMARY_CACHE_TTL,
+        lambda: _compute_analytics_summary(days)
+    )
+    return Response(data)
 
 
 @api_view(['GET'])
@@ -386,22 +447,25 @@ def engagement_metrics(request):
     date_from = timezone.now() - timedelta(days=days)
 
     sessions = UserSession.objects.filter(start_time__gte=date_from)
-    events = AnalyticsEvent.objects.filter(timestamp__gte=date_from)
 
-    # Calculate metrics
-    total_sessions = sessions.count()
-    average_session_duration = sessions.aggregate(
-        avg_duration=Avg('duration')
-    )['avg_duration'] or 0
+    # Calculate metrics from pre-aggregated buckets plus the raw tail
+    session_data = session_totals(date_from)
+    total_sessions = session_data['session_count']
+    average_session_duration = (
+        session_data['duration_total'] // session_data['duration_count']
+        if session_data['duration_count'] > 0 else 0
+    )
 
-    total_page_views = events.filter(event_type='page_view').count()
-    total_ai_interactions = events.filter(event_type='ai_chat').count()
+    event_totals = event_counts(date_from, event_types=['page_view', 'ai_chat'])
+    total_page_views = event_totals.get('page_view', 0)
+    total_ai_interactions = event_totals.get('ai_chat', 0)
 
     # Bounce rate (sessions with only 1 page view)
-    bounce_sessions = sessions.filter(page_views=1).count()
+    bounce_sessions = session_data['bounce_count']
     bounce_rate = (bounce_sessions / total_sessions * 100) if total_sessions > 0 else 0
 
-    # Return visitor rate (users with multiple sessions)
+    # Return visitor rate (users with multiple sessions); distinct users cannot
+    # be summed across buckets, so this one still reads the sessions table
     users_with_multiple_sessions = sessions.values('user').annotate(
         session_count=Count('id')
     ).filter(session_count__gt=1).count()
@@ -432,52 +496,38 @@ def engagement_metrics(request):
 def learning_analytics(request):
     """Get learning analytics."""
 
-    from ai_assistant.models import AIQuizAttempt
+    from courses.models import Enrollment
 
     days = int(request.query_params.get('days', 30))
     date_from = timezone.now() - timedelta(days=days)
 
-    quiz_attempts = AIQuizAttempt.objects.filter(created_at__gte=date_from)
     enrollments = Enrollment.objects.filter(enrolled_at__gte=date_from)
 
-    # Quiz metrics
-    total_quiz_attempts = quiz_attempts.count()
-    average_quiz_score = quiz_attempts.aggregate(
-        avg_score=Avg('score')
-    )['avg_score'] or 0
+    # Quiz metrics (pre-aggregated buckets plus the raw tail)
+    quiz_data = quiz_totals(date_from)
+    total_quiz_attempts = quiz_data['attempt_count']
+    average_quiz_score = (
+        quiz_data['score_total'] / total_quiz_attempts
+        if total_quiz_attempts > 0 else 0
+    )
 
     pass_rate = (
-        quiz_attempts.filter(score__gte=70).count() / total_quiz_attempts * 100
+        quiz_data['passed_count'] / total_quiz_attempts * 100
     ) if total_quiz_attempts > 0 else 0
 
     # Completion metrics
     courses_completed = enrollments.filter(status='completed').count()
-    lessons_completed = AnalyticsEvent.objects.filter(
-        timestamp__gte=date_from,
-        event_type='lesson_view'
-    ).count()
+    lessons_completed = event_counts(date_from, event_types=['lesson_view']).get('lesson_view', 0)
 
     # Study time
-    average_study_time = UserSession.objects.filter(
-        start_time__gte=date_from
-    ).aggregate(avg_time=Avg('duration'))['avg_time'] or 0
+    session_data = session_totals(date_from)
+    average_study_time = (
+        session_data['duration_total'] // session_data['duration_count']
+        if session_data['duration_count'] > 0 else 0
+    )
 
     # Learning streak (consecutive days with activity)
-    user = request.user
-    streak_days = 0
-    check_date = timezone.now().date()
-
-    while True:
-        has_activity = AnalyticsEvent.objects.filter(
-            user=user,
-            timestamp__date=check_date
-        ).exists()
-
-        if has_activity:
-            streak_days += 1
-            check_date -= timedelta(days=1)
-        else:
-            break
+    streak_days = activity_streak(request.user)
 
     data = {
         'total_quiz_attempts': total_quiz_attempts,
@@ -505,8 +555,8 @@ def track_event(request):
 
     event_data = serializer.validated_data
 
-    # Create the event
-    event = AnalyticsEvent.objects.create(
+    # Queue the event for the background writer
+    event = AnalyticsEvent(
         user_id=event_data['user_id'],
         event_type=event_data['event_type'],
         timestamp=event_data.get('timestamp', timezone.now()),
@@ -519,6 +569,11 @@ def track_event(request):
         conversation_id=event_data.get('conversation_id')
     )
 
+    if record_event(event):
+        return Response(
+            {'message': 'Event queued', 'event_id': None},
+            status=status.HTTP_202_ACCEPTED
+        )
     return Response(
         {'message': 'Event tracked successfully', 'event_id': event.id},
         status=status.HTTP_201_CREATED
@@ -7,6 +7,7 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import classrooms.routing
+import ai_assistant.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
@@ -14,7 +15,8 @@ application = ProtocolTypeRouter({
     "http": get_asgi_application(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            classrooms.routing.websocket_urlpatterns
+            classrooms.routing.websocket_urlpatterns +
+            ai_assistant.routing.websocket_urlpatterns
         )
     ),
 })
@@ -394,6 +394,43 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 # OpenAI settings
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 
+# Student similarity index for recommendations (adaptive_learning.similarity_index),
+# rebuilt by `manage.py build_recommendation_index`
+RECOMMENDATION_INDEX_PATH = os.getenv('RECOMMENDATION_INDEX_PATH', str(BASE_DIR / 'var' / 'recommendation_index.npz'))
+RECOMMENDATION_INDEX_K = int(os.getenv('RECOMMENDATION_INDEX_K', 50))
+# Upper bound on how stale a cached recommendation can get between invalidations (seconds)
+RECOMMENDATION_CACHE_TTL = int(os.getenv('RECOMMENDATION_CACHE_TTL', 900))
+
+# Offline-trained adaptive learning models (adaptive_learning.ml_models),
+# published by `manage.py train_adaptive_models`
+ADAPTIVE_MODEL_DIR = os.getenv('ADAPTIVE_MODEL_DIR', str(BASE_DIR / 'var' / 'adaptive_models'))
+ADAPTIVE_MODEL_KEEP = int(os.getenv('ADAPTIVE_MODEL_KEEP', 5))
+
+# Largest answer list accepted by /api/adaptive/metrics/bulk_update_performance/
+ADAPTIVE_MAX_BULK_ANSWERS = int(os.getenv('ADAPTIVE_MAX_BULK_ANSWERS', 500))
+
+# Buffered analytics event ingestion (analytics.event_buffer)
+ANALYTICS_EVENT_BUFFERING = os.getenv('ANALYTICS_EVENT_BUFFERING', 'True').lower() == 'true'
+ANALYTICS_EVENT_BATCH_SIZE = int(os.getenv('ANALYTICS_EVENT_BATCH_SIZE', 500))
+ANALYTICS_EVENT_FLUSH_INTERVAL = float(os.getenv('ANALYTICS_EVENT_FLUSH_INTERVAL', 2.0))
+ANALYTICS_EVENT_MAX_BUFFER = int(os.getenv('ANALYTICS_EVENT_MAX_BUFFER', 10000))
+ANALYTICS_EVENT_WRITE_RETRIES = int(os.getenv('ANALYTICS_EVENT_WRITE_RETRIES', 5))
+
+# Hourly/daily analytics rollups (analytics.rollups), refreshed by `manage.py rollup_analytics`;
+# each run re-rolls this many hours before the previous run to pick up late data
+ANALYTICS_ROLLUP_REWIND_HOURS = int(os.getenv('ANALYTICS_ROLLUP_REWIND_HOURS', 24))
+
+# Seconds an analytics summary is served from cache before one request refreshes it
+ANALYTICS_SUMMARY_CACHE_TTL = int(os.getenv('ANALYTICS_SUMMARY_CACHE_TTL', 60))
+
+# Background AI chat generation (ai_assistant.chat_jobs)
+AI_CHAT_BACKGROUND = os.getenv('AI_CHAT_BACKGROUND', 'False').lower() == 'true'
+AI_CHAT_WORKERS = int(os.getenv('AI_CHAT_WORKERS', 4))
+AI_CHAT_MAX_PENDING = int(os.getenv('AI_CHAT_MAX_PENDING', 64))
+# Seconds a chat job may run before it is failed as stale; queued jobs get
+# enough extra time for a full queue (AI_CHAT_MAX_PENDING) to drain first
+AI_CHAT_JOB_TIMEOUT = int(os.getenv('AI_CHAT_JOB_TIMEOUT', 300))
+
 # AWS S3 settings (for file storage)
 AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID', '')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', '')
@@ -160,23 +160,12 @@ class GamificationProfile(models.Model):
 
     def update_streak(self, activity_date):
         """Update learning streak"""
-        from datetime import date, timedelta
-
-        if self.last_activity_date:
-            days_diff = (activity_date - self.last_activity_date).days
-
-            if days_diff == 1:
-                # Consecutive day
-                self.current_streak += 1
-            elif days_diff > 1:
-                # Streak broken
-                self.longest_streak = max(self.longest_streak, self.current_streak)
-                self.current_streak = 1
-        else:
-            # First activity
-            self.current_streak = 1
-
-        self.last_activity_date = activity_date
+        from analytics.streaks import advance_streak
+
+        self.current_streak = advance_streak(self.current_streak, self.last_activity_date, activity_date)
+        self.longest_streak = max(self.longest_streak, self.current_streak)
+        if not self.last_activity_date or activity_date > self.last_activity_date:
+            self.last_activity_date = activity_date
         self.save()
 
 class Reward(models.Model):